@@ -1,12 +1,36 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import contextlib
 import csv
 import io
-import streamlit as st
+import os
 
-from io import StringIO
-import math
 import re
+import tempfile
+import time
+import unicodedata
+import zipfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from codigos import parse_many, parsear
+from huellas import cache_por_huella, huella, huella_de, huella_de_archivo
+from corte import corte_optimo, first_fit_decreasing, plan_de_corte
+from reglas import (
+    activar_reglas,
+    cargar_reglas,
+    despiece_de_base,
+    evaluar_base,
+    huella_reglas,
+    reglas_activas,
+)
 
 # Insumos estándar (no eléctricos)
 INSUMOS = {
@@ -51,6 +75,27 @@ MANO_OBRA = {
     "soldadura": 6611.0 / 60.0,
     "perforacion": 3889.0 / 60.0,
 }
+# Ojales y remaches (WF siempre; SF/MF sólo con ANCHO=600)
+COSTO_OJAL_USD = 0.927
+COSTO_REMACHE_USD = 0.135
+# Tiempos de fabricación con que se calculan los costos
+TIEMPO_POR_CORTE_MIN = 1.25
+VELOCIDAD_SOLDADURA_MM_POR_MIN = 200.0
+TIEMPOS_PERFORACION_POR_TIPO = {
+    "WF": 2.0,
+    "SF": 2.0,
+    "MF": 2.0,
+    "CL": 0.2,
+    "CLI": 1.5,
+    "CLE": 1.5,
+    "IC": 4.0,
+    "OC": 1.0,
+    "BH": 5.0,
+    "BCP": 1.0,
+    "CP": 0.9,
+    "CE": 0.6,
+    "CS": 1.0,
+}
 # ---
 
 DESIRED_ORDER = [
@@ -75,7 +120,20 @@ DESIRED_ORDER = [
 
 
 ## File stuff
-def exportar_todo(
+HOJAS_EXPORTACION = (
+    "Pedido_agrupado",
+    "Despiece",
+    "Materia prima",
+    "Soldadura",
+    "Tiempos",
+    "Costos",
+    "Insumos",
+    "Áreas_BASE",
+    "Resumen",
+)
+
+
+def hojas_de_exportacion(
     resultado_despiece,
     cantidades_por_base,
     df_pedido,
@@ -85,6 +143,12 @@ def exportar_todo(
     dolar,
     resumen,
 ):
+    """
+    Hojas del reporte completo (HOJAS_EXPORTACION, en ese orden), sin armar
+    un DataFrame por hoja.
+    Retorna un generador de (nombre, encabezados, filas), donde filas es un
+    iterable de tuplas que se recorre una sola vez.
+    """
     # Reconstruimos estructuras que usamos arriba
     totales = calcular_totales_perfiles(resultado_despiece)
     materia_prima = calcular_materia_prima_por_perfil(
@@ -95,32 +159,22 @@ def exportar_todo(
     # Áreas por BASE (misma lógica que opción 9 y resumen)
     filas_area_base, total_area_base = calcular_areas_por_base(cantidades_por_base)
 
-    export_file = io.BytesIO(b"")
-    with pd.ExcelWriter(export_file, engine="openpyxl") as writer:
-        # 0) Pedido agrupado
-        df_pedido.to_excel(writer, sheet_name="Pedido_agrupado", index=False)
+    # 0) Pedido agrupado
+    yield (
+        "Pedido_agrupado",
+        ["Panel (base)", "Cantidad"],
+        df_pedido.itertuples(index=False, name=None),
+    )
 
-        # 1) Despiece detallado
-        pd.DataFrame(resultado_despiece).to_excel(
-            writer, sheet_name="Despiece", index=False
-        )
+    # 1) Despiece detallado
+    yield (
+        "Despiece",
+        ["panel", "perfil", "numero_piezas", "largo_pieza_mm", "total_mm"],
+        _como_despiece(resultado_despiece).filas(),
+    )
 
-        # 2) Materia prima (unificada con totales)
-        filas_mp = []
-        # primero DESIRED_ORDER
-        for perfil in DESIRED_ORDER:
-            t = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
-            m = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
-            filas_mp.append(
-                {
-                    "Perfil": perfil,
-                    "Piezas totales": t["numero_piezas"],
-                    "Total(mm)": t["total_mm"],
-                    "Perfiles necesarios (5850mm)": m["num_perfiles"],
-                    "Waste (mm)": m["waste_mm"],
-                }
-            )
-        # luego otros perfiles
+    # 2) Materia prima (unificada con totales): primero DESIRED_ORDER, luego otros
+    def _filas_mp():
         otros = sorted(
             [
                 p
@@ -128,47 +182,69 @@ def exportar_todo(
                 if p not in DESIRED_ORDER
             ]
         )
-        for p in otros:
-            t = totales.get(p, {"numero_piezas": 0, "total_mm": 0})
-            m = materia_prima.get(p, {"num_perfiles": 0, "waste_mm": 0})
-            filas_mp.append(
-                {
-                    "Perfil": p,
-                    "Piezas totales": t["numero_piezas"],
-                    "Total(mm)": t["total_mm"],
-                    "Perfiles necesarios (5850mm)": m["num_perfiles"],
-                    "Waste (mm)": m["waste_mm"],
-                }
+        for perfil in [*DESIRED_ORDER, *otros]:
+            t = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
+            m = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
+            yield (
+                perfil,
+                t["numero_piezas"],
+                t["total_mm"],
+                m["num_perfiles"],
+                m["waste_mm"],
             )
-        pd.DataFrame(filas_mp).to_excel(writer, sheet_name="Materia prima", index=False)
-
-        # 3) Soldadura
-        pd.DataFrame(
-            [{"Panel": k, "Soldadura(mm)": v} for k, v in soldadura.items()]
-        ).to_excel(writer, sheet_name="Soldadura", index=False)
-
-        # 4) Tiempos por panel
-        df_tiempos = pd.DataFrame.from_dict(tiempos_panel, orient="index").reset_index()
-        df_tiempos.rename(columns={"index": "Panel"}, inplace=True)
-        df_tiempos.to_excel(writer, sheet_name="Tiempos", index=False)
-
-        # 5) Costos por panel (agrupado por BASE) — usa cantidades_por_base ya existente
-        filas_costos = []
-
-        def _mo_total(d):
-            return (
-                (d.get("costo_mo_corte_usd", 0.0) or 0.0)
-                + (d.get("costo_mo_sold_usd", 0.0) or 0.0)
-                + (d.get("costo_mo_perf_usd", 0.0) or 0.0)
+
+    yield (
+        "Materia prima",
+        [
+            "Perfil",
+            "Piezas totales",
+            "Total(mm)",
+            "Perfiles necesarios (5850mm)",
+            "Waste (mm)",
+        ],
+        _filas_mp(),
+    )
+
+    # 3) Soldadura
+    yield "Soldadura", ["Panel", "Soldadura(mm)"], soldadura.items()
+
+    # 4) Tiempos por panel
+    yield (
+        "Tiempos",
+        [
+            "Panel",
+            "tiempo_corte_min",
+            "tiempo_soldadura_min",
+            "tiempo_perforacion_min",
+            "tiempo_total_min",
+        ],
+        (
+            (
+                panel,
+                d["tiempo_corte_min"],
+                d["tiempo_soldadura_min"],
+                d["tiempo_perforacion_min"],
+                d["tiempo_total_min"],
             )
+            for panel, d in tiempos_panel.items()
+        ),
+    )
 
+    # 5) Costos por panel (agrupado por BASE) — usa cantidades_por_base ya existente
+    def _mo_total(d):
+        return (
+            (d.get("costo_mo_corte_usd", 0.0) or 0.0)
+            + (d.get("costo_mo_sold_usd", 0.0) or 0.0)
+            + (d.get("costo_mo_perf_usd", 0.0) or 0.0)
+        )
+
+    def _filas_costos():
         for base, cant_total in sorted(
             cantidades_por_base.items(), key=lambda x: x[0].lower()
         ):
             if cant_total <= 0:
                 continue
-            info = parse_panel_code(base)
-            _, _, area_unit = calcular_area(info["nums"])
+            _, _, area_unit = calcular_area(parsear(base).nums)
             if area_unit <= 0:
                 continue
 
@@ -183,87 +259,315 @@ def exportar_todo(
             costo_unit = total_base / cant_total if cant_total else 0.0
             usd_m2_unit = (costo_unit / area_unit) if area_unit > 0 else 0.0
 
-            filas_costos.append(
-                {
-                    "Panel (base)": base,
-                    "Cantidad": cant_total,
-                    "Área panel (m²)": round(area_unit, 3),
-                    "Costo unit (USD)": round(costo_unit, 2),
-                    "USD/m² unit": round(usd_m2_unit, 2),
-                    "MP (USD)": round(mp_total, 2),
-                    "MO (USD)": round(mo_total, 2),
-                    "Insumos (USD)": round(insumos_total, 2),
-                    "Energía (USD)": round(energia_total, 2),  # ← NUEVO
-                    "Total (USD)": round(total_base, 2),
-                }
+            yield (
+                base,
+                cant_total,
+                round(area_unit, 3),
+                round(costo_unit, 2),
+                round(usd_m2_unit, 2),
+                round(mp_total, 2),
+                round(mo_total, 2),
+                round(insumos_total, 2),
+                round(energia_total, 2),  # ← NUEVO
+                round(total_base, 2),
             )
 
-        pd.DataFrame(filas_costos).to_excel(writer, sheet_name="Costos", index=False)
-
-        # 6) Detalle de insumos por pieza
-        filas_insumos = []
-        for panel, ins in detalle_por_pieza.items():
-            for nombre, datos in ins.items():
-                filas_insumos.append(
-                    {
-                        "Panel": panel,
-                        "Insumo": nombre,
-                        "Cantidad": datos["cantidad"],
-                        "Costo USD": datos["costo_usd"],
-                    }
-                )
-        pd.DataFrame(filas_insumos).to_excel(writer, sheet_name="Insumos", index=False)
+    yield (
+        "Costos",
+        [
+            "Panel (base)",
+            "Cantidad",
+            "Área panel (m²)",
+            "Costo unit (USD)",
+            "USD/m² unit",
+            "MP (USD)",
+            "MO (USD)",
+            "Insumos (USD)",
+            "Energía (USD)",
+            "Total (USD)",
+        ],
+        _filas_costos(),
+    )
 
-        # 7) Áreas (por BASE)
-        pd.DataFrame(filas_area_base).to_excel(
-            writer, sheet_name="Áreas_BASE", index=False
-        )
+    # 6) Detalle de insumos por pieza
+    yield (
+        "Insumos",
+        ["Panel", "Insumo", "Cantidad", "Costo USD"],
+        (
+            (panel, nombre, datos["cantidad"], datos["costo_usd"])
+            for panel, ins in detalle_por_pieza.items()
+            for nombre, datos in ins.items()
+        ),
+    )
 
-        # 8) Resumen (mismas métricas que 'resumen' ya calculado)
-        df_resumen = pd.DataFrame(
-            [
-                {
-                    "Total piezas (despiece)": resumen["total_piezas_despiece"],
-                    "Total paneles (CSV)": resumen["total_paneles"],
-                    "Área total (m²)": round(
-                        resumen["total_area_m2"], 3
-                    ),  # viene de calcular_areas_por_base
-                    "Costo total (USD)": round(resumen["total_costo_usd"], 2),
-                    "Costo promedio (USD/m²)": round(
-                        resumen["costo_promedio_usd_m2"], 2
-                    ),
-                    "Tiempo total (horas)": round(resumen["total_tiempo_horas"], 2),
-                    "Tiempo total (días, 8h)": round(resumen["total_tiempo_dias"], 2),
-                    "Tasa CLP→USD usada": dolar,
-                }
-            ]
+    # 7) Áreas (por BASE)
+    columnas_area = [
+        "Panel (base)",
+        "Cantidad",
+        "Área panel (m²)",
+        "Área total (m²)",
+    ]
+    yield (
+        "Áreas_BASE",
+        columnas_area,
+        (tuple(fila[c] for c in columnas_area) for fila in filas_area_base),
+    )
+
+    # 8) Resumen (mismas métricas que 'resumen' ya calculado)
+    yield (
+        "Resumen",
+        [
+            "Total piezas (despiece)",
+            "Total paneles (CSV)",
+            "Área total (m²)",
+            "Costo total (USD)",
+            "Costo promedio (USD/m²)",
+            "Tiempo total (horas)",
+            "Tiempo total (días, 8h)",
+            "Tasa CLP→USD usada",
+        ],
+        [
+            (
+                resumen["total_piezas_despiece"],
+                resumen["total_paneles"],
+                round(resumen["total_area_m2"], 3),  # viene de calcular_areas_por_base
+                round(resumen["total_costo_usd"], 2),
+                round(resumen["costo_promedio_usd_m2"], 2),
+                round(resumen["total_tiempo_horas"], 2),
+                round(resumen["total_tiempo_dias"], 2),
+                dolar,
+            )
+        ],
+    )
+
+
+def exportar_todo(
+    resultado_despiece,
+    cantidades_por_base,
+    df_pedido,
+    costos_por_panel,
+    tiempos_panel,
+    detalle_por_pieza,
+    dolar,
+    resumen,
+    destino=None,
+    progreso=None,
+    hojas=HOJAS_EXPORTACION,
+):
+    """
+    Escribe el reporte completo en un libro de Excel en modo write-only de
+    openpyxl: las filas pasan directo de los resultados a disco, con memoria
+    constante, sin DataFrames intermedios.
+    destino: ruta o archivo binario; por defecto un archivo temporal.
+    progreso: callback opcional progreso(fraccion, detalle), llamado al empezar
+    cada hoja (ver trabajos.lanzar).
+    hojas: nombres de HOJAS_EXPORTACION a incluir (se escriben en ese orden).
+    Retorna destino (si es archivo, posicionado al inicio para leerlo).
+    """
+    if destino is None:
+        destino = tempfile.TemporaryFile(suffix=".xlsx", buffering=0)
+
+    if progreso is not None:
+        progreso(0.0, "Preparando datos")
+    libro = Workbook(write_only=True)
+    negrita = Font(bold=True)
+    total = len(hojas) + 1  # + guardar el libro
+    for i, (nombre, encabezados, filas) in enumerate(
+        hoja
+        for hoja in hojas_de_exportacion(
+            resultado_despiece,
+            cantidades_por_base,
+            df_pedido,
+            costos_por_panel,
+            tiempos_panel,
+            detalle_por_pieza,
+            dolar,
+            resumen,
         )
-        df_resumen.to_excel(writer, sheet_name="Resumen", index=False)
+        if hoja[0] in hojas
+    ):
+        if progreso is not None:
+            progreso(i / total, f"Hoja {nombre} ({i + 1}/{len(hojas)})")
+        hoja = libro.create_sheet(nombre)
+        celdas = []
+        for encabezado in encabezados:
+            celda = WriteOnlyCell(hoja, value=encabezado)
+            celda.font = negrita
+            celdas.append(celda)
+        hoja.append(celdas)
+        for fila in filas:
+            hoja.append(fila)
+    if progreso is not None:
+        progreso((total - 1) / total, "Guardando el libro")
+    libro.save(destino)
+
+    if hasattr(destino, "seek"):
+        destino.seek(0)
+    return destino
+
+
+def _nombre_archivo(hoja):
+    """Nombre de archivo sin tildes ni espacios (ej. 'Áreas_BASE' -> 'areas_base')."""
+    ascii_ = unicodedata.normalize("NFKD", hoja).encode("ascii", "ignore").decode()
+    return ascii_.lower().replace(" ", "_")
+
+
+# Columnas que pueden salir enteras en un pedido y con decimales en otro
+_COLUMNAS_FLOAT = {
+    "Tiempos": [
+        "tiempo_corte_min",
+        "tiempo_soldadura_min",
+        "tiempo_perforacion_min",
+        "tiempo_total_min",
+    ],
+    "Insumos": ["Cantidad", "Costo USD"],
+}
 
-    return export_file
 
+def _tabla_arrow(encabezados, filas, columnas_float=()):
+    """Tabla Arrow con tipos inferidos por columna; los textos como diccionario."""
+    columnas = list(zip(*filas)) or [()] * len(encabezados)
+    arreglos = []
+    for encabezado, valores in zip(encabezados, columnas):
+        tipo = pa.float64() if encabezado in columnas_float else None
+        arreglo = pa.array(valores, type=tipo)
+        if pa.types.is_string(arreglo.type) or pa.types.is_null(arreglo.type):
+            arreglo = arreglo.cast(pa.string()).dictionary_encode()
+        arreglos.append(arreglo)
+    return pa.table(arreglos, names=encabezados)
+
+
+def exportar_tablas(
+    resultado_despiece,
+    cantidades_por_base,
+    df_pedido,
+    costos_por_panel,
+    tiempos_panel,
+    detalle_por_pieza,
+    dolar,
+    resumen,
+    destino=None,
+    formato="arrow",
+    hojas=HOJAS_EXPORTACION,
+):
+    """
+    Exporta las mismas tablas que exportar_todo (HOJAS_EXPORTACION) en formato
+    columnar tipado, con los nombres de panel, perfil, insumo, etc. codificados
+    como diccionario.
+    formato: "arrow" (Arrow IPC sin comprimir, se puede abrir con
+    pyarrow.memory_map) o "parquet".
+    destino: directorio existente (un archivo por tabla) o ruta/archivo para
+    un zip; por defecto un zip en un archivo temporal.
+    hojas: nombres de HOJAS_EXPORTACION a exportar.
+    Retorna destino (si es archivo, posicionado al inicio para leerlo).
+    """
+    if formato not in ("arrow", "parquet"):
+        raise ValueError(f"Formato de exportación no reconocido: {formato}")
+    if destino is None:
+        destino = tempfile.TemporaryFile(suffix=".zip", buffering=0)
+    directorio = (
+        destino
+        if isinstance(destino, (str, os.PathLike)) and os.path.isdir(destino)
+        else None
+    )
 
+    def _escribir(tabla, archivo):
+        if formato == "parquet":
+            pq.write_table(tabla, archivo)
+        else:
+            with pa.ipc.new_file(archivo, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+
+    with contextlib.ExitStack() as pila:
+        if directorio is None:
+            # sin comprimir: el contenido ya es binario (parquet comprime solo)
+            zip_ = pila.enter_context(zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED))
+        for nombre, encabezados, filas in hojas_de_exportacion(
+            resultado_despiece,
+            cantidades_por_base,
+            df_pedido,
+            costos_por_panel,
+            tiempos_panel,
+            detalle_por_pieza,
+            dolar,
+            resumen,
+        ):
+            if nombre not in hojas:
+                continue
+            if nombre == "Despiece":
+                # directo desde las columnas del Despiece, sin pasar por filas
+                d = _como_despiece(resultado_despiece)
+                tabla = pa.table(
+                    [
+                        pa.DictionaryArray.from_arrays(d.panel_cod, d.paneles),
+                        pa.DictionaryArray.from_arrays(d.perfil_cod, d.perfiles),
+                        _como_float(d.numero_piezas),
+                        _como_float(d.largo_pieza_mm),
+                        _como_float(d.total_mm),
+                    ],
+                    names=encabezados,
+                )
+            else:
+                tabla = _tabla_arrow(
+                    encabezados, filas, _COLUMNAS_FLOAT.get(nombre, ())
+                )
+            archivo = f"{_nombre_archivo(nombre)}.{formato}"
+            if directorio is not None:
+                _escribir(tabla, os.path.join(directorio, archivo))
+            else:
+                with zip_.open(archivo, "w") as salida:
+                    _escribir(tabla, salida)
+
+    if hasattr(destino, "seek"):
+        destino.seek(0)
+    return destino
+
+
+def _huella_csv(csv_file):
+    if isinstance(csv_file, (str, os.PathLike)):
+        with open(csv_file, "rb") as f:
+            return huella_de_archivo(f)
+    return huella_de_archivo(csv_file)
+
+
+@cache_por_huella(clave=_huella_csv)
 def cargar_pedido_agrupado(csv_file):
     """
     Lee el CSV original y devuelve:
       - cantidades_por_base: dict {BASE: cantidad_total}
       - df_pedido: DataFrame con columnas ['Panel (base)', 'Cantidad'] (ordenado)
     Normaliza el código eliminando todo lo que siga al primer '-'.
+    csv_file puede ser una ruta o un archivo binario (ej. el UploadedFile de
+    Streamlit). Se lee en streaming, fila a fila: nunca se decodifica el
+    archivo completo a un solo string. El resultado queda en caché por el
+    hash del contenido del archivo.
     """
+    if isinstance(csv_file, (str, os.PathLike)):
+        with open(csv_file, "rb") as f:
+            return _leer_pedido(f)
+    return _leer_pedido(csv_file)
+
+
+def _leer_pedido(csv_file):
     cantidades_por_base = defaultdict(int)
 
-    reader = csv.reader(StringIO(csv_file.getvalue().decode("utf-8")))
-    next(reader, None)  # saltar encabezado
-    for row in reader:
-        if not row:
-            continue
-        panel_raw = row[0]
-        raw = row[1] if len(row) > 1 else "0"
-        cant = int(re.sub(r"\D", "", raw)) if re.search(r"\d", raw or "") else 0
-        if cant <= 0:
-            continue
-        base = parse_panel_code(panel_raw)["base"]  # ← quita sufijo después de '-'
-        cantidades_por_base[base] += cant
+    csv_file.seek(0)  # Streamlit reusa el mismo archivo en cada rerun
+    texto = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
+    try:
+        reader = csv.reader(texto)
+        next(reader, None)  # saltar encabezado
+        for row in reader:
+            if not row:
+                continue
+            panel_raw = row[0]
+            raw = row[1] if len(row) > 1 else "0"
+            cant = int(re.sub(r"\D", "", raw)) if re.search(r"\d", raw or "") else 0
+            if cant <= 0:
+                continue
+            base = parsear(panel_raw).base  # ← quita sufijo después de '-'
+            cantidades_por_base[base] += cant
+    finally:
+        texto.detach()  # no cerrar el archivo de quien llama
 
     df_pedido = pd.DataFrame(
         [
@@ -274,28 +578,9 @@ def cargar_pedido_agrupado(csv_file):
     return dict(cantidades_por_base), df_pedido
 
 
+@cache_por_huella()
 def menu_exportacion(resultado_despiece, tasa):
-    # Valores por defecto y tiempos predefinidos
-    tiempo_por_corte = 1.25
-    velocidad_sold = 200.0
-    entrada = (
-        "WF:2,SF:2,MF:2,CL:0.2,CLI:1.5,CLE:1.5,IC:4,OC:1,BH:5,BCP:1,CP:0.9,CE:0.6,CS:1"
-    )
-    tiempos_perforacion_por_tipo = {}
-    for parte in entrada.split(","):
-        tipo, val = parte.split(":", 1)
-        try:
-            tiempos_perforacion_por_tipo[tipo] = float(val)
-        except ValueError:
-            tiempos_perforacion_por_tipo[tipo] = 0.0
-
-    # Pre-cálculos (una sola vez)
-    tiempos_panel, tiempo_total_general = calcular_tiempos_por_panel(
-        resultado_despiece,
-        tiempo_por_corte_min=tiempo_por_corte,
-        velocidad_soldadura_mm_por_min=velocidad_sold,
-        tiempos_perforacion_por_tipo=tiempos_perforacion_por_tipo,
-    )
+    tiempos_panel, _ = calcular_tiempos_pedido(resultado_despiece)
 
     costos_por_panel, total_general_usd, detalle_costos, detalle_unidades = (
         calcular_costos_por_panel(resultado_despiece, tiempos_panel, tasa, True)
@@ -304,1029 +589,635 @@ def menu_exportacion(resultado_despiece, tasa):
     return costos_por_panel, total_general_usd, detalle_costos, detalle_unidades
 
 
+def calcular_tiempos_pedido(resultado_despiece):
+    """
+    Tiempos por panel con los parámetros de fabricación del módulo (los mismos
+    con que menu_exportacion calcula los costos).
+    Retorna (tiempos_panel, tiempo_total_general).
+    """
+    return calcular_tiempos_por_panel(
+        resultado_despiece,
+        tiempo_por_corte_min=TIEMPO_POR_CORTE_MIN,
+        velocidad_soldadura_mm_por_min=VELOCIDAD_SOLDADURA_MM_POR_MIN,
+        tiempos_perforacion_por_tipo=TIEMPOS_PERFORACION_POR_TIPO,
+    )
+
+
+def calcular_pedido(input_csv, tasa):
+    """
+    Corre todas las etapas del cálculo para un pedido.
+    Retorna un dict con los resultados que usan los reportes.
+    """
+    cantidades_por_base, df_pedido = cargar_pedido_agrupado(input_csv)
+    # Despiece SOLO desde el agrupado
+    resultado_despiece = calcular_despiece_desde_agrupado(cantidades_por_base)
+    tiempos_panel, tiempo_total_general = calcular_tiempos_pedido(resultado_despiece)
+    costos_por_panel, total_general_usd, detalle_costos, detalle_unidades = (
+        menu_exportacion(resultado_despiece, tasa)
+    )
+    detalle_por_pieza, total_insumos_pedido = calcular_detalle_insumos(
+        detalle_costos, detalle_unidades
+    )
+    resumen = resumen_totales_pedido(
+        resultado_despiece=resultado_despiece,
+        tiempos_panel=tiempos_panel,
+        tiempo_total_general=tiempo_total_general,
+        costos_por_panel=costos_por_panel,
+        total_general_usd=total_general_usd,
+        input_csv=input_csv,
+        cantidades_por_base=cantidades_por_base,  # 👈 ¡clave!
+    )
+    return {
+        "tasa": tasa,
+        "cantidades_por_base": cantidades_por_base,
+        "df_pedido": df_pedido,
+        "resultado_despiece": resultado_despiece,
+        "tiempos_panel": tiempos_panel,
+        "tiempo_total_general": tiempo_total_general,
+        "costos_por_panel": costos_por_panel,
+        "detalle_por_pieza": detalle_por_pieza,
+        "total_insumos_pedido": total_insumos_pedido,
+        "resumen": resumen,
+    }
+
+
 ###
 
 
 def _agregar_despiece_de_panel(panel_base, cantidad, despiece):
     """
-    Reusa la lógica que hoy tienes adentro del for del CSV,
-    pero recibiendo directamente (panel_base, cantidad).
+    Agrega a despiece (lista de dicts) las filas de `cantidad` paneles según
+    las reglas activas (ver reglas.py).
     panel_base debe venir SIN sufijos (ej. WF600X2250).
     """
-    panel_raw = panel_base  # compat
-    info = parse_panel_code(panel_raw)
-    tipo = info["tipo"]
-    panel = info["base"]
-    nums = info["nums"]
-    partes = info["partes"]
-
-    # --- Panel WF ---
-    if tipo == "WF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel WF:", panel_raw)
-            return
-
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": cantidad * ALTO,
-                }
-            )
-        elif 301 <= ANCHO <= 399:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 175,
-                    "total_mm": 175 * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        elif 580 <= ANCHO <= 600:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 160,
-                    "total_mm": 160 * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        else:
-            print("Pieza WF no corresponde al catálogo:", panel)
-            return
-
-        # Elementos base para WF
+    for panel, perfil, piezas, largo, total in despiece_de_base(panel_base):
         despiece.append(
             {
                 "panel": panel,
-                "perfil": "REFUERZOCHICO",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": cantidad * ANCHO,
+                "perfil": perfil,
+                "numero_piezas": piezas * cantidad,
+                "largo_pieza_mm": largo,
+                "total_mm": total * cantidad,
             }
         )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "REFUERZOGRANDE",
-                "numero_piezas": 6 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 6 * cantidad * ANCHO,
-            }
+
+
+class Despiece:
+    """
+    Despiece en formato columnar (un arreglo NumPy por columna).
+    Panel y perfil se guardan como códigos enteros que indexan las listas
+    `paneles` y `perfiles` (en orden de primera aparición).
+    Se puede recorrer como la lista de dicts de siempre:
+      {panel, perfil, numero_piezas, largo_pieza_mm, total_mm}
+    """
+
+    COLUMNAS = ("panel", "perfil", "numero_piezas", "largo_pieza_mm", "total_mm")
+
+    def __init__(
+        self,
+        paneles,
+        perfiles,
+        panel_cod,
+        perfil_cod,
+        numero_piezas,
+        largo_pieza_mm,
+        total_mm,
+    ):
+        self.paneles = list(paneles)
+        self.perfiles = list(perfiles)
+        self.panel_cod = np.asarray(panel_cod, dtype=np.int32)
+        self.perfil_cod = np.asarray(perfil_cod, dtype=np.int32)
+        self.numero_piezas = _columna_numerica(numero_piezas)
+        self.largo_pieza_mm = _columna_numerica(largo_pieza_mm)
+        self.total_mm = _columna_numerica(total_mm)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Construye un Despiece a partir de un DataFrame con las columnas de siempre."""
+        panel_cod, paneles = pd.factorize(df["panel"], sort=False)
+        perfil_cod, perfiles = pd.factorize(df["perfil"], sort=False)
+        return cls(
+            paneles.tolist(),
+            perfiles.tolist(),
+            panel_cod,
+            perfil_cod,
+            df["numero_piezas"].to_numpy(),
+            df["largo_pieza_mm"].to_numpy(),
+            df["total_mm"].to_numpy(),
         )
-        despiece.append(
-            {
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Construye un Despiece a partir de una lista de dicts."""
+        paneles, perfiles = {}, {}
+        panel_cod, perfil_cod, piezas, largos, totales = [], [], [], [], []
+        for it in filas:
+            panel_cod.append(paneles.setdefault(it["panel"], len(paneles)))
+            perfil_cod.append(perfiles.setdefault(it["perfil"], len(perfiles)))
+            piezas.append(it["numero_piezas"])
+            largos.append(it["largo_pieza_mm"])
+            totales.append(it["total_mm"])
+        return cls(paneles, perfiles, panel_cod, perfil_cod, piezas, largos, totales)
+
+    def __len__(self):
+        return len(self.panel_cod)
+
+    def __iter__(self):
+        for panel, perfil, n, largo, total in self.filas():
+            yield {
                 "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
+                "perfil": perfil,
+                "numero_piezas": n,
+                "largo_pieza_mm": largo,
+                "total_mm": total,
             }
-        )
 
-    # --- Panel SF ---
-    elif tipo == "SF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel SF:", panel_raw)
-            return
-
-        if 100 <= ANCHO <= 399:
-            pass
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        elif 580 <= ANCHO <= 600:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        else:
-            print("ANCHO no corresponde en panel SF:", panel)
-            return
-
-        if 100 <= ALTO <= 2249:
-            a = 280
-            l = 1
-            rg = 0
-            rch = 0
-            while a < ALTO:
-                if l == 1 and a == 280:
-                    a += 79
-                elif l == 1:
-                    rg += 1
-                    rch -= 1
-                    a += 160
-                else:
-                    rch += 1
-                    a += 140
-                l *= -1
-            if rg != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOGRANDE",
-                        "numero_piezas": rg * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rg * ANCHO * cantidad,
-                    }
-                )  # FIX
-            if rch != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": rch * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rch * ANCHO * cantidad,
-                    }
-                )
-        else:
-            print("ALTO no permitido en panel SF:", panel)
-            return
+    def filas(self):
+        """Filas como tuplas (panel, perfil, piezas, largo, total_mm)."""
+        paneles, perfiles = self.paneles, self.perfiles
+        paso = 65536  # convertimos por bloques para no duplicar todo en memoria
+        for i in range(0, len(self), paso):
+            bloque = slice(i, i + paso)
+            for pc, fc, n, largo, total in zip(
+                self.panel_cod[bloque].tolist(),
+                self.perfil_cod[bloque].tolist(),
+                self.numero_piezas[bloque].tolist(),
+                self.largo_pieza_mm[bloque].tolist(),
+                self.total_mm[bloque].tolist(),
+            ):
+                yield paneles[pc], perfiles[fc], n, largo, total
+
+    def __getitem__(self, i):
+        return {
+            "panel": self.paneles[self.panel_cod[i]],
+            "perfil": self.perfiles[self.perfil_cod[i]],
+            "numero_piezas": _escalar(self.numero_piezas[i]),
+            "largo_pieza_mm": _escalar(self.largo_pieza_mm[i]),
+            "total_mm": _escalar(self.total_mm[i]),
+        }
 
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
-            }
+    def __reduce__(self):
+        return (
+            Despiece,
+            (
+                self.paneles,
+                self.perfiles,
+                self.panel_cod,
+                self.perfil_cod,
+                self.numero_piezas,
+                self.largo_pieza_mm,
+                self.total_mm,
+            ),
         )
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
 
-    # --- Panel MF ---
-    elif tipo == "MF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel MF:", panel_raw)
-            return
-
-        a = 200
-        b = 0
-        c = 0
-        rg = 0
-        rch = 0
-        if 100 <= ALTO <= 2100:
-            a += 100
-            b = ALTO
-            while a < ALTO:
-                if a == 300:
-                    rch += 1
-                    a += 300
-                else:
-                    rg += 1
-                    a += 300
-                    c += 1
-            if c != 0:
-                b = ALTO - 275 - 300 * (c - 1)
-            if rg != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOGRANDE",
-                        "numero_piezas": rg * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rg * ANCHO * cantidad,
-                    }
-                )  # FIX
-            if rch != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": rch * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rch * ANCHO * cantidad,
-                    }
-                )
-        else:
-            print("ALTO no permitido en panel MF:", panel)
-            return
-
-        if 100 <= ANCHO <= 399:
-            pass
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": b,
-                    "total_mm": b * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": b,
-                    "total_mm": b * cantidad,
-                }
-            )
-
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
-            }
+    def __repr__(self):
+        return (
+            f"Despiece({len(self)} filas, {len(self.paneles)} paneles, "
+            f"{len(self.perfiles)} perfiles)"
         )
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
 
-    # --- Panel CL / CLI / CLE ---
-    elif tipo in ("CL", "CLI", "CLE"):
-        try:
-            if tipo == "CL":
-                # CL<ALTO>X<ANCHO>X<LARGO>
-                ALTO = int(partes[0][2:])
-                ANCHO = int(partes[1])
-                LARGO = int(partes[2])
-                ie = False
-                A = B = 0
-            else:
-                # CLI/CLE: CL?E<ALTO>X<ANCHO>X<A>X<B>
-                ALTO = int(partes[0][3:])
-                ANCHO = int(partes[1])
-                A = int(partes[2])
-                B = int(partes[3])
-                LARGO = 600
-                ie = True
-        except Exception:
-            print("Error extrayendo dimensiones en panel CL/CLE/CLI:", panel_raw)
-            return
-
-        if ALTO == 50:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL50",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
+    def suma_por_panel(self, valores):
+        """Suma `valores` (un arreglo por fila) agrupando por panel."""
+        return _sumar_por_grupo(self.panel_cod, valores, len(self.paneles))
 
-        elif ALTO == 70:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL70",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
+    def suma_por_perfil(self, valores):
+        """Suma `valores` (un arreglo por fila) agrupando por perfil."""
+        return _sumar_por_grupo(self.perfil_cod, valores, len(self.perfiles))
 
-        elif ALTO == 100:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL100",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
-        else:
-            # Caso especial 70x150
-            if ANCHO == 70 and ALTO == 150:
-                if not ie:
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": LARGO,
-                            "total_mm": LARGO * cantidad,
-                        }
-                    )
-                else:
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": A,
-                            "total_mm": A * cantidad,
-                        }
-                    )
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": B,
-                            "total_mm": B * cantidad,
-                        }
-                    )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZO_CL70",
-                        "numero_piezas": cantidad
-                        * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                        "largo_pieza_mm": 0,
-                        "total_mm": 0,
-                    }
-                )
-            else:
-                print("ALTO no reconocido para panel CL:", panel)
-                return
-
-    # --- Panel IC ---
-    elif tipo == "IC":
-        try:
-            ANCHO, ALTO, LARGO = nums[0], nums[1], nums[2]
-        except Exception:
-            print("Error extrayendo dimensiones en panel IC:", panel_raw)
-            return
-
-        if 100 <= LARGO <= 2400:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_IC",
-                    "numero_piezas": 2 * cantidad + (LARGO // 300 - 1) * cantidad,
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ICN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
-        else:
-            print("LARGO no permitido en panel IC:", panel)
-            return
-
-    # --- Panel OC ---
-    elif tipo == "OC":
-        try:
-            LARGO = nums[0]
-        except Exception:
-            print("Error extrayendo LARGO en panel OC:", panel_raw)
-            return
-        despiece.append(
+    def a_dataframe(self):
+        """DataFrame con panel y perfil como columnas categóricas."""
+        return pd.DataFrame(
             {
-                "panel": panel,
-                "perfil": "OCN",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": LARGO,
-                "total_mm": LARGO * cantidad,
+                "panel": pd.Categorical.from_codes(self.panel_cod, self.paneles),
+                "perfil": pd.Categorical.from_codes(self.perfil_cod, self.perfiles),
+                "numero_piezas": _como_float(self.numero_piezas),
+                "largo_pieza_mm": _como_float(self.largo_pieza_mm),
+                "total_mm": _como_float(self.total_mm),
             }
         )
 
-    # --- Panel BH ---
-    elif tipo == "BH":
-        try:
-            ANCHO, LARGO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel BH:", panel_raw)
-            return
-        if ANCHO in [100, 110, 120]:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BH120",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BH150",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
 
-    # --- Panel BCP ---
-    elif tipo == "BCP":
-        try:
-            ALTO, ANCHO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel BCP:", panel_raw)
-            return
-        if 100 <= ALTO <= 300 and 100 <= ANCHO <= 1800:
-            if 600 <= ANCHO <= 1349:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": ALTO * cantidad,
-                    }
-                )
-            elif 1350 <= ANCHO <= 1800:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": 2 * cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": 2 * ALTO * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BCPN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_50",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        else:
-            print("⚠️⚠️Pieza BCP no corresponde a ninguna del catálogo⚠️⚠️:", panel)
-            return
-
-    # --- Panel CP ---
-    elif tipo == "CP":
-        try:
-            ALTO, ANCHO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CP:", panel_raw)
-            return
-        if 100 <= ALTO <= 300 and 100 <= ANCHO <= 1800:
-            if 600 <= ANCHO <= 1349:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": ALTO * cantidad,
-                    }
-                )
-            elif 1350 <= ANCHO <= 1800:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": 2 * cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": 2 * ALTO * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BCPN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_50",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        else:
-            print("⚠️⚠️Pieza CP no corresponde a ninguna del catálogo⚠️⚠️:", panel)
-            return
-
-    # --- Panel CE ---
-    elif tipo == "CE":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CE:", panel_raw)
-            return
-        if 100 <= ALTO <= 499:
-            LARGO = ALTO
-            C = 1
-        elif 500 <= ALTO <= 899:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            LARGO = ALTO // 2
-            C = 2
-        elif 900 <= ALTO <= 1199:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": 2 * ANCHO * cantidad,
-                }
-            )
-            LARGO = (300 + (ALTO - 300) / 2) // 2  # tu regla de negocio
-            C = 2
-        elif ALTO == 1200:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": 3 * cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": 3 * ANCHO * cantidad,
-                }
-            )
-            LARGO = 300
-            C = 2
-        else:
-            print("Error en panel CE:", panel)
-            return
+def _columna_numerica(valores):
+    """
+    Arreglo int64 si los valores son enteros y float64 si son decimales. Si
+    una lista mezcla enteros y decimales (ej. los largos de CE, que salen de
+    una división), arreglo de objetos con los valores tal cual: cada fila
+    conserva su tipo al imprimirla y al sumarla, como en la lista de dicts.
+    """
+    arr = np.asarray(valores)
+    if arr.dtype.kind in "iub":
+        return arr.astype(np.int64, copy=False)
+    if arr.dtype.kind == "f":
+        if isinstance(valores, np.ndarray) or all(
+            isinstance(v, float) for v in valores
+        ):
+            return arr.astype(np.float64, copy=False)
+        return np.array(valores, dtype=object)
+    return arr
 
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_LOSA_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * ANCHO * cantidad,
-            }
-        )
-        if 100 <= ANCHO < 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        elif 300 <= ANCHO <= 399:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        elif 400 <= ANCHO <= 499:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": C * cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": C * LARGO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": C * cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": C * LARGO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
 
-    # --- Panel CS ---
-    elif tipo == "CS":
-        try:
-            ANCHO, LARGO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CS:", panel_raw)
-            return
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BCPN",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": LARGO,
-                "total_mm": LARGO * cantidad,
-            }
-        )
-        a = 100
-        c = 0
-        while a <= LARGO:
-            if a == 100:
-                a += 400
-            elif a == 500:
-                a += 400
-                c += 1
-            else:
-                a += 300
-                c += 1
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "REFUERZOGRANDE",
-                "numero_piezas": c * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": ANCHO * c * cantidad,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "TUBO",
-                "numero_piezas": c * cantidad,
-                "largo_pieza_mm": 47,
-                "total_mm": 47 * c * cantidad,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_LOSA_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * ANCHO * cantidad,
-            }
-        )
+def _escalar(valor):
+    """Valor de Python de un elemento (las columnas de objetos ya lo son)."""
+    return valor.item() if isinstance(valor, np.generic) else valor
 
-    else:
-        print("Tipo de panel no reconocido:", panel_raw)
-        return
+
+def _como_float(columna):
+    """La columna como float64 si es de objetos (tablas, grupos); si no, tal cual."""
+    return columna.astype(np.float64) if columna.dtype == object else columna
+
+
+def _sumar_por_grupo(codigos, valores, n):
+    """Suma por código de grupo; mantiene el tipo entero si los valores lo son."""
+    valores = np.asarray(valores)
+    if valores.dtype.kind in "iub":
+        out = np.zeros(n, dtype=np.int64)
+        np.add.at(out, codigos, valores)
+        return out
+    if valores.dtype == object:  # suma de Python: entero salvo que haya decimales
+        out = np.zeros(n, dtype=object)
+        np.add.at(out, codigos, valores)
+        return out
+    return np.bincount(codigos, weights=valores, minlength=n)
+
+
+def _factorizar(*columnas):
+    """
+    Agrupa filas por la combinación de `columnas`.
+    Retorna (codigos, primeras): el código de grupo de cada fila, con los grupos
+    numerados en orden de primera aparición, y la primera fila de cada grupo.
+    """
+    _, primeras, inversa = np.unique(
+        np.column_stack([_como_float(c) for c in columnas]),
+        axis=0,
+        return_index=True,
+        return_inverse=True,
+    )
+    orden = np.argsort(primeras, kind="stable")
+    rango = np.empty_like(orden)
+    rango[orden] = np.arange(len(orden))
+    return rango[inversa.ravel()], primeras[orden]
+
+
+def _como_despiece(despiece):
+    """Acepta un Despiece, un DataFrame o la lista de dicts de siempre."""
+    if isinstance(despiece, Despiece):
+        return despiece
+    if isinstance(despiece, pd.DataFrame):
+        return Despiece.desde_dataframe(despiece)
+    return Despiece.desde_filas(despiece)
+
+
+# Plantillas ya calculadas en otra sesión (ver catalogo.py): {base: filas}
+_plantillas_precargadas = {}
+
+
+def precargar_plantillas(plantillas):
+    """
+    Agrega plantillas de despiece {BASE: filas} calculadas con las mismas
+    reglas; _plantilla_despiece las usa sin evaluar las reglas.
+    """
+    _plantillas_precargadas.update(plantillas)
+    _evaluar_despiece.cache_clear()
+
+
+def usar_reglas(reglas):
+    """
+    Activa otro juego de reglas de despiece (dict con el formato de
+    reglas.REGLAS, o ruta de un JSON) y olvida los despieces calculados y
+    las plantillas precargadas con las reglas anteriores. Los resultados
+    que dependen del despiece quedan con otra huella (ver _huella_despiece),
+    así que tampoco se reutilizan.
+    """
+    if not isinstance(reglas, dict):
+        reglas = cargar_reglas(reglas)
+    activar_reglas(reglas)
+    _plantillas_precargadas.clear()
+    _evaluar_despiece.cache_clear()
+    calcular_despiece_desde_agrupado.cache_clear()
+
+
+def _iniciar_proceso(reglas, plantillas):
+    # initializer de los ProcessPoolExecutor: con "spawn" (macOS, Windows) los
+    # procesos parten de cero y no heredan las reglas ni las plantillas
+    activar_reglas(reglas)
+    precargar_plantillas(plantillas)
 
 
-def calcular_despiece_desde_agrupado(cantidades_por_base):
-    despiece = []
-    for base, cantidad in cantidades_por_base.items():
+def _ejecutor_de_procesos(procesos):
+    """
+    ProcessPoolExecutor cuyos procesos despiezan con las mismas reglas y
+    plantillas precargadas que este proceso.
+    """
+    return ProcessPoolExecutor(
+        procesos,
+        initializer=_iniciar_proceso,
+        initargs=(reglas_activas(), dict(_plantillas_precargadas)),
+    )
+
+
+@lru_cache(maxsize=8192)
+def _evaluar_despiece(base):
+    """
+    Evalúa las reglas de despiece de una BASE una sola vez (con cantidad 1);
+    el aviso, si lo hay, se imprime esa vez.
+    Retorna (plantilla, aviso) como reglas.evaluar_base.
+    """
+    precargada = _plantillas_precargadas.get(base)
+    if precargada is not None:
+        return precargada, None
+    filas, aviso = evaluar_base(base)
+    if aviso is not None:
+        print(aviso)
+    return filas, aviso
+
+
+def _plantilla_despiece(base):
+    """
+    Despiece de una BASE con cantidad 1. Todas las filas que emiten las
+    reglas son lineales en la cantidad, así que basta con escalar esta
+    plantilla.
+    Retorna una tupla inmutable de filas (panel, perfil, piezas, largo, total_mm).
+    """
+    return _evaluar_despiece(base)[0]
+
+
+def _base_con_aviso(base):
+    """True si las reglas no calzaron con la BASE (su despiece quedó incompleto)."""
+    return _evaluar_despiece(base)[1] is not None
+
+
+def _bloque_despiece(items):
+    """
+    Columnas del despiece para una lista de (base, cantidad), con los nombres
+    de panel y perfil codificados por orden de aparición dentro del bloque.
+    Retorna (paneles, perfiles, panel_cod, perfil_cod, piezas, largos, totales).
+    """
+    paneles, perfiles = {}, {}
+    panel_cod, perfil_cod, piezas, largos, totales, cantidades = [], [], [], [], [], []
+    for base, cantidad in items:
         if cantidad <= 0:
             continue
-        _agregar_despiece_de_panel(base, cantidad, despiece)
-    return despiece
+        for panel, perfil, n, largo, total in _evaluar_despiece(base)[0]:
+            panel_cod.append(paneles.setdefault(panel, len(paneles)))
+            perfil_cod.append(perfiles.setdefault(perfil, len(perfiles)))
+            piezas.append(n)
+            largos.append(largo)
+            totales.append(total)
+            cantidades.append(cantidad)
+
+    cantidades = np.asarray(cantidades, dtype=np.int64)
+    return (
+        list(paneles),
+        list(perfiles),
+        np.asarray(panel_cod, dtype=np.int32),
+        np.asarray(perfil_cod, dtype=np.int32),
+        _columna_numerica(piezas) * cantidades,
+        _columna_numerica(largos),
+        _columna_numerica(totales) * cantidades,
+    )
+
+
+def _huella_despiece(cantidades_por_base, procesos=1, umbral_paralelo=50_000):
+    # procesos y umbral no cambian el resultado; las reglas activas sí, y al
+    # entrar en la huella del despiece cambian también la de todo lo que se
+    # calcula a partir de él
+    return huella(huella_reglas(), huella_de(cantidades_por_base))
+
+
+@cache_por_huella(clave=_huella_despiece)
+def calcular_despiece_desde_agrupado(
+    cantidades_por_base, procesos=1, umbral_paralelo=50_000
+):
+    """
+    Despiece de todo el pedido a partir de {BASE: cantidad}.
+    Con procesos > 1 (None = todos los núcleos) y al menos umbral_paralelo
+    bases, reparte las bases en bloques consecutivos entre un
+    ProcessPoolExecutor y une los bloques en orden: el resultado es idéntico
+    al cálculo en serie.
+    Retorna un Despiece (columnar); se recorre como lista de dicts.
+    """
+    items = list(cantidades_por_base.items())
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(items) < umbral_paralelo:
+        return Despiece(*_bloque_despiece(items))
+
+    # varios bloques por proceso para repartir bien la carga
+    tam = -(-len(items) // (procesos * 4))
+    with _ejecutor_de_procesos(procesos) as executor:
+        bloques = list(
+            executor.map(
+                _bloque_despiece,
+                [items[i : i + tam] for i in range(0, len(items), tam)],
+            )
+        )
+
+    # Recodificar cada bloque a los códigos globales (orden de aparición)
+    paneles, perfiles = {}, {}
+    columnas = [[] for _ in range(5)]
+    for b_paneles, b_perfiles, b_panel_cod, b_perfil_cod, *numericas in bloques:
+        mapa_panel = np.array(
+            [paneles.setdefault(p, len(paneles)) for p in b_paneles], dtype=np.int32
+        )
+        mapa_perfil = np.array(
+            [perfiles.setdefault(p, len(perfiles)) for p in b_perfiles],
+            dtype=np.int32,
+        )
+        for columna, valores in zip(
+            columnas, [mapa_panel[b_panel_cod], mapa_perfil[b_perfil_cod], *numericas]
+        ):
+            columna.append(valores)
+    return Despiece(paneles, perfiles, *[np.concatenate(c) for c in columnas])
 
 
 def parse_panel_code(code):
     """
-    Normaliza y extrae partes del código de panel.
+    Normaliza y extrae partes del código de panel (ver codigos.parsear).
     Retorna:
       - tipo: prefijo alfabético (ej. WF, SF, MF, CL, CLE, CLI, CE, IC, OC, BH, BCP, CP, CS)
       - base: código sin sufijo después de '-' (ej. WF600X2250-ABC -> WF600X2250)
       - nums: lista de enteros en orden de aparición
       - partes: lista de strings separadas por 'X'
     """
-    base = code.split("-", 1)[0]  # quita sufijos después de "-"
-    m = re.match(r"([A-Za-z_]+)", base)  # soporta letras y guiones bajos
-    tipo = m.group(1) if m else ""
-    nums = list(map(int, re.findall(r"\d+", base)))
-    partes = re.split(r"[xX]", base)
-
-    # --- Normalización de tipos equivalentes ---
-    if tipo in ("ICC", "IC_Chico"):
-        tipo = "IC"
-    elif tipo in ("OCC", "OC_Chico", "OCH"):
-        tipo = "OC"
-
-    return {"tipo": tipo, "base": base, "nums": nums, "partes": partes}
+    info = parsear(code)
+    return {
+        "tipo": info.tipo,
+        "base": info.base,
+        "nums": list(info.nums),
+        "partes": list(info.partes),
+    }
 
 
-@st.cache_data
+@cache_por_huella()
 def calcular_totales_perfiles(despiece):
     """
     Agrupa el despiece por perfil y suma el total de piezas y milímetros.
+    Acepta un Despiece, un DataFrame o una lista de dicts; la suma se hace
+    en bloque sobre las columnas.
     Retorna un diccionario en el que cada clave es el perfil.
     """
-    totales = {}
-    for item in despiece:
-        perfil = item["perfil"]
-        if perfil not in totales:
-            totales[perfil] = {"numero_piezas": 0, "total_mm": 0}
-        totales[perfil]["numero_piezas"] += item["numero_piezas"]
-        totales[perfil]["total_mm"] += item["total_mm"]
-    return totales
-
-
-@st.cache_data
-def calcular_materia_prima_por_perfil(despiece, longitud_perfil=5850):
+    d = _como_despiece(despiece)
+    piezas = d.suma_por_perfil(d.numero_piezas).tolist()
+    totales_mm = d.suma_por_perfil(d.total_mm).tolist()
+    return {
+        perfil: {"numero_piezas": n, "total_mm": t}
+        for perfil, n, t in zip(d.perfiles, piezas, totales_mm)
+    }
+
+
+@cache_por_huella()
+def calcular_materia_prima_por_perfil(
+    despiece, longitud_perfil=5850, modo="ffd", tiempo_limite_s=10.0
+):
     """
     Para cada perfil del despiece, calcula cuántos perfiles de materia prima
     (de longitud fija, por defecto 5850 mm) se necesitan para cortar todas las piezas,
     utilizando first-fit decreasing para optimizar la utilización.
+    Las piezas se agrupan por largo (nunca se expande una lista por pieza) y
+    se colocan por lotes con corte.first_fit_decreasing.
+    Con modo="optimo" se resuelve el problema de corte por generación de
+    columnas (corte.corte_optimo), con tiempo_limite_s segundos para todo el
+    despiece.
     Retorna un diccionario con:
       - num_perfiles: cantidad de perfiles necesarios
       - waste_mm: desperdicio total en mm.
+      - cota_inferior, brecha: sólo en modo "optimo" (brecha relativa al óptimo)
     """
-    piezas_por_perfil = {}
-    for item in despiece:
-        perfil = item["perfil"]
-        largo = item["largo_pieza_mm"]
-        if largo <= 0:
-            continue
-        count = item["numero_piezas"]
-        piezas_por_perfil.setdefault(perfil, [])
-        piezas_por_perfil[perfil].extend([largo] * count)
+    return materia_prima_de_piezas(
+        _piezas_por_perfil(despiece), longitud_perfil, modo, tiempo_limite_s
+    )
+
+
+def materia_prima_de_piezas(
+    piezas_por_perfil, longitud_perfil=5850, modo="ffd", tiempo_limite_s=10.0
+):
+    """
+    Motor de calcular_materia_prima_por_perfil sobre piezas ya agrupadas:
+    piezas_por_perfil es {perfil: [(largo, cantidad)]} (ver _piezas_por_perfil),
+    por ejemplo las de varios pedidos juntas.
+    Retorna lo mismo que calcular_materia_prima_por_perfil.
+    """
+    if modo not in ("ffd", "optimo"):
+        raise ValueError(f"Modo de corte no reconocido: {modo}")
+    fin = time.monotonic() + tiempo_limite_s
 
     resultados = {}
-    for perfil, piezas in piezas_por_perfil.items():
-        piezas.sort(reverse=True)
-        bins = []
-        for pieza in piezas:
-            placed = False
-            for i in range(len(bins)):
-                if bins[i] >= pieza:
-                    bins[i] -= pieza
-                    placed = True
-                    break
-            if not placed:
-                bins.append(longitud_perfil - pieza)
-        num_perfiles = len(bins)
-        waste = sum(bins)
-        resultados[perfil] = {"num_perfiles": num_perfiles, "waste_mm": waste}
+    for n, (perfil, grupos) in enumerate(piezas_por_perfil.items()):
+        if modo == "optimo":
+            # el tiempo que queda se reparte entre los perfiles que faltan
+            ahora = time.monotonic()
+            limite = ahora + (fin - ahora) / (len(piezas_por_perfil) - n)
+            r = corte_optimo(grupos, longitud_perfil, limite=limite)
+            resultados[perfil] = {
+                "num_perfiles": r["num_perfiles"],
+                "waste_mm": r["waste_mm"],
+                "cota_inferior": r["cota_inferior"],
+                "brecha": r["brecha"],
+            }
+            continue
+        sobrantes = first_fit_decreasing(grupos, longitud_perfil)
+        resultados[perfil] = {
+            "num_perfiles": len(sobrantes),
+            "waste_mm": sum(sobrantes),
+        }
     return resultados
 
 
+def calcular_plan_de_corte(
+    despiece,
+    largos_barra=(5850,),
+    kerf_mm=0,
+    recorte_cabeza_mm=0,
+    recorte_cola_mm=0,
+    retazos=None,
+    tiempo_limite_s=10.0,
+    inventario=None,
+):
+    """
+    Plan de compra y corte por perfil con varios largos de barra comercial,
+    ancho de sierra (kerf) y recortes de cabeza/cola (ver corte.plan_de_corte).
+    largos_barra: lista común (ej. [5850, 6000, 6500]) o {perfil: [largos]}
+    retazos: {perfil: [largos]} con el inventario de retazos, que se usa primero.
+    inventario: retazos.InventarioRetazos; si se entrega, reemplaza a retazos:
+      se toman de ahí los retazos útiles y se le devuelven los consumidos y los
+      sobrantes nuevos, para reutilizarlos en el siguiente pedido.
+    Elige la mezcla de barras más barata según PESO_POR_PERFIL y
+    COSTO_ALUMINIO_USD_POR_KG (el costo de una barra es proporcional a su largo).
+    Retorna {perfil: plan} con las llaves de corte.plan_de_corte más:
+      - costo_usd: costo de las barras nuevas
+    """
+    retazos = retazos or {}
+    fin = time.monotonic() + tiempo_limite_s
+
+    planes = {}
+    piezas_por_perfil = _piezas_por_perfil(despiece)
+    for n, (perfil, grupos) in enumerate(piezas_por_perfil.items()):
+        disponibles = retazos.get(perfil, ())
+        if inventario is not None:
+            # solo sirven los retazos donde cabe al menos la pieza más corta
+            minimo = min(largo for largo, _ in grupos)
+            disponibles = inventario.disponibles(
+                perfil, minimo + kerf_mm + recorte_cabeza_mm + recorte_cola_mm
+            )
+        ahora = time.monotonic()
+        plan = plan_de_corte(
+            grupos,
+            largos_barra.get(perfil, (5850,))
+            if isinstance(largos_barra, dict)
+            else largos_barra,
+            kerf_mm=kerf_mm,
+            recorte_cabeza_mm=recorte_cabeza_mm,
+            recorte_cola_mm=recorte_cola_mm,
+            retazos=disponibles,
+            limite=ahora + (fin - ahora) / (len(piezas_por_perfil) - n),
+        )
+        if inventario is not None:
+            inventario.registrar_plan(perfil, plan)
+        plan["costo_usd"] = plan["largo_comprado_mm"] * MATERIA_PRIMA_POR_MM.get(
+            perfil, 0.0
+        )
+        planes[perfil] = plan
+    return planes
+
+
+def _piezas_por_perfil(despiece):
+    """
+    Piezas con largo > 0 agrupadas por perfil como listas de (largo, cantidad),
+    con los perfiles en orden de primera aparición.
+    """
+    d = _como_despiece(despiece)
+    validas = d.largo_pieza_mm > 0
+    perfil_cod = d.perfil_cod[validas]
+    largos = d.largo_pieza_mm[validas]
+    grupos, primeras = _factorizar(perfil_cod, largos)
+    cantidades = _sumar_por_grupo(grupos, d.numero_piezas[validas], len(primeras))
+
+    piezas_por_perfil = {}
+    for cod, largo, cantidad in zip(
+        perfil_cod[primeras].tolist(), largos[primeras].tolist(), cantidades.tolist()
+    ):
+        piezas_por_perfil.setdefault(d.perfiles[cod], []).append((largo, cantidad))
+    return piezas_por_perfil
+
+
 def calcular_totales_por_medida(despiece):
     """
     Agrupa el despiece por (perfil, largo_pieza_mm) y suma las cantidades y totales.
+    Acepta un Despiece, un DataFrame o una lista de dicts.
     Retorna un diccionario cuyas llaves son tuplas (perfil, largo_pieza_mm).
     """
-    totales_medida = {}
-    for item in despiece:
-        key = (item["perfil"], item["largo_pieza_mm"])
-        if key not in totales_medida:
-            totales_medida[key] = {"numero_piezas": 0, "total_mm": 0}
-        totales_medida[key]["numero_piezas"] += item["numero_piezas"]
-        totales_medida[key]["total_mm"] += item["total_mm"]
-    return totales_medida
+    d = _como_despiece(despiece)
+    grupos, primeras = _factorizar(d.perfil_cod, d.largo_pieza_mm)
+    piezas = _sumar_por_grupo(grupos, d.numero_piezas, len(primeras)).tolist()
+    totales_mm = _sumar_por_grupo(grupos, d.total_mm, len(primeras)).tolist()
+    perfiles = [d.perfiles[c] for c in d.perfil_cod[primeras].tolist()]
+    largos = d.largo_pieza_mm[primeras].tolist()
+    return {
+        (perfil, largo): {"numero_piezas": n, "total_mm": t}
+        for perfil, largo, n, t in zip(perfiles, largos, piezas, totales_mm)
+    }
 
 
+@cache_por_huella()
 def calcular_tiempos_por_panel(
     despiece,
     tiempo_por_corte_min=1.0,
@@ -1336,11 +1227,8 @@ def calcular_tiempos_por_panel(
     if tiempos_perforacion_por_tipo is None:
         tiempos_perforacion_por_tipo = {}
 
-    cortes_por_panel = {}
-    for item in despiece:
-        panel = item["panel"]
-        cortes_por_panel.setdefault(panel, 0)
-        cortes_por_panel[panel] += item["numero_piezas"]
+    d = _como_despiece(despiece)
+    cortes_por_panel = dict(zip(d.paneles, d.suma_por_panel(d.numero_piezas).tolist()))
 
     soldadura_mm_por_panel = calcular_soldadura_por_panel(despiece)
 
@@ -1356,8 +1244,7 @@ def calcular_tiempos_por_panel(
             else 0
         )
 
-        m = re.match(r"([A-Za-z]+)", panel)
-        tipo = m.group(1) if m else panel
+        tipo = parsear(panel).letras or panel
         t_perfor = cortes * tiempos_perforacion_por_tipo.get(tipo, 0)
         t_total = t_corte + t_sold + t_perfor
 
@@ -1397,17 +1284,14 @@ def calcular_costos_por_panel(
     if potencias_kw is None:
         potencias_kw = {"corte": 5.0, "soldadura": 4.4, "perforacion": 25.0}
 
-    # --- Agrupación preliminar (versión segura) ---
-    materia_prima_por_panel = {}
-    cortes_por_panel = {}
-    for it in despiece:
-        p = it["panel"]
-        d = materia_prima_por_panel.setdefault(p, {})
-        d[it["perfil"]] = d.get(it["perfil"], 0) + it["total_mm"]
-        cortes_por_panel[p] = cortes_por_panel.get(p, 0) + it["numero_piezas"]
+    # --- Agrupación por panel (group-by sobre el despiece columnar) ---
+    d = _como_despiece(despiece)
+    precio_mm = np.array([MATERIA_PRIMA_POR_MM.get(p, 0) for p in d.perfiles])
+    costo_mp_por_panel = d.suma_por_panel(d.total_mm * precio_mm[d.perfil_cod])
+    cortes_por_panel = dict(zip(d.paneles, d.suma_por_panel(d.numero_piezas).tolist()))
 
     # --- Longitud de soldadura por panel ---
-    soldadura_mm_por_panel = calcular_soldadura_por_panel(despiece)
+    soldadura_mm_por_panel = calcular_soldadura_por_panel(d)
 
     costos_por_panel = {}
     detalle_costos = {}
@@ -1415,12 +1299,9 @@ def calcular_costos_por_panel(
     total_general_usd = 0.0
 
     # --- Cálculo por panel ---
-    for panel, perfiles_mm in materia_prima_por_panel.items():
+    for i, panel in enumerate(d.paneles):
         # Materia prima
-        costo_mp = sum(
-            mm * MATERIA_PRIMA_POR_MM.get(perfil, 0)
-            for perfil, mm in perfiles_mm.items()
-        )
+        costo_mp = float(costo_mp_por_panel[i])
 
         # Mano de obra
         t = tiempos_por_panel.get(panel, {})
@@ -1468,18 +1349,18 @@ def calcular_costos_por_panel(
             costo_insumos += costo
 
         # --- Ojales y remaches (WF siempre; SF/MF solo si ANCHO=600) ---
-        info_panel = parse_panel_code(panel)
-        tipo_p = info_panel["tipo"]
-        nums_p = info_panel["nums"]
+        info_panel = parsear(panel)
+        tipo_p = info_panel.tipo
+        nums_p = info_panel.nums
 
         def _agregar_ojales_remaches(alto_mm):
             ojal_count = (alto_mm // 300) * 2
             remache_count = ojal_count * 2
             detalle_unidades[panel]["ojales"] = ojal_count
-            cost_ojal = ojal_count * 0.927
+            cost_ojal = ojal_count * COSTO_OJAL_USD
             detalle_costos[panel]["ojales"] = cost_ojal
             detalle_unidades[panel]["remaches"] = remache_count
-            cost_rem = remache_count * 0.135
+            cost_rem = remache_count * COSTO_REMACHE_USD
             detalle_costos[panel]["remaches"] = cost_rem
             return cost_ojal + cost_rem
 
@@ -1543,61 +1424,49 @@ def calcular_detalle_insumos(detalle_costos, detalle_unidades):
     return detalle_por_pieza, total_pedido
 
 
-@st.cache_data
+@cache_por_huella()
 def calcular_soldadura_por_panel(despiece):
-    # Agrupar items por panel
-    paneles = {}
-    for item in despiece:
-        panel_code = item["panel"]
-        paneles.setdefault(panel_code, []).append(item)
+    d = _como_despiece(despiece)
+    largo = d.largo_pieza_mm
+    piezas = d.numero_piezas
+
+    def _filas_de(*perfiles):
+        en = np.array([p in perfiles for p in d.perfiles], dtype=bool)
+        return en[d.perfil_cod]
+
+    # 1) Aportes por perfil de cada ítem (vectorizado sobre todas las filas)
+    ceil_120 = np.ceil(_como_float(largo) / 120).astype(np.int64)
+    aporte = np.where(
+        _filas_de("BASTIDOR_MURO_50", "BASTIDOR_LOSA_50"), (largo + 100) * piezas, 0
+    )
+    aporte += np.where(_filas_de("REFUERZOCHICO"), (ceil_120 * 100 + 240) * piezas, 0)
+    aporte += np.where(_filas_de("REFUERZOGRANDE"), (ceil_120 * 100 + 400) * piezas, 0)
+    por_pieza = {
+        "REFUERZO_CL70": 270,
+        "REFUERZO_CL100": 250,
+        "REFUERZO_CL50": 250,
+        "REFUERZO_IC": 300,
+        "TUBO": 157,
+    }
+    fijo = np.array([por_pieza.get(p, 0) for p in d.perfiles], dtype=np.int64)
+    aporte += fijo[d.perfil_cod] * piezas
+    # ALA_MURO / ALA_LOSA se cuentan una sola vez por panel (tu regla actual):
+    # sólo la primera fila ALA de cada panel aporta su largo
+    filas_ala = np.flatnonzero(_filas_de("ALA_MURO", "ALA_LOSA"))
+    _, primeras = np.unique(d.panel_cod[filas_ala], return_index=True)
+    np.add.at(aporte, filas_ala[primeras], largo[filas_ala[primeras]])
+    # Otros perfiles: sin aporte de soldadura
+
+    soldadura_por_perfiles = d.suma_por_panel(aporte).tolist()
 
     soldadura_por_panel = {}
 
-    for panel, items in paneles.items():
-        soldadura_total = 0
-        ala_muro_contado = (
-            False  # ALA_MURO / ALA_LOSA se cuentan una sola vez (tu regla actual)
-        )
+    for i, (panel, info) in enumerate(zip(d.paneles, parse_many(d.paneles))):
+        soldadura_total = soldadura_por_perfiles[i]
 
         # Info base del código (tipo, números, etc.)
-        info = parse_panel_code(panel)
-        tipo = info["tipo"]
-        nums = info["nums"]
-
-        # 1) Aportes por perfil de cada ítem
-        for it in items:
-            perfil = it["perfil"]
-            largo = it["largo_pieza_mm"]
-            piezas = it["numero_piezas"]
-
-            if perfil in ("ALA_MURO", "ALA_LOSA"):
-                # regla actual: contar una sola vez por panel
-                if not ala_muro_contado:
-                    soldadura_total += largo
-                    ala_muro_contado = True
-
-            elif perfil in ("BASTIDOR_MURO_50", "BASTIDOR_LOSA_50"):
-                soldadura_total += (largo + 100) * piezas
-
-            elif perfil == "REFUERZOCHICO":
-                soldadura_total += (math.ceil(largo / 120) * 100 + 240) * piezas
-
-            elif perfil == "REFUERZOGRANDE":
-                soldadura_total += (math.ceil(largo / 120) * 100 + 400) * piezas
-
-            elif perfil == "REFUERZO_CL70":
-                soldadura_total += 270 * piezas
-
-            elif perfil in ("REFUERZO_CL100", "REFUERZO_CL50"):
-                soldadura_total += 250 * piezas
-
-            elif perfil == "REFUERZO_IC":
-                soldadura_total += 300 * piezas
-
-            elif perfil == "TUBO":
-                soldadura_total += 157 * piezas
-
-            # Otros perfiles: sin aporte de soldadura
+        tipo = info.tipo
+        nums = info.nums
 
         # 2) Extras por tipo de panel (manteniendo tu lógica original)
 
@@ -1660,7 +1529,8 @@ def calcular_soldadura_por_panel(despiece):
 
     return soldadura_por_panel
 
-@st.cache_data
+
+@cache_por_huella()
 def resumen_totales_pedido(
     resultado_despiece,
     tiempos_panel,
@@ -1680,7 +1550,7 @@ def resumen_totales_pedido(
       - costo_promedio_usd_m2
     """
     # 1) Total piezas del despiece
-    total_piezas_despiece = sum(it.get("numero_piezas", 0) for it in resultado_despiece)
+    total_piezas_despiece = int(_como_despiece(resultado_despiece).numero_piezas.sum())
 
     # 3) Totales
     total_paneles = sum(cantidades_por_base.values())
@@ -1736,12 +1606,12 @@ def calcular_area(dimensiones):
     return ancho, largo, area
 
 
-@st.cache_data
+@cache_por_huella()
 def calcular_areas_por_base(cantidades_por_base):
     filas = []
     total_area = 0.0
     for base, cant in sorted(cantidades_por_base.items(), key=lambda x: x[0].lower()):
-        _, _, area_unit = calcular_area(parse_panel_code(base)["nums"])
+        _, _, area_unit = calcular_area(parsear(base).nums)
         if area_unit <= 0:
             continue
         area_total = area_unit * cant
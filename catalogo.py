@@ -0,0 +1,184 @@
+"""
+Catálogo persistente de paneles ya calculados, compartido entre sesiones.
+
+Por cada BASE se guarda su plantilla de despiece (cantidad 1), la soldadura,
+el área y los tiempos unitarios, en SQLite. Las entradas llevan la versión
+del catálogo (huella del código de las reglas y de las constantes de costo):
+si algo cambia, las entradas viejas dejan de verse solas. web.py y script.py
+lo cargan al partir (calentar), así que las bases conocidas no vuelven a
+pasar por las reglas de despiece.
+"""
+
+import contextlib
+import io
+import json
+import sqlite3
+import threading
+
+import backend
+from backend import (
+    Despiece,
+    _base_con_aviso,
+    _bloque_despiece,
+    _plantilla_despiece,
+    calcular_area,
+    calcular_soldadura_por_panel,
+    calcular_tiempos_pedido,
+    precargar_plantillas,
+)
+from codigos import parsear
+from huellas import huella
+from modelo_costos import version_reglas
+
+COLUMNAS = (
+    "soldadura_mm",
+    "area_m2",
+    "tiempo_corte_min",
+    "tiempo_soldadura_min",
+    "tiempo_perforacion_min",
+    "tiempo_total_min",
+)
+
+
+def version_catalogo():
+    """Huella de las reglas (ver modelo_costos.version_reglas) y las constantes."""
+    return huella(
+        version_reglas(),
+        sorted(backend.PESO_POR_PERFIL.items()),
+        sorted((k, sorted(v.items())) for k, v in backend.INSUMOS.items()),
+        sorted(backend.MANO_OBRA.items()),
+        backend.TIEMPO_POR_CORTE_MIN,
+        backend.VELOCIDAD_SOLDADURA_MM_POR_MIN,
+    )
+
+
+class Catalogo:
+    """
+    Catálogo en un archivo SQLite (":memory:" para uno temporal). Se puede
+    usar desde varios hilos (ej. las sesiones de Streamlit).
+    Sin version, sigue a las reglas activas: si cambian (backend.usar_reglas)
+    pasa a leer y escribir las entradas de la versión nueva.
+    """
+
+    def __init__(self, ruta="catalogo.db", version=None):
+        self.ruta = ruta
+        self._version_fija = version
+        self._lock = threading.Lock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        with self.conexion:
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS paneles ("
+                " version TEXT NOT NULL,"
+                " base TEXT NOT NULL,"
+                " plantilla TEXT NOT NULL,"
+                + "".join(f" {c} REAL NOT NULL," for c in COLUMNAS)
+                + " PRIMARY KEY (version, base))"
+            )
+        self.version = None
+        self._sincronizar()
+
+    def _sincronizar(self):
+        # versión vigente; al cambiar, las bases conocidas son las de esa versión
+        version = self._version_fija or version_catalogo()
+        if version != self.version:
+            self.version = version
+            self._conocidas = {
+                base
+                for (base,) in self.conexion.execute(
+                    "SELECT base FROM paneles WHERE version = ?", (version,)
+                )
+            }
+
+    def __len__(self):
+        return len(self._conocidas)
+
+    def __contains__(self, base):
+        return base in self._conocidas
+
+    def __repr__(self):
+        return f"Catalogo({self.ruta!r}, {len(self)} bases)"
+
+    def registrar(self, bases):
+        """
+        Calcula y guarda las bases que todavía no están. Las bases con
+        aviso (códigos no reconocidos o medidas fuera de las reglas) no se
+        guardan: su despiece queda vacío o incompleto, y así el aviso se sigue
+        mostrando en las sesiones siguientes.
+        Retorna la cantidad de bases agregadas.
+        """
+        with self._lock:
+            self._sincronizar()
+            nuevas = [b for b in dict.fromkeys(bases) if b not in self._conocidas]
+            if not nuevas:
+                return 0
+            # los avisos de las bases no reconocidas ya salieron con su pedido
+            with contextlib.redirect_stdout(io.StringIO()):
+                d = Despiece(*_bloque_despiece([(b, 1) for b in nuevas]))
+            soldadura = calcular_soldadura_por_panel(d)
+            tiempos, _ = calcular_tiempos_pedido(d)
+            filas = [
+                (
+                    self.version,
+                    base,
+                    json.dumps(_plantilla_despiece(base)),
+                    soldadura[base],
+                    calcular_area(parsear(base).nums)[2],
+                    tiempos[base]["tiempo_corte_min"],
+                    tiempos[base]["tiempo_soldadura_min"],
+                    tiempos[base]["tiempo_perforacion_min"],
+                    tiempos[base]["tiempo_total_min"],
+                )
+                for base in nuevas
+                if base in tiempos and not _base_con_aviso(base)
+            ]
+            with self.conexion:
+                self.conexion.executemany(
+                    f"INSERT OR IGNORE INTO paneles VALUES ({','.join('?' * 9)})",
+                    filas,
+                )
+            self._conocidas.update(fila[1] for fila in filas)
+            return len(filas)
+
+    def obtener(self, base):
+        """
+        Retorna {plantilla, soldadura_mm, area_m2, tiempo_*_min} de una base
+        (valores para un panel), o None si no está en el catálogo.
+        """
+        fila = self.conexion.execute(
+            f"SELECT plantilla, {', '.join(COLUMNAS)} FROM paneles"
+            " WHERE version = ? AND base = ?",
+            (self.version, base),
+        ).fetchone()
+        if fila is None:
+            return None
+        plantilla, *valores = fila
+        return {"plantilla": _desde_json(plantilla), **dict(zip(COLUMNAS, valores))}
+
+    def plantillas(self):
+        """Retorna {base: plantilla de despiece} de todo el catálogo."""
+        filas = self.conexion.execute(
+            "SELECT base, plantilla FROM paneles WHERE version = ?", (self.version,)
+        )
+        return {base: _desde_json(plantilla) for base, plantilla in filas}
+
+    def calentar(self):
+        """Precarga las plantillas en backend. Retorna cuántas se cargaron."""
+        with self._lock:
+            self._sincronizar()
+        plantillas = self.plantillas()
+        precargar_plantillas(plantillas)
+        return len(plantillas)
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+def _desde_json(plantilla):
+    return tuple(tuple(fila) for fila in json.loads(plantilla))
+
+
+def calentar(ruta="catalogo.db"):
+    """Abre el catálogo y precarga sus plantillas. Retorna el Catalogo."""
+    catalogo = Catalogo(ruta)
+    catalogo.calentar()
+    return catalogo
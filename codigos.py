@@ -0,0 +1,70 @@
+"""
+Parser de códigos de panel (ej. WF600X2250-ABC).
+
+Los patrones se compilan una vez y cada código se parsea una sola vez: los
+resultados son inmutables (tuplas) y quedan en un caché acotado, así que todas
+las etapas del cálculo comparten el mismo objeto para la misma base.
+"""
+
+import sys
+from collections import namedtuple
+from functools import lru_cache
+import re
+
+_TIPO = re.compile(r"[A-Za-z_]+")  # soporta letras y guiones bajos
+_LETRAS = re.compile(r"[A-Za-z]+")
+_NUMEROS = re.compile(r"\d+")
+_SEPARADOR = re.compile(r"[xX]")
+
+# --- Normalización de tipos equivalentes ---
+TIPOS_EQUIVALENTES = {
+    "ICC": "IC",
+    "IC_Chico": "IC",
+    "OCC": "OC",
+    "OC_Chico": "OC",
+    "OCH": "OC",
+}
+
+CodigoPanel = namedtuple("CodigoPanel", ["tipo", "base", "nums", "partes", "letras"])
+CodigoPanel.__doc__ = """
+Código de panel parseado:
+  - tipo: prefijo alfabético normalizado (ej. WF, SF, MF, CL, CLE, CLI, CE, IC, OC, BH, BCP, CP, CS)
+  - base: código sin sufijo después de '-' (ej. WF600X2250-ABC -> WF600X2250)
+  - nums: tupla de enteros en orden de aparición
+  - partes: tupla de strings separadas por 'X'
+  - letras: prefijo de sólo letras, sin normalizar (ej. IC_Chico -> IC, OCH -> OCH)
+"""
+
+
+@lru_cache(maxsize=65536)
+def _parsear_base(base):
+    m = _TIPO.match(base)
+    tipo = m.group(0) if m else ""
+    tipo = sys.intern(TIPOS_EQUIVALENTES.get(tipo, tipo))
+    m = _LETRAS.match(base)
+    return CodigoPanel(
+        tipo=tipo,
+        base=sys.intern(base),
+        nums=tuple(map(int, _NUMEROS.findall(base))),
+        partes=tuple(_SEPARADOR.split(base)),
+        letras=sys.intern(m.group(0)) if m else "",
+    )
+
+
+@lru_cache(maxsize=65536)
+def parsear(code):
+    """
+    Parsea un código de panel (con o sin sufijo después de '-').
+    Retorna un CodigoPanel compartido por todos los códigos con la misma base.
+    """
+    return _parsear_base(code.split("-", 1)[0])  # quita sufijos después de "-"
+
+
+def parse_many(codes):
+    """
+    Parsea una columna completa de códigos (lista, Series, etc.) en una pasada:
+    cada código distinto se parsea una vez.
+    Retorna una lista de CodigoPanel en el mismo orden que codes.
+    """
+    parseados = {code: parsear(code) for code in dict.fromkeys(codes)}
+    return [parseados[code] for code in codes]
@@ -0,0 +1,420 @@
+"""
+Motor de corte de materia prima (bin packing 1D sobre barras de perfil).
+
+Las piezas llegan agrupadas como (largo, cantidad): un despiece grande tiene
+pocos largos distintos y cantidades enormes, así que nunca expandimos una
+lista con una entrada por pieza.
+"""
+
+import bisect
+import math
+import time
+
+import numpy as np
+
+_SIN_BARRA = float("-inf")
+
+
+class _ArbolMaximos:
+    """
+    Árbol de segmentos con el sobrante máximo de cada rango de barras.
+    Permite encontrar en O(log n) la primera barra (la de menor índice)
+    donde todavía cabe una pieza, que es justo lo que pide first-fit.
+    """
+
+    def __init__(self, capacidad):
+        self.n = 1
+        while self.n < max(capacidad, 1):
+            self.n *= 2
+        self.arbol = [_SIN_BARRA] * (2 * self.n)
+
+    def actualizar(self, i, valor):
+        i += self.n
+        self.arbol[i] = valor
+        i //= 2
+        while i:
+            izq, der = self.arbol[2 * i], self.arbol[2 * i + 1]
+            self.arbol[i] = izq if izq >= der else der
+            i //= 2
+
+    def primera_con(self, minimo):
+        """Índice de la primera barra con sobrante >= minimo, o -1."""
+        if self.arbol[1] < minimo:
+            return -1
+        i = 1
+        while i < self.n:
+            i = 2 * i if self.arbol[2 * i] >= minimo else 2 * i + 1
+        return i - self.n
+
+
+def _cota_barras(grupos, longitud_perfil):
+    """Máximo de barras que puede abrir first-fit (sin compartir ninguna)."""
+    total = 0
+    for largo, cantidad in grupos:
+        if largo > longitud_perfil:
+            total += cantidad
+        else:
+            por_barra = int(longitud_perfil // largo)
+            total += -(-cantidad // por_barra)
+    return total
+
+
+def first_fit_decreasing(grupos, longitud_perfil=5850):
+    """
+    First-fit decreasing por lotes de piezas iguales.
+    grupos: iterable de (largo, cantidad) con largo > 0.
+    El resultado es idéntico al FFD pieza a pieza de siempre (misma cantidad
+    de barras y mismos sobrantes), pero cada lote de piezas iguales se coloca
+    de una vez y la barra destino se busca en un árbol de segmentos,
+    O(n log n) en vez de O(piezas · barras).
+    Retorna la lista de sobrantes (mm) de cada barra, en orden de apertura.
+    Una pieza más larga que la barra ocupa una barra propia con sobrante negativo.
+    """
+    grupos = sorted(
+        ((largo, cantidad) for largo, cantidad in grupos if cantidad > 0),
+        key=lambda g: g[0],
+        reverse=True,
+    )
+    sobrantes = []
+    arbol = _ArbolMaximos(_cota_barras(grupos, longitud_perfil))
+
+    for largo, cantidad in grupos:
+        restantes = cantidad
+
+        # 1) Rellenar barras ya abiertas, siempre la primera donde quepa
+        while restantes:
+            i = arbol.primera_con(largo)
+            if i < 0:
+                break
+            caben = min(restantes, int(sobrantes[i] // largo))
+            sobrantes[i] -= caben * largo
+            arbol.actualizar(i, sobrantes[i])
+            restantes -= caben
+
+        if not restantes:
+            continue
+
+        # 2) Abrir barras nuevas para el resto del lote
+        if largo > longitud_perfil:
+            nuevas = [longitud_perfil - largo] * restantes
+        else:
+            por_barra = int(longitud_perfil // largo)
+            llenas, resto = divmod(restantes, por_barra)
+            nuevas = [longitud_perfil - por_barra * largo] * llenas
+            if resto:
+                nuevas.append(longitud_perfil - resto * largo)
+        for sobrante in nuevas:
+            arbol.actualizar(len(sobrantes), sobrante)
+            sobrantes.append(sobrante)
+
+    return sobrantes
+
+
+class _Mochila:
+    """
+    Mochila acotada: max sum(valores[i] * a[i]) con sum(pesos[i] * a[i]) <= c
+    y 0 <= a[i] <= cotas[i], resuelta para TODAS las capacidades c <= capacidad
+    a la vez. Cada ítem se parte en potencias de 2 y se resuelve como mochila
+    0/1 vectorizada sobre el arreglo de capacidades.
+    """
+
+    def __init__(self, pesos, valores, cotas, capacidad):
+        self.pesos = pesos
+        self.partes = []  # (ítem, copias)
+        for i, cota in enumerate(cotas):
+            if valores[i] <= 0 or pesos[i] > capacidad:
+                continue
+            k = 1
+            while cota > 0:
+                t = min(k, cota)
+                self.partes.append((i, t))
+                cota -= t
+                k *= 2
+
+        self.valor = np.zeros(capacidad + 1)
+        self.tomas = np.zeros((len(self.partes), capacidad + 1), dtype=bool)
+        dp = self.valor
+        for j, (i, t) in enumerate(self.partes):
+            peso = pesos[i] * t
+            if peso > capacidad:
+                continue
+            candidato = dp[: capacidad + 1 - peso] + (valores[i] * t - 1e-12)
+            np.greater(candidato, dp[peso:], out=self.tomas[j, peso:])
+            np.maximum(dp[peso:], candidato, out=dp[peso:])
+
+    def patron(self, capacidad):
+        """Cantidad de cada ítem en la mejor mochila de esa capacidad."""
+        patron = [0] * len(self.pesos)
+        c = capacidad
+        for j in range(len(self.partes) - 1, -1, -1):
+            if self.tomas[j, c]:
+                i, t = self.partes[j]
+                patron[i] += t
+                c -= self.pesos[i] * t
+        return patron
+
+
+def _generacion_de_columnas(pesos, demanda, capacidades, costos, limite):
+    """
+    LP de corte con varios largos de barra (Gilmore-Gomory):
+      min sum(costo de cada barra usada)  s.a.  cada pieza i se corta demanda[i] veces
+    El maestro se resuelve con un simplex revisado pequeño (una fila por largo
+    distinto de pieza) y los patrones nuevos salen de una mochila por capacidad.
+    pesos: largo entero que ocupa cada pieza; todas caben en alguna barra.
+    limite: instante (time.monotonic) en que se corta la búsqueda.
+    Retorna (cota_lp, patrones, resto):
+      - cota_lp: cota inferior válida del costo (el óptimo del LP si convergió;
+        si no, la cota de Farley)
+      - patrones: lista de (barra, patron, veces) enteros, redondeando hacia abajo
+      - resto: demanda que falta cortar después del redondeo
+    """
+    m = len(pesos)
+    demanda = np.asarray(demanda, dtype=float)
+    cap_max = max(capacidades)
+    cotas = [min(int(d), cap_max // p) for p, d in zip(pesos, demanda.tolist())]
+
+    # Base inicial: patrones homogéneos en la barra más barata por pieza
+    base = np.zeros((m, m))
+    costo_base = np.zeros(m)
+    barra_base = [0] * m
+    for i, p in enumerate(pesos):
+        s = min(
+            (s for s, cap in enumerate(capacidades) if cap >= p),
+            key=lambda s: costos[s] / (capacidades[s] // p),
+        )
+        base[i, i] = capacidades[s] // p
+        costo_base[i] = costos[s]
+        barra_base[i] = s
+    x = demanda / np.diag(base)
+    cota_lp = 0.0
+
+    for _ in range(50 * m + 100):
+        duales = np.linalg.solve(base.T, costo_base)
+        mochila = _Mochila(pesos, duales.tolist(), cotas, cap_max)
+        z = float(costo_base @ x)
+        razon, entra = max(
+            (float(mochila.valor[cap]) / costos[s], s)
+            for s, cap in enumerate(capacidades)
+        )
+        if razon <= 1 + 1e-9:
+            cota_lp = z  # óptimo del LP
+            break
+        cota_lp = max(cota_lp, z / razon)  # cota de Farley
+        if limite is not None and time.monotonic() > limite:
+            break
+
+        # Prueba de razón: sale la columna que primero llega a cero
+        columna = np.array(mochila.patron(capacidades[entra]), dtype=float)
+        direccion = np.linalg.solve(base, columna)
+        positivas = direccion > 1e-12
+        if not positivas.any():
+            break
+        razones = np.full(m, np.inf)
+        razones[positivas] = x[positivas] / direccion[positivas]
+        sale = int(np.argmin(razones))
+        theta = razones[sale]
+        x = np.maximum(x - theta * direccion, 0.0)
+        x[sale] = theta
+        base[:, sale] = columna
+        costo_base[sale] = costos[entra]
+        barra_base[sale] = entra
+
+    veces = np.floor(x + 1e-9)
+    patrones = [
+        (barra_base[j], [int(round(n)) for n in base[:, j].tolist()], int(veces[j]))
+        for j in range(m)
+        if veces[j] > 0
+    ]
+    resto = [int(round(r)) for r in (demanda - base @ veces).tolist()]
+    return cota_lp, patrones, resto
+
+
+def corte_optimo(grupos, longitud_perfil=5850, limite=None):
+    """
+    Problema de corte 1D (cutting stock) por generación de columnas
+    (Gilmore-Gomory) sobre los largos distintos, con sus multiplicidades.
+    La solución entera redondea hacia abajo los patrones del LP y corta el
+    resto con first-fit decreasing; si FFD solo sale mejor, se usa FFD.
+    limite: instante (time.monotonic) en que se corta la búsqueda.
+    Retorna un diccionario con:
+      - num_perfiles, waste_mm: como en FFD
+      - cota_inferior: cota inferior de barras (LP / Farley y largo total)
+      - brecha: (num_perfiles - cota_inferior) / num_perfiles
+      - sobrantes: sobrante (mm) de cada barra
+    """
+    grupos = [(largo, cantidad) for largo, cantidad in grupos if cantidad > 0]
+    largas = [(largo, c) for largo, c in grupos if largo > longitud_perfil]
+    grupos = [(largo, c) for largo, c in grupos if largo <= longitud_perfil]
+    sobrantes_largas = [
+        longitud_perfil - largo for largo, c in largas for _ in range(c)
+    ]
+
+    ffd = first_fit_decreasing(grupos, longitud_perfil)
+    total_mm = sum(largo * c for largo, c in grupos)
+    cota = math.ceil(total_mm / longitud_perfil - 1e-9) if grupos else 0
+    mejor = ffd
+
+    if grupos and len(ffd) > cota:
+        cota_lp, patrones, resto = _generacion_de_columnas(
+            [int(math.ceil(largo)) for largo, _ in grupos],
+            [c for _, c in grupos],
+            [longitud_perfil],
+            [1.0],
+            limite,
+        )
+        if all(float(largo).is_integer() for largo, _ in grupos):
+            # con largos fraccionarios el LP se armó con largos redondeados
+            # hacia arriba y su valor ya no es cota
+            cota = max(cota, math.ceil(cota_lp - 1e-6))
+        sobrantes = []
+        for _, patron, veces in patrones:
+            usado = sum(largo * n for (largo, _), n in zip(grupos, patron))
+            sobrantes.extend([longitud_perfil - usado] * veces)
+        sobrantes.extend(
+            first_fit_decreasing(
+                [(largo, r) for (largo, _), r in zip(grupos, resto)], longitud_perfil
+            )
+        )
+        if len(sobrantes) < len(mejor):
+            mejor = sobrantes
+
+    num_perfiles = len(mejor) + len(sobrantes_largas)
+    cota_inferior = cota + len(sobrantes_largas)
+    return {
+        "num_perfiles": num_perfiles,
+        "waste_mm": sum(mejor) + sum(sobrantes_largas),
+        "cota_inferior": cota_inferior,
+        "brecha": (num_perfiles - cota_inferior) / num_perfiles
+        if num_perfiles
+        else 0.0,
+        "sobrantes": mejor + sobrantes_largas,
+    }
+
+
+def plan_de_corte(
+    grupos,
+    largos_barra=(5850,),
+    kerf_mm=0,
+    recorte_cabeza_mm=0,
+    recorte_cola_mm=0,
+    retazos=(),
+    limite=None,
+):
+    """
+    Plan de corte con varios largos de barra, ancho de sierra y recortes.
+    Cada barra (o retazo) de largo S deja S - recorte_cabeza_mm - recorte_cola_mm
+    mm útiles y cada pieza ocupa su largo + kerf_mm (un corte por pieza).
+    Los retazos (largos del inventario, costo cero) se usan primero, con
+    best-fit decreasing; el resto se corta en barras nuevas eligiendo la mezcla
+    de largos que compra menos milímetros (el costo es proporcional al largo):
+    se comparan FFD en cada largo (bajando cada barra al largo más corto donde
+    cabe su contenido) y la generación de columnas con varios largos.
+    Retorna un diccionario con:
+      - barras: {largo: cantidad} de barras nuevas
+      - num_perfiles: total de barras nuevas
+      - largo_comprado_mm: suma de los largos de barras nuevas
+      - cota_inferior_mm: cota inferior de largo_comprado_mm
+      - retazos_usados: largos de los retazos consumidos
+      - waste_mm: material (barras nuevas + retazos usados) que no queda en piezas
+      - sobrantes: lista de (largo de la barra o retazo, sobrante útil en mm)
+      - retazos_nuevos: largo físico de cada sobrante (el útil más el recorte
+        de cola, que sigue pegado al retazo): lo que vuelve al inventario. Al
+        reusarlo se le vuelven a descontar los recortes, una sola vez.
+    """
+    util = recorte_cabeza_mm + recorte_cola_mm
+    largos_barra = [s for s in sorted(set(largos_barra)) if s - util > 0]
+    if not largos_barra:
+        raise ValueError(
+            "Ningún largo de barra deja largo útil después de los recortes"
+        )
+    capacidades = [s - util for s in largos_barra]
+    pendientes = {}
+    for largo, cantidad in grupos:
+        if cantidad > 0:
+            pendientes[largo + kerf_mm] = pendientes.get(largo + kerf_mm, 0) + cantidad
+    total_piezas_mm = sum(
+        (peso - kerf_mm) * cantidad for peso, cantidad in pendientes.items()
+    )
+
+    # 1) Retazos del inventario: best-fit decreasing (el retazo más corto donde quepa)
+    libres = sorted((r - util, i) for i, r in enumerate(retazos) if r - util > 0)
+    usados = {}
+    for peso in sorted(pendientes, reverse=True):
+        while pendientes[peso]:
+            k = bisect.bisect_left(libres, (peso, -1))
+            if k == len(libres):
+                break
+            cap, i = libres.pop(k)
+            n = min(pendientes[peso], int(cap // peso))
+            pendientes[peso] -= n
+            usados[i] = cap - n * peso
+            bisect.insort(libres, (usados[i], i))
+
+    # 2) Piezas que no caben en ninguna barra: una barra de las más largas cada una
+    sobrantes = [(retazos[i], sobrante) for i, sobrante in usados.items()]
+    barras = {}
+    for peso in [p for p in pendientes if p > capacidades[-1]]:
+        barras[largos_barra[-1]] = barras.get(largos_barra[-1], 0) + pendientes[peso]
+        sobrantes.extend(
+            [(largos_barra[-1], capacidades[-1] - peso)] * pendientes[peso]
+        )
+        pendientes[peso] = 0
+    resto = [(p, c) for p, c in pendientes.items() if c > 0]
+
+    # 3) Barras nuevas: la mezcla más barata entre los candidatos
+    def _bajar_de_largo(sobrantes_cap, cap):
+        """Cada barra pasa al largo más corto donde cabe lo que se le cortó."""
+        plan = []
+        for sobrante in sobrantes_cap:
+            usado = cap - sobrante
+            s = bisect.bisect_left(capacidades, usado - 1e-9)
+            plan.append((largos_barra[s], capacidades[s] - usado))
+        return plan
+
+    candidatos = [
+        _bajar_de_largo(first_fit_decreasing(resto, cap), cap) for cap in capacidades
+    ]
+    cota_mm = 0.0
+    pesos = [int(math.ceil(p)) for p, _ in resto]
+    if resto and max(pesos) <= int(capacidades[-1]):
+        cota_lp, patrones, falta = _generacion_de_columnas(
+            pesos,
+            [c for _, c in resto],
+            [int(cap) for cap in capacidades],
+            [float(s) for s in largos_barra],
+            limite,
+        )
+        plan = []
+        for s, patron, veces in patrones:
+            usado = sum(p * n for (p, _), n in zip(resto, patron))
+            plan.extend([(largos_barra[s], capacidades[s] - usado)] * veces)
+        plan.extend(
+            _bajar_de_largo(
+                first_fit_decreasing(
+                    [(p, f) for (p, _), f in zip(resto, falta)], capacidades[-1]
+                ),
+                capacidades[-1],
+            )
+        )
+        candidatos.append(plan)
+        # cota por largo total: ninguna barra rinde más que la de mejor proporción
+        rinde = min(s / cap for s, cap in zip(largos_barra, capacidades))
+        cota_mm = sum(p * c for p, c in resto) * rinde
+        if all(float(v).is_integer() for v in [p for p, _ in resto] + capacidades):
+            cota_mm = max(cota_mm, cota_lp)
+    nuevas = min(candidatos, key=lambda plan: (sum(s for s, _ in plan), len(plan)))
+
+    for s, sobrante in nuevas:
+        barras[s] = barras.get(s, 0) + 1
+    sobrantes.extend(nuevas)
+    largo_comprado = sum(s * n for s, n in barras.items())
+    return {
+        "barras": dict(sorted(barras.items())),
+        "num_perfiles": sum(barras.values()),
+        "largo_comprado_mm": largo_comprado,
+        "cota_inferior_mm": largo_comprado - sum(s for s, _ in nuevas) + cota_mm,
+        "retazos_usados": [retazos[i] for i in usados],
+        "waste_mm": largo_comprado + sum(retazos[i] for i in usados) - total_piezas_mm,
+        "sobrantes": sobrantes,
+        "retazos_nuevos": [sobrante + recorte_cola_mm for _, sobrante in sobrantes],
+    }
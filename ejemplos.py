@@ -0,0 +1,13 @@
+"""
+Pedido de ejemplo, compartido por tests.py y por web.py (sin archivo subido).
+"""
+
+import pandas as pd
+
+CANTIDADES_POR_BASE = {"WF600X2250": 10, "SF400X2000": 5}
+DF_PEDIDO = pd.DataFrame(
+    [
+        {"Panel (base)": "WF600X2250", "Cantidad": 10},
+        {"Panel (base)": "SF400X2000", "Cantidad": 5},
+    ]
+)
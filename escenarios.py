@@ -0,0 +1,107 @@
+"""
+Barrido de escenarios de costo (tasa CLP→USD, precio del aluminio, tarifa
+eléctrica) sin recalcular el pedido.
+
+El costo de cada panel es lineal en los parámetros:
+  total = kg · aluminio + mo_clp / tasa + insumos + kwh · tarifa
+Los coeficientes (kg, mo_clp, insumos, kwh) no dependen de los precios: se
+sacan de UNA llamada a calcular_costos_por_panel con precios unitarios, y cada
+grilla de escenarios se evalúa como un producto de matrices.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from backend import COSTO_ALUMINIO_USD_POR_KG, calcular_costos_por_panel
+from huellas import cache_por_huella
+
+COLUMNAS_COEFICIENTES = ("kg_aluminio", "mo_clp", "insumos_usd", "energia_kwh")
+PARAMETROS = ("tasa_clp_usd", "costo_aluminio_usd_por_kg", "costo_kwh_usd")
+
+
+@cache_por_huella()
+def coeficientes_de_costo(despiece, tiempos_por_panel, potencias_kw=None):
+    """
+    Cantidades del pedido que no dependen de los precios, por panel.
+    Retorna un dict con:
+      - paneles: lista de paneles (filas de la matriz)
+      - matriz: ndarray (paneles × COLUMNAS_COEFICIENTES)
+    """
+    costos, _, _, _ = calcular_costos_por_panel(
+        despiece,
+        tiempos_por_panel,
+        tasa_clp_usd=1.0,  # MO queda en CLP
+        costo_kwh_usd=1.0,  # energía queda en kWh
+        potencias_kw=potencias_kw,
+    )
+    matriz = np.array(
+        [
+            (
+                c["costo_mp_usd"] / COSTO_ALUMINIO_USD_POR_KG,
+                c["costo_mo_corte_usd"]
+                + c["costo_mo_sold_usd"]
+                + c["costo_mo_perf_usd"],
+                c["costo_insumos_usd"],
+                c["costo_energia_usd"],
+            )
+            for c in costos.values()
+        ],
+        dtype=np.float64,
+    ).reshape(-1, len(COLUMNAS_COEFICIENTES))
+    return {"paneles": list(costos), "matriz": matriz}
+
+
+def grilla_de_escenarios(
+    tasas, costos_aluminio=(COSTO_ALUMINIO_USD_POR_KG,), costos_kwh=(0.20,)
+):
+    """
+    Todas las combinaciones de los valores entregados.
+    Retorna un DataFrame con una fila por escenario y columnas PARAMETROS.
+    """
+    return pd.DataFrame(
+        list(itertools.product(tasas, costos_aluminio, costos_kwh)),
+        columns=list(PARAMETROS),
+    )
+
+
+def _precios(escenarios):
+    # una columna por escenario, en el orden de COLUMNAS_COEFICIENTES
+    return np.vstack(
+        [
+            escenarios["costo_aluminio_usd_por_kg"].to_numpy(dtype=np.float64),
+            1.0 / escenarios["tasa_clp_usd"].to_numpy(dtype=np.float64),
+            np.ones(len(escenarios)),
+            escenarios["costo_kwh_usd"].to_numpy(dtype=np.float64),
+        ]
+    )
+
+
+def evaluar_escenarios(coeficientes, escenarios):
+    """
+    Costo del pedido completo en cada escenario (ej. de grilla_de_escenarios).
+    Retorna escenarios con las columnas costo_mp_usd, costo_mo_usd,
+    costo_insumos_usd, costo_energia_usd y costo_total_usd agregadas.
+    """
+    componentes = coeficientes["matriz"].sum(axis=0)[:, None] * _precios(escenarios)
+    resultado = escenarios.reset_index(drop=True).copy()
+    for nombre, fila in zip(
+        ("costo_mp_usd", "costo_mo_usd", "costo_insumos_usd", "costo_energia_usd"),
+        componentes,
+    ):
+        resultado[nombre] = fila
+    resultado["costo_total_usd"] = componentes.sum(axis=0)
+    return resultado
+
+
+def costos_por_panel_escenarios(coeficientes, escenarios):
+    """
+    Costo total de cada panel en cada escenario.
+    Retorna un DataFrame (paneles × escenarios) con los paneles como índice.
+    """
+    return pd.DataFrame(
+        coeficientes["matriz"] @ _precios(escenarios),
+        index=coeficientes["paneles"],
+        columns=escenarios.index,
+    )
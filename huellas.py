@@ -0,0 +1,125 @@
+"""
+Caché de resultados intermedios por huella (fingerprint) del pedido.
+
+Cada resultado cacheado queda registrado con la huella de la llamada que lo
+produjo, así que al pasarlo a la siguiente etapa su huella se obtiene en O(1)
+sin volver a recorrer (ni picklear) el despiece. Sólo los objetos que no
+vienen del caché se hashean por contenido, una vez por llamada.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import inspect
+import pickle
+import threading
+
+_lock = threading.RLock()
+# id(objeto) -> (objeto, huella); el caché mantiene vivo el objeto, así que el
+# id no se reutiliza mientras el registro exista
+_registro = {}
+
+
+def huella(*partes):
+    """Hash corto (hex) de una secuencia de partes ya convertidas a huella."""
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        h.update(repr(parte).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _es_escalar(objeto):
+    return objeto is None or isinstance(objeto, (bool, int, float, str, bytes))
+
+
+def huella_de(objeto):
+    """
+    Huella de un argumento: el repr para escalares; la registrada si el objeto
+    salió del caché; si no, un hash de su pickle.
+    """
+    if _es_escalar(objeto):
+        return huella(type(objeto).__name__, objeto)
+    registrado = _registro.get(id(objeto))
+    if registrado is not None and registrado[0] is objeto:
+        return registrado[1]
+    return hashlib.blake2b(
+        pickle.dumps(objeto, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16
+    ).hexdigest()
+
+
+def huella_de_archivo(archivo, tam_bloque=1 << 20):
+    """Hash del contenido de un archivo binario, leído por bloques."""
+    h = hashlib.blake2b(digest_size=16)
+    archivo.seek(0)
+    for bloque in iter(lambda: archivo.read(tam_bloque), b""):
+        h.update(bloque)
+    archivo.seek(0)
+    return h.hexdigest()
+
+
+def _registrar(resultado, clave):
+    _registro[id(resultado)] = (resultado, clave)
+    if isinstance(resultado, tuple):
+        for i, parte in enumerate(resultado):
+            if not _es_escalar(parte):
+                _registro.setdefault(id(parte), (parte, huella(clave, i)))
+
+
+def _olvidar(resultado):
+    partes = resultado if isinstance(resultado, tuple) else ()
+    for objeto in (resultado, *partes):
+        registrado = _registro.get(id(objeto))
+        if registrado is not None and registrado[0] is objeto:
+            del _registro[id(objeto)]
+
+
+def cache_por_huella(maxsize=8, clave=None):
+    """
+    Decorador: cachea la función por la huella de sus argumentos (normalizados
+    con su firma, así f(x, 1) y f(x, n=1) comparten entrada), con LRU de
+    maxsize entradas. clave(*args, **kwargs), si se entrega, calcula la huella
+    de la llamada en vez de hashear los argumentos (ej. el hash de un archivo).
+    """
+
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+        entradas = OrderedDict()
+
+        def _clave(args, kwargs):
+            if clave is not None:
+                return huella(funcion.__qualname__, clave(*args, **kwargs))
+            llamada = firma.bind(*args, **kwargs)
+            llamada.apply_defaults()
+            return huella(
+                funcion.__qualname__,
+                *[(k, huella_de(v)) for k, v in llamada.arguments.items()],
+            )
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            k = _clave(args, kwargs)
+            with _lock:
+                if k in entradas:
+                    entradas.move_to_end(k)
+                    return entradas[k]
+            resultado = funcion(*args, **kwargs)
+            with _lock:
+                if k not in entradas:
+                    entradas[k] = resultado
+                    _registrar(resultado, k)
+                    if len(entradas) > maxsize:
+                        _, viejo = entradas.popitem(last=False)
+                        _olvidar(viejo)
+                return entradas[k]
+
+        def cache_clear():
+            with _lock:
+                for resultado in entradas.values():
+                    _olvidar(resultado)
+                entradas.clear()
+
+        envoltura.cache_clear = cache_clear
+        return envoltura
+
+    return decorador
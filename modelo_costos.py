@@ -0,0 +1,319 @@
+"""
+Modelo de costo lineal precompilado por BASE.
+
+Cada BASE se compila una sola vez a cantidades físicas: mm por perfil,
+cortes, mm de soldadura, minutos de perforación, ojales y remaches. Todas son
+afines en la cantidad pedida:
+  cantidades(q) = q · por_unidad + fijo      (q > 0)
+donde fijo son los aportes por línea del pedido (extras de soldadura por
+tipo de panel, ojales y remaches). Los vectores se guardan en SQLite por
+(versión de las reglas, BASE): un pedido con bases ya vistas se valoriza con
+un producto de matriz dispersa por el vector de cantidades, sin evaluar
+ninguna regla de despiece.
+"""
+
+import inspect
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import backend
+from backend import (
+    Despiece,
+    _bloque_despiece,
+    calcular_costos_por_panel,
+    calcular_soldadura_por_panel,
+    calcular_tiempos_por_panel,
+)
+from huellas import huella
+import refuerzos
+import reglas
+
+COMPONENTES = (
+    "costo_mp_usd",
+    "costo_mo_corte_usd",
+    "costo_mo_sold_usd",
+    "costo_mo_perf_usd",
+    "costo_insumos_usd",
+    "costo_energia_usd",
+)
+
+
+def version_reglas():
+    """
+    Huella de las reglas que definen las cantidades compiladas (juego de
+    reglas de despiece activo, código del motor y de las funciones, y tabla
+    de perforación): si cambia, se recompila todo.
+    """
+    return huella(
+        reglas.huella_reglas(),
+        *(
+            inspect.getsource(f)
+            for f in (
+                reglas,
+                refuerzos,
+                calcular_soldadura_por_panel,
+                calcular_tiempos_por_panel,
+                calcular_costos_por_panel,
+            )
+        ),
+        sorted(backend.TIEMPOS_PERFORACION_POR_TIPO.items()),
+    )
+
+
+def _cantidades(bases, cantidad):
+    """
+    Cantidades físicas de cada base con la misma cantidad pedida, evaluando
+    las reglas de todas las bases de una vez.
+    Retorna {base: {columna: valor}}.
+    """
+    d = Despiece(*_bloque_despiece([(base, cantidad) for base in bases]))
+    tiempos, _ = calcular_tiempos_por_panel(
+        d,
+        tiempo_por_corte_min=backend.TIEMPO_POR_CORTE_MIN,
+        velocidad_soldadura_mm_por_min=backend.VELOCIDAD_SOLDADURA_MM_POR_MIN,
+        tiempos_perforacion_por_tipo=backend.TIEMPOS_PERFORACION_POR_TIPO,
+    )
+    soldadura = calcular_soldadura_por_panel(d)
+    _, _, _, unidades = calcular_costos_por_panel(d, tiempos, 1.0)
+
+    cantidades = {base: {} for base in bases}
+    for panel, perfil, piezas, _, total_mm in d.filas():
+        fila = cantidades[panel]
+        fila[f"mm:{perfil}"] = fila.get(f"mm:{perfil}", 0) + total_mm
+        fila["cortes"] = fila.get("cortes", 0) + piezas
+    for panel, fila in cantidades.items():
+        if panel not in tiempos:
+            continue  # base sin despiece
+        fila["soldadura_mm"] = soldadura[panel]
+        fila["perforacion_min"] = tiempos[panel]["tiempo_perforacion_min"]
+        fila["ojales"] = unidades[panel].get("ojales", 0)
+        fila["remaches"] = unidades[panel].get("remaches", 0)
+    return cantidades
+
+
+def compilar_bases(bases):
+    """
+    Evalúa las reglas con cantidad 1 y 2 para separar la parte por unidad
+    de la parte fija.
+    Retorna {base: [(columna, por_unidad, fijo)]} (sólo columnas no nulas).
+    """
+    bases = list(bases)
+    una, dos = _cantidades(bases, 1), _cantidades(bases, 2)
+    compiladas = {}
+    for base in bases:
+        filas = []
+        for columna in una[base].keys() | dos[base].keys():
+            v1 = float(una[base].get(columna, 0))
+            v2 = float(dos[base].get(columna, 0))
+            por_unidad, fijo = v2 - v1, 2 * v1 - v2
+            if por_unidad or fijo:
+                filas.append((columna, por_unidad, fijo))
+        compiladas[base] = sorted(filas)
+    return compiladas
+
+
+def matriz_de_precios(columnas, tasa_clp_usd, costo_kwh_usd=0.20, potencias_kw=None):
+    """
+    Precio (USD) de una unidad de cada columna, separado por componente.
+    Se obtiene de calcular_costos_por_panel (con los tiempos de
+    backend.calcular_tiempos_pedido) sobre un panel ficticio por columna que
+    lleva exactamente una unidad de ella, así los precios siguen a las
+    funciones de costo.
+    Retorna un ndarray (columnas × COMPONENTES).
+    """
+    filas, perforacion = [], []
+    for i, columna in enumerate(columnas):
+        fila = {
+            "panel": f"#{i}",
+            "perfil": "",
+            "numero_piezas": 0,
+            "largo_pieza_mm": 0,
+            "total_mm": 0,
+        }
+        if columna.startswith("mm:"):
+            fila.update(perfil=columna[3:], total_mm=1)
+        elif columna == "cortes":
+            fila.update(numero_piezas=1)
+        elif columna == "soldadura_mm":
+            # la primera ala del panel aporta su largo a la soldadura
+            fila.update(perfil="ALA_MURO", largo_pieza_mm=1)
+        elif columna == "perforacion_min":
+            perforacion.append(f"#{i}")
+        filas.append(fila)
+    # ojales y remaches: del detalle de un WF de 300 de alto (2 y 4)
+    filas.append(
+        {
+            "panel": "WF0X300",
+            "perfil": "",
+            "numero_piezas": 0,
+            "largo_pieza_mm": 0,
+            "total_mm": 0,
+        }
+    )
+    d = Despiece.desde_filas(filas)
+
+    tiempos, _ = backend.calcular_tiempos_pedido(d)
+    # copia: calcular_tiempos_pedido está en caché y su resultado se comparte
+    tiempos = {
+        panel: dict(t, tiempo_perforacion_min=1.0) if panel in perforacion else t
+        for panel, t in tiempos.items()
+    }
+    costos, _, detalle_costos, detalle_unidades = calcular_costos_por_panel(
+        d, tiempos, tasa_clp_usd, True, costo_kwh_usd, potencias_kw
+    )
+
+    precios = np.array(
+        [[costos[f"#{i}"][c] for c in COMPONENTES] for i in range(len(columnas))],
+        dtype=np.float64,
+    ).reshape(-1, len(COMPONENTES))
+    insumos = COMPONENTES.index("costo_insumos_usd")
+    for i, columna in enumerate(columnas):
+        if columna in ("ojales", "remaches"):
+            precios[i, insumos] = (
+                detalle_costos["WF0X300"][columna]
+                / detalle_unidades["WF0X300"][columna]
+            )
+    return precios
+
+
+class IndiceCostos:
+    """
+    Índice en SQLite de los vectores compilados por (versión, BASE)
+    (":memory:" para uno temporal). Las bases que faltan se compilan juntas
+    la primera vez que se piden. Sin version, sigue a las reglas activas.
+    """
+
+    def __init__(self, ruta="costos.db", version=None):
+        self.ruta = ruta
+        self._version_fija = version
+        self.version = version or version_reglas()
+        self._memoria = {}  # base -> [(columna, por_unidad, fijo)]
+        self.conexion = sqlite3.connect(ruta)
+        with self.conexion:
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS bases ("
+                " version TEXT NOT NULL,"
+                " base TEXT NOT NULL,"
+                " PRIMARY KEY (version, base))"
+            )
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS coeficientes ("
+                " version TEXT NOT NULL,"
+                " base TEXT NOT NULL,"
+                " columna TEXT NOT NULL,"
+                " por_unidad REAL NOT NULL,"
+                " fijo REAL NOT NULL)"
+            )
+            self.conexion.execute(
+                "CREATE INDEX IF NOT EXISTS coeficientes_version_base"
+                " ON coeficientes (version, base)"
+            )
+
+    def __len__(self):
+        return self.conexion.execute(
+            "SELECT COUNT(*) FROM bases WHERE version = ?", (self.version,)
+        ).fetchone()[0]
+
+    def __repr__(self):
+        return f"IndiceCostos({self.ruta!r}, {len(self)} bases)"
+
+    def vectores(self, bases):
+        """
+        Vectores compilados de las bases (compila y guarda las que falten).
+        Retorna {base: [(columna, por_unidad, fijo)]}.
+        """
+        version = self._version_fija or version_reglas()
+        if version != self.version:  # cambiaron las reglas activas
+            self.version = version
+            self._memoria = {}
+        faltan = [b for b in dict.fromkeys(bases) if b not in self._memoria]
+        for i in range(0, len(faltan), 500):  # límite de parámetros de SQLite
+            bloque = faltan[i : i + 500]
+            marcas = ",".join("?" * len(bloque))
+            guardadas = self.conexion.execute(
+                f"SELECT base FROM bases WHERE version = ? AND base IN ({marcas})",
+                (self.version, *bloque),
+            )
+            for (base,) in guardadas:
+                self._memoria[base] = []
+            filas = self.conexion.execute(
+                "SELECT base, columna, por_unidad, fijo FROM coeficientes"
+                f" WHERE version = ? AND base IN ({marcas})",
+                (self.version, *bloque),
+            )
+            for base, columna, por_unidad, fijo in filas:
+                self._memoria[base].append((columna, por_unidad, fijo))
+
+        nuevas = [b for b in faltan if b not in self._memoria]
+        if nuevas:
+            compiladas = compilar_bases(nuevas)
+            with self.conexion:
+                self.conexion.executemany(
+                    "INSERT INTO bases (version, base) VALUES (?, ?)",
+                    [(self.version, b) for b in nuevas],
+                )
+                self.conexion.executemany(
+                    "INSERT INTO coeficientes VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (self.version, base, *fila)
+                        for base, filas in compiladas.items()
+                        for fila in filas
+                    ],
+                )
+            self._memoria.update(compiladas)
+        return {b: self._memoria[b] for b in bases}
+
+    def cantidades(self, cantidades_por_base):
+        """
+        Cantidades físicas del pedido {BASE: cantidad}, por base. Las bases
+        sin despiece (códigos no reconocidos) no aparecen, como en
+        backend.menu_exportacion.
+        Retorna un DataFrame (bases × columnas).
+        """
+        items = [(b, q) for b, q in cantidades_por_base.items() if q > 0]
+        vectores = self.vectores([b for b, _ in items])
+        items = [(b, q) for b, q in items if vectores[b]]
+        columnas = sorted({c for filas in vectores.values() for c, _, _ in filas})
+        indice_col = {c: j for j, c in enumerate(columnas)}
+
+        # matriz dispersa en formato COO: (fila, columna, por_unidad, fijo)
+        fila, col, por_unidad, fijo = [], [], [], []
+        for i, (base, _) in enumerate(items):
+            for columna, u, f in vectores[base]:
+                fila.append(i)
+                col.append(indice_col[columna])
+                por_unidad.append(u)
+                fijo.append(f)
+        fila = np.asarray(fila, dtype=np.int64)
+        col = np.asarray(col, dtype=np.int64)
+        q = np.array([q for _, q in items], dtype=np.float64)
+
+        valores = np.asarray(por_unidad) * q[fila] + np.asarray(fijo)
+        matriz = np.zeros((len(items), len(columnas)))
+        np.add.at(matriz, (fila, col), valores)
+        return pd.DataFrame(matriz, index=[b for b, _ in items], columns=columnas)
+
+    def valorizar(
+        self, cantidades_por_base, tasa_clp_usd, costo_kwh_usd=0.20, potencias_kw=None
+    ):
+        """
+        Costos por base del pedido {BASE: cantidad}, los mismos que
+        backend.menu_exportacion, sin recalcular el despiece.
+        Retorna un DataFrame (bases × COMPONENTES + costo_total_usd).
+        """
+        cantidades = self.cantidades(cantidades_por_base)
+        precios = matriz_de_precios(
+            list(cantidades.columns), tasa_clp_usd, costo_kwh_usd, potencias_kw
+        )
+        costos = pd.DataFrame(
+            cantidades.to_numpy() @ precios,
+            index=cantidades.index,
+            columns=list(COMPONENTES),
+        )
+        costos["costo_total_usd"] = costos.sum(axis=1)
+        return costos
+
+    def cerrar(self):
+        self.conexion.close()
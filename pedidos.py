@@ -0,0 +1,195 @@
+"""
+Varios pedidos a la vez (ej. el lote de producción de la semana).
+
+Cada pedido se calcula completo en su propio proceso, y las piezas de todos
+se juntan por perfil para cortarlas en un plan consolidado (mismo motor que
+calcular_materia_prima_por_perfil). El plan se reparte de vuelta entre los
+pedidos según los mm de cada uno, así que no se pierde de qué pedido viene
+cada pieza.
+"""
+
+import contextlib
+import os
+import sys
+
+import pandas as pd
+
+from backend import (
+    _ejecutor_de_procesos,
+    _piezas_por_perfil,
+    calcular_materia_prima_por_perfil,
+    calcular_pedido,
+    materia_prima_de_piezas,
+)
+
+
+def _procesar_pedido(
+    input_csv, tasa, procesar, longitud_perfil, modo_corte, tiempo_limite_s
+):
+    # los avisos del despiece van a stderr: en modo lote stdout es de quien llama
+    with contextlib.redirect_stdout(sys.stderr):
+        calculo = calcular_pedido(input_csv, tasa)
+    despiece = calculo["resultado_despiece"]
+    piezas = _piezas_por_perfil(despiece)
+    propia = calcular_materia_prima_por_perfil(
+        despiece,
+        longitud_perfil=longitud_perfil,
+        modo=modo_corte,
+        tiempo_limite_s=tiempo_limite_s,
+    )
+    resultado = calculo if procesar is None else procesar(input_csv, calculo)
+    return resultado, piezas, propia
+
+
+def procesar_pedidos(
+    entradas,
+    tasa,
+    procesar=None,
+    procesos=None,
+    consolidar=True,
+    longitud_perfil=5850,
+    modo_corte="ffd",
+    tiempo_limite_s=10.0,
+):
+    """
+    Calcula cada pedido de entradas (rutas de CSV) con calcular_pedido,
+    repartidos entre un ProcessPoolExecutor de procesos procesos (None = todos
+    los núcleos; 1 = en este mismo proceso).
+    procesar(input_csv, calculo), si se entrega, corre en el proceso del
+    pedido (ej. escribir sus reportes) y su retorno reemplaza al calculo; debe
+    poder picklearse (función de módulo o functools.partial).
+    Retorna un dict con:
+      - pedidos: {input_csv: calculo o retorno de procesar}, en orden
+      - errores: {input_csv: excepción} de los pedidos que fallaron
+      - consolidado: ver consolidar_materia_prima (None si consolidar=False)
+    """
+    entradas = list(entradas)
+    procesos = min(procesos or os.cpu_count() or 1, max(len(entradas), 1))
+    args = (tasa, procesar, longitud_perfil, modo_corte, tiempo_limite_s)
+
+    resultados, errores, piezas, propias = {}, {}, {}, {}
+    with contextlib.ExitStack() as pila:
+        if procesos > 1:
+            executor = pila.enter_context(_ejecutor_de_procesos(procesos))
+            futuros = [executor.submit(_procesar_pedido, e, *args) for e in entradas]
+        else:
+            futuros = [None] * len(entradas)
+        for entrada, futuro in zip(entradas, futuros):
+            try:
+                r = futuro.result() if futuro else _procesar_pedido(entrada, *args)
+            except Exception as e:
+                errores[entrada] = e
+            else:
+                resultados[entrada], piezas[entrada], propias[entrada] = r
+
+    consolidado = None
+    if consolidar:
+        consolidado = consolidar_materia_prima(
+            piezas, propias, longitud_perfil, modo_corte, tiempo_limite_s
+        )
+    return {"pedidos": resultados, "errores": errores, "consolidado": consolidado}
+
+
+def consolidar_materia_prima(
+    piezas_por_pedido,
+    propias=None,
+    longitud_perfil=5850,
+    modo_corte="ffd",
+    tiempo_limite_s=10.0,
+):
+    """
+    Corta juntas las piezas del mismo perfil de todos los pedidos.
+    piezas_por_pedido: {pedido: {perfil: [(largo, cantidad)]}}
+    propias: {pedido: materia prima del pedido cortado por separado}, para
+    comparar; si falta se calcula.
+    Las barras y el desperdicio del plan consolidado se asignan a cada pedido
+    en proporción a sus mm de ese perfil.
+    Retorna {perfil: dict} con:
+      - num_perfiles, waste_mm (y cota_inferior, brecha en modo "optimo")
+      - num_perfiles_por_separado, waste_mm_por_separado: suma de los pedidos
+        cortados cada uno por su lado
+      - pedidos: {pedido: {numero_piezas, total_mm, perfiles_asignados,
+        waste_asignado_mm}}
+    """
+    propias = dict(propias or {})
+    juntas = {}  # perfil -> {largo: cantidad}
+    for pedido, piezas in piezas_por_pedido.items():
+        if pedido not in propias:
+            propias[pedido] = materia_prima_de_piezas(
+                piezas, longitud_perfil, modo_corte, tiempo_limite_s
+            )
+        for perfil, grupos in piezas.items():
+            por_largo = juntas.setdefault(perfil, {})
+            for largo, cantidad in grupos:
+                por_largo[largo] = por_largo.get(largo, 0) + cantidad
+
+    plan = materia_prima_de_piezas(
+        {perfil: list(por_largo.items()) for perfil, por_largo in juntas.items()},
+        longitud_perfil,
+        modo_corte,
+        tiempo_limite_s,
+    )
+
+    for perfil, datos in plan.items():
+        mm_por_pedido = {}
+        for pedido, piezas in piezas_por_pedido.items():
+            grupos = piezas.get(perfil)
+            if grupos:
+                mm_por_pedido[pedido] = (
+                    sum(n for _, n in grupos),
+                    sum(largo * n for largo, n in grupos),
+                )
+        total_mm = sum(mm for _, mm in mm_por_pedido.values())
+        datos["num_perfiles_por_separado"] = sum(
+            propias[p][perfil]["num_perfiles"] for p in mm_por_pedido
+        )
+        datos["waste_mm_por_separado"] = sum(
+            propias[p][perfil]["waste_mm"] for p in mm_por_pedido
+        )
+        datos["pedidos"] = {
+            pedido: {
+                "numero_piezas": n,
+                "total_mm": mm,
+                "perfiles_asignados": datos["num_perfiles"] * mm / total_mm,
+                "waste_asignado_mm": datos["waste_mm"] * mm / total_mm,
+            }
+            for pedido, (n, mm) in mm_por_pedido.items()
+        }
+    return plan
+
+
+def tablas_consolidado(consolidado):
+    """
+    Tablas del plan consolidado.
+    Retorna (por perfil, por perfil y pedido) como DataFrames.
+    """
+    perfiles = pd.DataFrame(
+        [
+            {
+                "Perfil": perfil,
+                "Pedidos": len(d["pedidos"]),
+                "Perfiles necesarios": d["num_perfiles"],
+                "Waste (mm)": d["waste_mm"],
+                "Perfiles por separado": d["num_perfiles_por_separado"],
+                "Waste por separado (mm)": d["waste_mm_por_separado"],
+                "Perfiles ahorrados": d["num_perfiles_por_separado"]
+                - d["num_perfiles"],
+            }
+            for perfil, d in consolidado.items()
+        ]
+    )
+    asignacion = pd.DataFrame(
+        [
+            {
+                "Perfil": perfil,
+                "Pedido": pedido,
+                "Piezas": a["numero_piezas"],
+                "Total(mm)": a["total_mm"],
+                "Perfiles asignados": round(a["perfiles_asignados"], 3),
+                "Waste asignado (mm)": round(a["waste_asignado_mm"], 1),
+            }
+            for perfil, d in consolidado.items()
+            for pedido, a in d["pedidos"].items()
+        ]
+    )
+    return perfiles, asignacion
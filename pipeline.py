@@ -0,0 +1,51 @@
+"""
+Pipeline incremental: un grafo de etapas donde cada etapa declara sus entradas.
+
+Los valores se piden (pull) con obtener(): una etapa sólo se recalcula si
+cambió la versión de alguna de sus entradas desde la última vez, así que al
+mover un parámetro se recalcula únicamente lo que depende de él.
+"""
+
+
+class Pipeline:
+    def __init__(self):
+        self._etapas = {}  # nombre -> (funcion, entradas)
+        self._valores = {}
+        self._versiones = {}
+        self._claves = {}  # entradas: clave con la que se detectan cambios
+        self._usadas = {}  # etapas: versiones de entradas con las que se calculó
+
+    def etapa(self, nombre, funcion, *entradas):
+        """Declara una etapa: nombre = funcion(*valores de las entradas)."""
+        self._etapas[nombre] = (funcion, entradas)
+        self._usadas.pop(nombre, None)
+
+    def entrada(self, nombre, valor, clave=None):
+        """
+        Fija un parámetro del pipeline. Sólo cuenta como cambio si la clave
+        (por defecto el valor mismo) es distinta de la anterior.
+        Retorna True si cambió.
+        """
+        clave = valor if clave is None else clave
+        if nombre in self._claves and self._claves[nombre] == clave:
+            return False
+        self._claves[nombre] = clave
+        self._valores[nombre] = valor
+        self._versiones[nombre] = self._versiones.get(nombre, 0) + 1
+        return True
+
+    def obtener(self, nombre):
+        """Valor de una entrada o etapa, recalculando sólo lo que cambió."""
+        if nombre not in self._etapas:
+            if nombre not in self._claves:
+                raise KeyError(f"Entrada o etapa no declarada: {nombre}")
+            return self._valores[nombre]
+
+        funcion, entradas = self._etapas[nombre]
+        valores = [self.obtener(e) for e in entradas]
+        versiones = tuple(self._versiones[e] for e in entradas)
+        if self._usadas.get(nombre) != versiones:
+            self._valores[nombre] = funcion(*valores)
+            self._versiones[nombre] = self._versiones.get(nombre, 0) + 1
+            self._usadas[nombre] = versiones
+        return self._valores[nombre]
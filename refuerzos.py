@@ -0,0 +1,46 @@
+"""
+Cantidad de refuerzos de los paneles SF, MF y CS, en forma cerrada.
+
+Los refuerzos van a posiciones fijas a lo alto (o largo) del panel; contar
+cuántas posiciones caen dentro de la medida es contar los términos de una
+progresión aritmética bajo un límite, sin recorrerla:
+  #{m >= 0 : inicio + 300·m < limite} = (limite - inicio + 299) // 300
+(o 0 si limite <= inicio).
+"""
+
+
+def refuerzos_sf(alto):
+    """
+    Refuerzos de un SF. Las posiciones van en 280, 359 y luego alternan +140
+    (agrega un chico) y +160 (cambia un chico por un grande): los chicos
+    entran en 359, 659, 959, ... y los grandes en 499, 799, 1099, ...
+    Retorna (grandes, chicos).
+    """
+    grandes = (alto - 200) // 300 if alto > 499 else 0
+    chicos = (alto - 60) // 300 if alto > 359 else 0
+    return grandes, chicos - grandes
+
+
+def refuerzos_mf(alto):
+    """
+    Refuerzos de un MF, cada 300 mm desde 300: el primero chico, el resto
+    grandes.
+    Retorna (grandes, chicos, b), con b el largo del refuerzo vertical (lo
+    que queda sobre el último refuerzo grande, o el alto si no hay).
+    """
+    if alto <= 300:
+        return 0, 0, alto
+    grandes = (alto - 301) // 300 if alto > 600 else 0
+    b = alto - 275 - 300 * (grandes - 1) if grandes else alto
+    return grandes, 1, b
+
+
+def refuerzos_cs(largo):
+    """
+    Refuerzos de un CS, en 500, 900, 1200, 1500, ... (hasta el largo
+    inclusive).
+    Retorna la cantidad de refuerzos (y de tubos).
+    """
+    if largo < 500:
+        return 0
+    return 1 + ((largo - 600) // 300 if largo >= 900 else 0)
@@ -0,0 +1,570 @@
+"""
+Reglas de despiece como datos.
+
+Por cada tipo de panel, REGLAS dice cómo sacar las dimensiones del código y
+qué pasos aplicar, en orden. Cada paso elige un tramo según una dimensión
+(intervalos [desde, hasta] sin traslape) y emite las filas de UN panel:
+  [perfil, piezas, largo]  o  [perfil, piezas, largo, condición]
+donde piezas, largo y condición son fórmulas sobre las dimensiones y las
+variables de los tramos anteriores (total_mm = piezas · largo). Si ningún
+tramo calza se usa "otro"; si el paso tiene "error", se avisa y el panel
+termina ahí (las filas ya emitidas se mantienen).
+
+compilar_reglas las deja listas para evaluar: un dict por tipo, búsqueda
+binaria de tramos y fórmulas compiladas a código Python. Un juego de reglas
+de otra planta se guarda como JSON (guardar_reglas / cargar_reglas) y se
+activa con backend.usar_reglas. Las fórmulas se evalúan con eval (sólo con
+FUNCIONES a mano): los archivos de reglas deben ser de confianza.
+"""
+
+from bisect import bisect_right
+from collections import namedtuple
+import json
+
+from codigos import parsear
+from huellas import huella
+from refuerzos import refuerzos_cs, refuerzos_mf, refuerzos_sf
+
+
+# Lo único que las fórmulas pueden llamar
+FUNCIONES = {
+    "int": int,
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "refuerzos_sf": refuerzos_sf,
+    "refuerzos_mf": refuerzos_mf,
+    "refuerzos_cs": refuerzos_cs,
+}
+
+_ANCHO_ALTO = {"ANCHO": "nums[0]", "ALTO": "nums[1]"}
+
+
+def _error_dimensiones(tipo):
+    return f"Error extrayendo dimensiones en panel {tipo}:"
+
+
+def _pasos_muro():
+    # cierre de SF y MF: bastidor y alas según el ancho
+    return [
+        {"filas": [["BASTIDOR_MURO_50", 2, "ANCHO"]]},
+        {
+            "segun": "ANCHO",
+            "tramos": [
+                {
+                    "desde": 100,
+                    "hasta": 300,
+                    "filas": [["ALA_MURO", 1, "ALTO"], ["BASTIDOR_MURO_54", 1, "ALTO"]],
+                }
+            ],
+            "otro": {"filas": [["ALA_MURO", 2, "ALTO"]]},
+        },
+    ]
+
+
+def _tramo_cl(alto, perfil, refuerzo, si=None):
+    tramo = {
+        "desde": alto,
+        "hasta": alto,
+        "filas": [
+            [perfil, 1, "LARGO", "not ie"],
+            [perfil, 1, "A", "ie"],
+            [perfil, 1, "B", "ie"],
+            [refuerzo, "2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)", 0],
+        ],
+    }
+    if si:
+        tramo["si"] = si
+    return tramo
+
+
+_PASOS_CL = [
+    {
+        "segun": "ALTO",
+        "tramos": [
+            _tramo_cl(50, "CLN50", "REFUERZO_CL50"),
+            _tramo_cl(70, "CLN70", "REFUERZO_CL70"),
+            _tramo_cl(100, "CLN100", "REFUERZO_CL100"),
+            # caso especial 70x150
+            _tramo_cl(150, "CLN70", "REFUERZO_CL70", si="ANCHO == 70"),
+        ],
+        "error": "ALTO no reconocido para panel CL:",
+    }
+]
+
+# CLI/CLE: CL?E<ALTO>X<ANCHO>X<A>X<B>
+_DIMENSIONES_CLI = {
+    "ALTO": "int(partes[0][3:])",
+    "ANCHO": "int(partes[1])",
+    "A": "int(partes[2])",
+    "B": "int(partes[3])",
+    "LARGO": "600",
+    "ie": "True",
+}
+
+
+def _pasos_cp(tipo):
+    error = f"⚠️⚠️Pieza {tipo} no corresponde a ninguna del catálogo⚠️⚠️:"
+    return [
+        {"segun": "ALTO", "tramos": [{"desde": 100, "hasta": 300}], "error": error},
+        {"segun": "ANCHO", "tramos": [{"desde": 100, "hasta": 1800}], "error": error},
+        {
+            "segun": "ANCHO",
+            "tramos": [
+                {"desde": 600, "hasta": 1349, "filas": [["REFUERZOCHICO", 1, "ALTO"]]},
+                {"desde": 1350, "hasta": 1800, "filas": [["REFUERZOCHICO", 2, "ALTO"]]},
+            ],
+        },
+        {"filas": [["BCPN", 1, "ANCHO"], ["BASTIDOR_LOSA_50", 2, "ALTO"]]},
+    ]
+
+
+REGLAS = {
+    "WF": {
+        "dimensiones": _ANCHO_ALTO,
+        "error_dimensiones": _error_dimensiones("WF"),
+        "pasos": [
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 300,
+                        "filas": [
+                            ["BASTIDOR_MURO_54", 1, "ALTO"],
+                            ["ALA_MURO", 1, "ALTO"],
+                        ],
+                    },
+                    {"desde": 301, "hasta": 399, "filas": [["ALA_MURO", 2, "ALTO"]]},
+                    {
+                        "desde": 400,
+                        "hasta": 579,
+                        "filas": [
+                            ["ALA_MURO", 2, "ALTO"],
+                            ["REFUERZOCHICO", 1, 175],
+                            ["REFUERZOCHICO", 1, 258],
+                        ],
+                    },
+                    {
+                        "desde": 580,
+                        "hasta": 600,
+                        "filas": [
+                            ["ALA_MURO", 2, "ALTO"],
+                            ["REFUERZOGRANDE", 1, 160],
+                            ["REFUERZOGRANDE", 1, 258],
+                        ],
+                    },
+                ],
+                "error": "Pieza WF no corresponde al catálogo:",
+            },
+            {
+                "filas": [
+                    ["REFUERZOCHICO", 1, "ANCHO"],
+                    ["REFUERZOGRANDE", 6, "ANCHO"],
+                    ["BASTIDOR_MURO_50", 2, "ANCHO"],
+                ]
+            },
+        ],
+    },
+    "SF": {
+        "dimensiones": _ANCHO_ALTO,
+        "error_dimensiones": _error_dimensiones("SF"),
+        "pasos": [
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {"desde": 100, "hasta": 399},
+                    {"desde": 400, "hasta": 579, "filas": [["REFUERZOCHICO", 1, 258]]},
+                    {"desde": 580, "hasta": 600, "filas": [["REFUERZOGRANDE", 1, 258]]},
+                ],
+                "error": "ANCHO no corresponde en panel SF:",
+            },
+            {
+                "segun": "ALTO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 2249,
+                        "variables": {"rg, rch": "refuerzos_sf(ALTO)"},
+                        "filas": [
+                            ["REFUERZOGRANDE", "rg", "ANCHO", "rg != 0"],
+                            ["REFUERZOCHICO", "rch", "ANCHO", "rch != 0"],
+                        ],
+                    }
+                ],
+                "error": "ALTO no permitido en panel SF:",
+            },
+            *_pasos_muro(),
+        ],
+    },
+    "MF": {
+        "dimensiones": _ANCHO_ALTO,
+        "error_dimensiones": _error_dimensiones("MF"),
+        "pasos": [
+            {
+                "segun": "ALTO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 2100,
+                        "variables": {"rg, rch, b": "refuerzos_mf(ALTO)"},
+                        "filas": [
+                            ["REFUERZOGRANDE", "rg", "ANCHO", "rg != 0"],
+                            ["REFUERZOCHICO", "rch", "ANCHO", "rch != 0"],
+                        ],
+                    }
+                ],
+                "error": "ALTO no permitido en panel MF:",
+            },
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {"desde": 100, "hasta": 399},
+                    {"desde": 400, "hasta": 579, "filas": [["REFUERZOCHICO", 1, "b"]]},
+                ],
+                "otro": {"filas": [["REFUERZOGRANDE", 1, "b"]]},
+            },
+            *_pasos_muro(),
+        ],
+    },
+    "CL": {
+        # CL<ALTO>X<ANCHO>X<LARGO>
+        "dimensiones": {
+            "ALTO": "int(partes[0][2:])",
+            "ANCHO": "int(partes[1])",
+            "LARGO": "int(partes[2])",
+            "A": "0",
+            "B": "0",
+            "ie": "False",
+        },
+        "error_dimensiones": "Error extrayendo dimensiones en panel CL/CLE/CLI:",
+        "pasos": _PASOS_CL,
+    },
+    "CLI": {
+        "dimensiones": _DIMENSIONES_CLI,
+        "error_dimensiones": "Error extrayendo dimensiones en panel CL/CLE/CLI:",
+        "pasos": _PASOS_CL,
+    },
+    "CLE": {
+        "dimensiones": _DIMENSIONES_CLI,
+        "error_dimensiones": "Error extrayendo dimensiones en panel CL/CLE/CLI:",
+        "pasos": _PASOS_CL,
+    },
+    "IC": {
+        "dimensiones": {"ANCHO": "nums[0]", "ALTO": "nums[1]", "LARGO": "nums[2]"},
+        "error_dimensiones": _error_dimensiones("IC"),
+        "pasos": [
+            {
+                "segun": "LARGO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 2400,
+                        "filas": [
+                            ["REFUERZO_IC", "2 + (LARGO // 300 - 1)", 0],
+                            ["ICN", 1, "LARGO"],
+                        ],
+                    }
+                ],
+                "error": "LARGO no permitido en panel IC:",
+            }
+        ],
+    },
+    "OC": {
+        "dimensiones": {"LARGO": "nums[0]"},
+        "error_dimensiones": "Error extrayendo LARGO en panel OC:",
+        "pasos": [{"filas": [["OCN", 1, "LARGO"]]}],
+    },
+    "BH": {
+        "dimensiones": {"ANCHO": "nums[0]", "LARGO": "nums[1]"},
+        "error_dimensiones": _error_dimensiones("BH"),
+        "pasos": [
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {"desde": ancho, "hasta": ancho, "filas": [["BH120", 1, "LARGO"]]}
+                    for ancho in (100, 110, 120)
+                ],
+                "otro": {"filas": [["BH150", 1, "LARGO"]]},
+            }
+        ],
+    },
+    "BCP": {
+        "dimensiones": {"ALTO": "nums[0]", "ANCHO": "nums[1]"},
+        "error_dimensiones": _error_dimensiones("BCP"),
+        "pasos": _pasos_cp("BCP"),
+    },
+    "CP": {
+        "dimensiones": {"ALTO": "nums[0]", "ANCHO": "nums[1]"},
+        "error_dimensiones": _error_dimensiones("CP"),
+        "pasos": _pasos_cp("CP"),
+    },
+    "CE": {
+        "dimensiones": _ANCHO_ALTO,
+        "error_dimensiones": _error_dimensiones("CE"),
+        "pasos": [
+            {
+                "segun": "ALTO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 499,
+                        "variables": {"LARGO": "ALTO", "C": 1},
+                    },
+                    {
+                        "desde": 500,
+                        "hasta": 899,
+                        "variables": {"LARGO": "ALTO // 2", "C": 2},
+                        "filas": [["REFUERZOGRANDE", 1, "ANCHO"]],
+                    },
+                    {
+                        "desde": 900,
+                        "hasta": 1199,
+                        "variables": {"LARGO": "(300 + (ALTO - 300) / 2) // 2", "C": 2},
+                        "filas": [["REFUERZOGRANDE", 2, "ANCHO"]],
+                    },
+                    {
+                        "desde": 1200,
+                        "hasta": 1200,
+                        "variables": {"LARGO": 300, "C": 2},
+                        "filas": [["REFUERZOGRANDE", 3, "ANCHO"]],
+                    },
+                ],
+                "error": "Error en panel CE:",
+            },
+            {"filas": [["BASTIDOR_LOSA_50", 2, "ANCHO"]]},
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {
+                        "desde": 100,
+                        "hasta": 299,
+                        "filas": [
+                            ["ALA_LOSA", 1, "ALTO"],
+                            ["BASTIDOR_LOSA_54", 1, "ALTO"],
+                        ],
+                    },
+                    {"desde": 300, "hasta": 399, "filas": [["ALA_LOSA", 2, "ALTO"]]},
+                    {
+                        "desde": 400,
+                        "hasta": 499,
+                        "filas": [
+                            ["ALA_LOSA", 2, "ALTO"],
+                            ["REFUERZOCHICO", "C", "LARGO"],
+                        ],
+                    },
+                ],
+                "otro": {
+                    "filas": [["REFUERZOGRANDE", "C", "LARGO"], ["ALA_LOSA", 2, "ALTO"]]
+                },
+            },
+        ],
+    },
+    "CS": {
+        "dimensiones": {"ANCHO": "nums[0]", "LARGO": "nums[1]"},
+        "error_dimensiones": _error_dimensiones("CS"),
+        "pasos": [
+            {"filas": [["BCPN", 1, "LARGO"]]},
+            {
+                "variables": {"c": "refuerzos_cs(LARGO)"},
+                "filas": [
+                    ["REFUERZOGRANDE", "c", "ANCHO"],
+                    ["TUBO", "c", 47],
+                    ["BASTIDOR_LOSA_50", 2, "ANCHO"],
+                ],
+            },
+        ],
+    },
+}
+
+
+# --- Reglas compiladas ---
+
+_Regla = namedtuple("_Regla", ["dimensiones", "error_dimensiones", "pasos"])
+# segun=None: paso sin tramos (siempre aplica `otro`)
+_Paso = namedtuple("_Paso", ["segun", "desdes", "hastas", "tramos", "otro", "error"])
+# variables: código (exec) o None; filas: código (eval) de una tupla de
+# (perfil, piezas, largo), o None
+_Tramo = namedtuple("_Tramo", ["si", "variables", "filas"])
+
+_GLOBALES = {"__builtins__": {}, **FUNCIONES}
+
+
+def _formula(valor):
+    return valor if isinstance(valor, str) else repr(valor)
+
+
+def _compilar_tramo(datos, donde):
+    si = datos.get("si")
+    variables = datos.get("variables") or {}
+    filas = datos.get("filas") or []
+
+    codigo_variables = None
+    if variables:
+        fuente = "\n".join(f"{k} = {_formula(v)}" for k, v in variables.items())
+        codigo_variables = compile(fuente, f"<{donde}: variables>", "exec")
+
+    codigo_filas = None
+    if filas:
+        partes = []
+        for fila in filas:
+            perfil, piezas, largo = fila[:3]
+            tupla = f"({perfil!r}, {_formula(piezas)}, {_formula(largo)})"
+            if len(fila) > 3:
+                partes.append(f"*(({tupla},) if {_formula(fila[3])} else ())")
+            else:
+                partes.append(tupla)
+        fuente = f"({', '.join(partes)},)"
+        codigo_filas = compile(fuente, f"<{donde}: filas>", "eval")
+
+    return _Tramo(
+        compile(_formula(si), f"<{donde}: si>", "eval") if si is not None else None,
+        codigo_variables,
+        codigo_filas,
+    )
+
+
+def _compilar_paso(datos, donde):
+    otro = datos.get("otro")
+    if "segun" not in datos:
+        return _Paso(None, (), (), (), _compilar_tramo(datos, donde), None)
+
+    tramos = sorted(datos.get("tramos", []), key=lambda t: t["desde"])
+    for anterior, tramo in zip(tramos, tramos[1:]):
+        if tramo["desde"] <= anterior["hasta"]:
+            raise ValueError(
+                f"{donde}: tramos traslapados en {datos['segun']} "
+                f"({anterior['desde']}-{anterior['hasta']} y "
+                f"{tramo['desde']}-{tramo['hasta']})"
+            )
+    return _Paso(
+        compile(datos["segun"], f"<{donde}: segun>", "eval"),
+        tuple(t["desde"] for t in tramos),
+        tuple(t["hasta"] for t in tramos),
+        tuple(_compilar_tramo(t, donde) for t in tramos),
+        _compilar_tramo(otro, donde) if otro is not None else None,
+        datos.get("error"),
+    )
+
+
+def compilar_reglas(reglas):
+    """
+    Valida y compila un juego de reglas (con el formato de REGLAS).
+    Retorna {tipo: regla compilada}. Lanza ValueError si hay tramos traslapados.
+    """
+    compiladas = {}
+    for tipo, regla in reglas.items():
+        dimensiones = regla["dimensiones"]
+        fuente = (
+            f"{', '.join(dimensiones)}, = "
+            f"{', '.join(_formula(v) for v in dimensiones.values())},"
+        )
+        compiladas[tipo] = _Regla(
+            compile(fuente, f"<{tipo}: dimensiones>", "exec"),
+            regla.get("error_dimensiones", _error_dimensiones(tipo)),
+            tuple(
+                _compilar_paso(paso, f"{tipo} paso {i}")
+                for i, paso in enumerate(regla["pasos"])
+            ),
+        )
+    return compiladas
+
+
+def _elegir(paso, variables):
+    # tramo que calza, `otro`, o None si no calza ninguno
+    if paso.segun is None:
+        return paso.otro
+    x = eval(paso.segun, _GLOBALES, variables)
+    i = bisect_right(paso.desdes, x) - 1
+    if i >= 0 and x <= paso.hastas[i]:
+        tramo = paso.tramos[i]
+        if tramo.si is None or eval(tramo.si, _GLOBALES, variables):
+            return tramo
+    return paso.otro
+
+
+def evaluar_base(codigo):
+    """
+    Evalúa las reglas activas para UN panel del código (sin sufijos, ej.
+    WF600X2250), sin imprimir nada.
+    Retorna (filas, aviso): filas es una tupla de (panel, perfil, piezas,
+    largo, total_mm) y aviso es None si el código calza con las reglas, o el
+    mensaje de error (las filas son entonces las emitidas antes del error).
+    """
+    tipo, panel, nums, partes, _ = parsear(codigo)
+    regla = _activas.get(tipo)
+    if regla is None:
+        return (), f"Tipo de panel no reconocido: {codigo}"
+    variables = {"nums": nums, "partes": partes}
+    try:
+        exec(regla.dimensiones, _GLOBALES, variables)
+    except Exception:
+        return (), f"{regla.error_dimensiones} {codigo}"
+
+    filas = []
+    for paso in regla.pasos:
+        tramo = _elegir(paso, variables)
+        if tramo is None:
+            if paso.error is not None:
+                return tuple(filas), f"{paso.error} {panel}"
+            continue
+        if tramo.variables is not None:
+            exec(tramo.variables, _GLOBALES, variables)
+        if tramo.filas is not None:
+            for perfil, piezas, largo in eval(tramo.filas, _GLOBALES, variables):
+                filas.append((panel, perfil, piezas, largo, piezas * largo))
+    return tuple(filas), None
+
+
+def despiece_de_base(codigo):
+    """
+    Como evaluar_base, pero imprime el aviso si el código no calza con las
+    reglas.
+    Retorna la tupla de filas.
+    """
+    filas, aviso = evaluar_base(codigo)
+    if aviso is not None:
+        print(aviso)
+    return filas
+
+
+# --- Juego de reglas activo ---
+
+_reglas = REGLAS
+_activas = compilar_reglas(REGLAS)
+_huella = huella(json.dumps(REGLAS, sort_keys=True))
+
+
+def activar_reglas(reglas):
+    """
+    Reemplaza las reglas activas (se compilan antes: si fallan, quedan las
+    de antes). Usar backend.usar_reglas, que además olvida los cachés.
+    """
+    global _reglas, _activas, _huella
+    activas = compilar_reglas(reglas)
+    _reglas, _activas = reglas, activas
+    _huella = huella(json.dumps(reglas, sort_keys=True))
+
+
+def reglas_activas():
+    """Retorna el juego de reglas activo (datos, no compilado)."""
+    return _reglas
+
+
+def huella_reglas():
+    """Huella del juego de reglas activo."""
+    return _huella
+
+
+def cargar_reglas(ruta):
+    """Lee un juego de reglas desde un JSON. Retorna el dict de reglas."""
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_reglas(ruta, reglas=None):
+    """Escribe un juego de reglas (por defecto el activo) como JSON."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(
+            _reglas if reglas is None else reglas, f, ensure_ascii=False, indent=2
+        )
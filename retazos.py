@@ -0,0 +1,106 @@
+"""
+Inventario persistente de retazos (sobrantes de barra reutilizables).
+
+Los retazos se guardan en SQLite, uno por fila, indexados por (perfil, largo_mm)
+para que buscar los retazos de un perfil que sirven para cierto largo sea un
+recorrido del índice aunque haya cientos de miles guardados.
+"""
+
+import sqlite3
+from collections import Counter
+
+
+class InventarioRetazos:
+    """
+    Inventario de retazos en un archivo SQLite (":memory:" para uno temporal).
+    Los sobrantes más cortos que largo_minimo_mm se consideran chatarra y no
+    se guardan.
+    """
+
+    def __init__(self, ruta="retazos.db", largo_minimo_mm=300):
+        self.ruta = ruta
+        self.largo_minimo_mm = largo_minimo_mm
+        self.conexion = sqlite3.connect(ruta)
+        with self.conexion:
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS retazos ("
+                " id INTEGER PRIMARY KEY,"
+                " perfil TEXT NOT NULL,"
+                " largo_mm NUMERIC NOT NULL)"
+            )
+            self.conexion.execute(
+                "CREATE INDEX IF NOT EXISTS retazos_perfil_largo"
+                " ON retazos (perfil, largo_mm)"
+            )
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM retazos").fetchone()[0]
+
+    def __repr__(self):
+        return f"InventarioRetazos({self.ruta!r}, {len(self)} retazos)"
+
+    def agregar(self, perfil, largos):
+        """Guarda los largos de un perfil que alcanzan el largo mínimo."""
+        with self.conexion:
+            return self._agregar(perfil, largos)
+
+    def disponibles(self, perfil, largo_minimo_mm=0):
+        """Largos guardados de un perfil con al menos largo_minimo_mm, de menor a mayor."""
+        filas = self.conexion.execute(
+            "SELECT largo_mm FROM retazos"
+            " WHERE perfil = ? AND largo_mm >= ? ORDER BY largo_mm",
+            (perfil, largo_minimo_mm),
+        )
+        return [largo for (largo,) in filas]
+
+    def consumir(self, perfil, largos):
+        """Retira un retazo del perfil por cada largo de la lista."""
+        with self.conexion:
+            self._consumir(perfil, largos)
+
+    def registrar_plan(self, perfil, plan):
+        """
+        Aplica un plan de corte (ver corte.plan_de_corte) al inventario en una
+        sola transacción: retira los retazos usados y guarda los sobrantes con
+        su largo físico (plan["retazos_nuevos"]), porque plan_de_corte les
+        descuenta los recortes cada vez que los usa.
+        Retorna la cantidad de retazos nuevos guardados.
+        """
+        with self.conexion:
+            self._consumir(perfil, plan["retazos_usados"])
+            return self._agregar(perfil, plan["retazos_nuevos"])
+
+    def resumen(self):
+        """
+        Retorna {perfil: {"cantidad": n, "total_mm": suma de largos}}.
+        """
+        filas = self.conexion.execute(
+            "SELECT perfil, COUNT(*), SUM(largo_mm) FROM retazos"
+            " GROUP BY perfil ORDER BY perfil"
+        )
+        return {
+            perfil: {"cantidad": cantidad, "total_mm": total}
+            for perfil, cantidad, total in filas
+        }
+
+    # Sin commit: las llamadas públicas las envuelven en una transacción
+    def _agregar(self, perfil, largos):
+        filas = [
+            (perfil, float(largo)) for largo in largos if largo >= self.largo_minimo_mm
+        ]
+        self.conexion.executemany(
+            "INSERT INTO retazos (perfil, largo_mm) VALUES (?, ?)", filas
+        )
+        return len(filas)
+
+    def _consumir(self, perfil, largos):
+        for largo, cantidad in Counter(largos).items():
+            self.conexion.execute(
+                "DELETE FROM retazos WHERE id IN ("
+                " SELECT id FROM retazos"
+                " WHERE perfil = ? AND largo_mm = ? LIMIT ?)",
+                (perfil, largo, cantidad),
+            )
+
+    def cerrar(self):
+        self.conexion.close()
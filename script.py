@@ -1,1630 +1,374 @@
-import csv
-import math
-import re
+"""
+Reportes por consola sobre el mismo núcleo de cálculo que web.py (backend.py):
+los resultados y el caché son los mismos en ambas interfaces.
+
+Uso:
+  python script.py                  menú interactivo sobre paneles.csv
+  python script.py lote ENTRADAS... --dolar 970 [--reportes costos,resumen]
+                   [--formato txt|xlsx|parquet|arrow] [--salida DIR]
+                   [--procesos N] [--consolidar]
+
+El modo lote no pregunta nada: procesa cada CSV (o cada *.csv de los
+directorios entregados) en paralelo dentro de una sola invocación, escribe un
+reporte por pedido en DIR (y con --consolidar, el plan de corte de todos los
+pedidos juntos) y termina con código 1 si algún pedido falló (para cron).
+
+--reglas RUTA.json cambia las reglas de despiece por las de otra planta (ver
+reglas.py). Ambos modos parten con las plantillas de catalogo.db (--catalogo RUTA, o ''
+para no usarlo) y le agregan las bases nuevas de cada pedido.
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import os
+import sys
+
 import pandas as pd
 
-from collections import defaultdict
+from backend import (
+    DESIRED_ORDER,
+    calcular_area,
+    calcular_areas_por_base,
+    calcular_despiece_desde_agrupado,
+    calcular_materia_prima_por_perfil,
+    calcular_pedido,
+    calcular_soldadura_por_panel,
+    calcular_totales_perfiles,
+    calcular_totales_por_medida,
+    cargar_pedido_agrupado,
+    exportar_tablas,
+    exportar_todo,
+    parse_panel_code,
+    usar_reglas,
+)
+from catalogo import Catalogo, calentar
+from pedidos import procesar_pedidos, tablas_consolidado
+
+
+def _imprimir_pedido(calculo):
+    # Mostrar la “tabla dinámica”
+    df_pedido = calculo["df_pedido"]
+    print("\n=== Pedido agrupado por BASE ===")
+    print(f"{'Panel (base)':<20}{'Cantidad':>10}")
+    for _, row in df_pedido.iterrows():
+        print(f"{row['Panel (base)']:<20}{int(row['Cantidad']):>10}")
 
 
-def cargar_pedido_agrupado(input_csv="paneles.csv"):
-    """
-    Lee el CSV original y devuelve:
-      - cantidades_por_base: dict {BASE: cantidad_total}
-      - df_pedido: DataFrame con columnas ['Panel (base)', 'Cantidad'] (ordenado)
-    Normaliza el código eliminando todo lo que siga al primer '-'.
-    """
-    cantidades_por_base = defaultdict(int)
-    with open(input_csv, mode="r") as f:
-        reader = csv.reader(f)
-        next(reader, None)  # saltar encabezado
-        for row in reader:
-            if not row:
-                continue
-            panel_raw = row[0]
-            raw = row[1] if len(row) > 1 else "0"
-            cant = int(re.sub(r"\D", "", raw)) if re.search(r"\d", raw or "") else 0
-            if cant <= 0:
-                continue
-            base = parse_panel_code(panel_raw)["base"]  # ← quita sufijo después de '-'
-            cantidades_por_base[base] += cant
-
-    df_pedido = pd.DataFrame(
-        [
-            {"Panel (base)": k, "Cantidad": v}
-            for k, v in sorted(cantidades_por_base.items())
-        ]
+def _imprimir_despiece(calculo):
+    # 1) Despiece detallado
+    resultado_despiece = calculo["resultado_despiece"]
+    print("\n=== Despiece detallado ===")
+    print(
+        f"{'Panel':<15} {'Perfil':<35} {'Piezas':<8} {'Largo(mm)':<10} {'Total(mm)':<10}"
     )
-    return dict(cantidades_por_base), df_pedido
-
-
-def _agregar_despiece_de_panel(panel_base, cantidad, despiece):
-    """
-    Reusa la lógica que hoy tienes adentro del for del CSV,
-    pero recibiendo directamente (panel_base, cantidad).
-    panel_base debe venir SIN sufijos (ej. WF600X2250).
-    """
-    panel_raw = panel_base  # compat
-    info = parse_panel_code(panel_raw)
-    tipo = info["tipo"]
-    panel = info["base"]
-    nums = info["nums"]
-    partes = info["partes"]
-
-    # --- Panel WF ---
-    if tipo == "WF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel WF:", panel_raw)
-            return
-
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": cantidad * ALTO,
-                }
-            )
-        elif 301 <= ANCHO <= 399:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 175,
-                    "total_mm": 175 * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        elif 580 <= ANCHO <= 600:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 160,
-                    "total_mm": 160 * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        else:
-            print("Pieza WF no corresponde al catálogo:", panel)
-            return
-
-        # Elementos base para WF
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "REFUERZOCHICO",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": cantidad * ANCHO,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "REFUERZOGRANDE",
-                "numero_piezas": 6 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 6 * cantidad * ANCHO,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
-            }
-        )
-
-    # --- Panel SF ---
-    elif tipo == "SF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel SF:", panel_raw)
-            return
-
-        if 100 <= ANCHO <= 399:
-            pass
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        elif 580 <= ANCHO <= 600:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": 258,
-                    "total_mm": 258 * cantidad,
-                }
-            )
-        else:
-            print("ANCHO no corresponde en panel SF:", panel)
-            return
-
-        if 100 <= ALTO <= 2249:
-            a = 280
-            l = 1
-            rg = 0
-            rch = 0
-            while a < ALTO:
-                if l == 1 and a == 280:
-                    a += 79
-                elif l == 1:
-                    rg += 1
-                    rch -= 1
-                    a += 160
-                else:
-                    rch += 1
-                    a += 140
-                l *= -1
-            if rg != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOGRANDE",
-                        "numero_piezas": rg * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rg * ANCHO * cantidad,
-                    }
-                )  # FIX
-            if rch != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": rch * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rch * ANCHO * cantidad,
-                    }
-                )
-        else:
-            print("ALTO no permitido en panel SF:", panel)
-            return
-
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
-            }
+    for item in resultado_despiece:
+        print(
+            f"{item['panel']:<15} {item['perfil']:<35} {item['numero_piezas']:<8} {item['largo_pieza_mm']:<10} {item['total_mm']:<10}"
         )
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
 
-    # --- Panel MF ---
-    elif tipo == "MF":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel MF:", panel_raw)
-            return
-
-        a = 200
-        b = 0
-        c = 0
-        rg = 0
-        rch = 0
-        if 100 <= ALTO <= 2100:
-            a += 100
-            b = ALTO
-            while a < ALTO:
-                if a == 300:
-                    rch += 1
-                    a += 300
-                else:
-                    rg += 1
-                    a += 300
-                    c += 1
-            if c != 0:
-                b = ALTO - 275 - 300 * (c - 1)
-            if rg != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOGRANDE",
-                        "numero_piezas": rg * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rg * ANCHO * cantidad,
-                    }
-                )  # FIX
-            if rch != 0:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": rch * cantidad,
-                        "largo_pieza_mm": ANCHO,
-                        "total_mm": rch * ANCHO * cantidad,
-                    }
-                )
-        else:
-            print("ALTO no permitido en panel MF:", panel)
-            return
-
-        if 100 <= ANCHO <= 399:
-            pass
-        elif 400 <= ANCHO <= 579:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": b,
-                    "total_mm": b * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": b,
-                    "total_mm": b * cantidad,
-                }
-            )
 
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_MURO_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * cantidad * ANCHO,
-            }
+def _imprimir_totales(calculo):
+    # 2) Totales de perfiles
+    resultado_despiece = calculo["resultado_despiece"]
+    totales = calcular_totales_perfiles(resultado_despiece)
+    print("\n=== Totales de perfiles ===")
+    print(f"{'Perfil':<35} {'Piezas totales':<15} {'Total(mm)':<10}")
+    for perfil, datos in totales.items():
+        print(f"{perfil:<35} {datos['numero_piezas']:<15} {datos['total_mm']:<10}")
+
+
+def _imprimir_medidas(calculo):
+    # 3) Totales por medida
+    resultado_despiece = calculo["resultado_despiece"]
+    totales_medida = calcular_totales_por_medida(resultado_despiece)
+    print("\n=== Totales por medida (Perfil + Largo) ===")
+    print(f"{'Perfil':<35} {'Largo(mm)':<10} {'Piezas totales':<15} {'Total(mm)':<10}")
+    for (perfil, largo), datos in sorted(
+        totales_medida.items(), key=lambda x: (x[0][0].lower(), x[0][1])
+    ):
+        print(
+            f"{perfil:<35} {largo:<10} {datos['numero_piezas']:<15} {datos['total_mm']:<10}"
         )
-        if 100 <= ANCHO <= 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_MURO_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_MURO",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * cantidad * ALTO,
-                }
-            )
 
-    # --- Panel CL / CLI / CLE ---
-    elif tipo in ("CL", "CLI", "CLE"):
-        try:
-            if tipo == "CL":
-                # CL<ALTO>X<ANCHO>X<LARGO>
-                ALTO = int(partes[0][2:])
-                ANCHO = int(partes[1])
-                LARGO = int(partes[2])
-                ie = False
-                A = B = 0
-            else:
-                # CLI/CLE: CL?E<ALTO>X<ANCHO>X<A>X<B>
-                ALTO = int(partes[0][3:])
-                ANCHO = int(partes[1])
-                A = int(partes[2])
-                B = int(partes[3])
-                LARGO = 600
-                ie = True
-        except Exception:
-            print("Error extrayendo dimensiones en panel CL/CLE/CLI:", panel_raw)
-            return
-
-        if ALTO == 50:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN50",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL50",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
 
-        elif ALTO == 70:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN70",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL70",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
-
-        elif ALTO == 100:
-            if not ie:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": LARGO,
-                        "total_mm": LARGO * cantidad,
-                    }
-                )
-            else:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": A,
-                        "total_mm": A * cantidad,
-                    }
-                )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "CLN100",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": B,
-                        "total_mm": B * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_CL100",
-                    "numero_piezas": cantidad
-                    * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
-        else:
-            # Caso especial 70x150
-            if ANCHO == 70 and ALTO == 150:
-                if not ie:
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": LARGO,
-                            "total_mm": LARGO * cantidad,
-                        }
-                    )
-                else:
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": A,
-                            "total_mm": A * cantidad,
-                        }
-                    )
-                    despiece.append(
-                        {
-                            "panel": panel,
-                            "perfil": "CLN70",
-                            "numero_piezas": cantidad,
-                            "largo_pieza_mm": B,
-                            "total_mm": B * cantidad,
-                        }
-                    )
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZO_CL70",
-                        "numero_piezas": cantidad
-                        * (2 + (LARGO // 600 - 1) + (A // 600) + (B // 600)),
-                        "largo_pieza_mm": 0,
-                        "total_mm": 0,
-                    }
-                )
-            else:
-                print("ALTO no reconocido para panel CL:", panel)
-                return
+def _imprimir_materia_prima(calculo):
+    # 4) Materia prima por perfil (unificado con totales de perfiles)
+    resultado_despiece = calculo["resultado_despiece"]
+    totales = calcular_totales_perfiles(
+        resultado_despiece
+    )  # {perfil: {numero_piezas, total_mm}}
+    materia_prima = calcular_materia_prima_por_perfil(
+        resultado_despiece, longitud_perfil=5850
+    )
 
-    # --- Panel IC ---
-    elif tipo == "IC":
-        try:
-            ANCHO, ALTO, LARGO = nums[0], nums[1], nums[2]
-        except Exception:
-            print("Error extrayendo dimensiones en panel IC:", panel_raw)
-            return
-
-        if 100 <= LARGO <= 2400:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZO_IC",
-                    "numero_piezas": 2 * cantidad + (LARGO // 300 - 1) * cantidad,
-                    "largo_pieza_mm": 0,
-                    "total_mm": 0,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ICN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
-        else:
-            print("LARGO no permitido en panel IC:", panel)
-            return
+    print("\n=== Materia Prima necesaria por perfil (incluye totales) ===")
+    print(
+        f"{'Perfil':<35} {'Piezas totales':>15} {'Total(mm)':>12} {'Perfiles necesarios':>22} {'Waste (mm)':>12}"
+    )
 
-    # --- Panel OC ---
-    elif tipo == "OC":
-        try:
-            LARGO = nums[0]
-        except Exception:
-            print("Error extrayendo LARGO en panel OC:", panel_raw)
-            return
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "OCN",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": LARGO,
-                "total_mm": LARGO * cantidad,
-            }
+    # primero en el orden deseado
+    for perfil in DESIRED_ORDER:
+        d_tot = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
+        d_mp = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
+        print(
+            f"{perfil:<35} {d_tot['numero_piezas']:>15} {d_tot['total_mm']:>12} {d_mp['num_perfiles']:>22} {d_mp['waste_mm']:>12}"
         )
 
-    # --- Panel BH ---
-    elif tipo == "BH":
-        try:
-            ANCHO, LARGO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel BH:", panel_raw)
-            return
-        if ANCHO in [100, 110, 120]:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BH120",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BH150",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": LARGO * cantidad,
-                }
-            )
+    # luego los que no están en DESIRED_ORDER (orden alfabético)
+    otros = sorted(
+        [
+            p
+            for p in set(list(totales.keys()) + list(materia_prima.keys()))
+            if p not in DESIRED_ORDER
+        ]
+    )
+    for p in otros:
+        d_tot = totales.get(p, {"numero_piezas": 0, "total_mm": 0})
+        d_mp = materia_prima.get(p, {"num_perfiles": 0, "waste_mm": 0})
+        print(
+            f"{p:<35} {d_tot['numero_piezas']:>15} {d_tot['total_mm']:>12} {d_mp['num_perfiles']:>22} {d_mp['waste_mm']:>12}"
+        )
 
-    # --- Panel BCP ---
-    elif tipo == "BCP":
-        try:
-            ALTO, ANCHO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel BCP:", panel_raw)
-            return
-        if 100 <= ALTO <= 300 and 100 <= ANCHO <= 1800:
-            if 600 <= ANCHO <= 1349:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": ALTO * cantidad,
-                    }
-                )
-            elif 1350 <= ANCHO <= 1800:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": 2 * cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": 2 * ALTO * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BCPN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_50",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        else:
-            print("⚠️⚠️Pieza BCP no corresponde a ninguna del catálogo⚠️⚠️:", panel)
-            return
 
-    # --- Panel CP ---
-    elif tipo == "CP":
-        try:
-            ALTO, ANCHO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CP:", panel_raw)
-            return
-        if 100 <= ALTO <= 300 and 100 <= ANCHO <= 1800:
-            if 600 <= ANCHO <= 1349:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": ALTO * cantidad,
-                    }
-                )
-            elif 1350 <= ANCHO <= 1800:
-                despiece.append(
-                    {
-                        "panel": panel,
-                        "perfil": "REFUERZOCHICO",
-                        "numero_piezas": 2 * cantidad,
-                        "largo_pieza_mm": ALTO,
-                        "total_mm": 2 * ALTO * cantidad,
-                    }
-                )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BCPN",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_50",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        else:
-            print("⚠️⚠️Pieza CP no corresponde a ninguna del catálogo⚠️⚠️:", panel)
-            return
+def _imprimir_soldadura(calculo):
+    # 5) Soldadura por panel
+    resultado_despiece = calculo["resultado_despiece"]
+    soldadura = calcular_soldadura_por_panel(resultado_despiece)
+    print("\n=== Soldadura necesaria por panel ===")
+    print(f"{'Panel':<15} {'Soldadura (mm)':<15}")
+    for panel in sorted(soldadura.keys(), key=lambda x: x.lower()):
+        print(f"{panel:<15} {soldadura[panel]:<15}")
 
-    # --- Panel CE ---
-    elif tipo == "CE":
-        try:
-            ANCHO, ALTO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CE:", panel_raw)
-            return
-        if 100 <= ALTO <= 499:
-            LARGO = ALTO
-            C = 1
-        elif 500 <= ALTO <= 899:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": ANCHO * cantidad,
-                }
-            )
-            LARGO = ALTO // 2
-            C = 2
-        elif 900 <= ALTO <= 1199:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": 2 * ANCHO * cantidad,
-                }
-            )
-            LARGO = (300 + (ALTO - 300) / 2) // 2  # tu regla de negocio
-            C = 2
-        elif ALTO == 1200:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": 3 * cantidad,
-                    "largo_pieza_mm": ANCHO,
-                    "total_mm": 3 * ANCHO * cantidad,
-                }
-            )
-            LARGO = 300
-            C = 2
-        else:
-            print("Error en panel CE:", panel)
-            return
-
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_LOSA_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * ANCHO * cantidad,
-            }
-        )
-        if 100 <= ANCHO < 300:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "BASTIDOR_LOSA_54",
-                    "numero_piezas": cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": ALTO * cantidad,
-                }
-            )
-        elif 300 <= ANCHO <= 399:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-        elif 400 <= ANCHO <= 499:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOCHICO",
-                    "numero_piezas": C * cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": C * LARGO * cantidad,
-                }
-            )
-        else:
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "REFUERZOGRANDE",
-                    "numero_piezas": C * cantidad,
-                    "largo_pieza_mm": LARGO,
-                    "total_mm": C * LARGO * cantidad,
-                }
-            )
-            despiece.append(
-                {
-                    "panel": panel,
-                    "perfil": "ALA_LOSA",
-                    "numero_piezas": 2 * cantidad,
-                    "largo_pieza_mm": ALTO,
-                    "total_mm": 2 * ALTO * cantidad,
-                }
-            )
 
-    # --- Panel CS ---
-    elif tipo == "CS":
-        try:
-            ANCHO, LARGO = nums[0], nums[1]
-        except Exception:
-            print("Error extrayendo dimensiones en panel CS:", panel_raw)
-            return
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BCPN",
-                "numero_piezas": cantidad,
-                "largo_pieza_mm": LARGO,
-                "total_mm": LARGO * cantidad,
-            }
-        )
-        a = 100
-        c = 0
-        while a <= LARGO:
-            if a == 100:
-                a += 400
-            elif a == 500:
-                a += 400
-                c += 1
-            else:
-                a += 300
-                c += 1
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "REFUERZOGRANDE",
-                "numero_piezas": c * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": ANCHO * c * cantidad,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "TUBO",
-                "numero_piezas": c * cantidad,
-                "largo_pieza_mm": 47,
-                "total_mm": 47 * c * cantidad,
-            }
-        )
-        despiece.append(
-            {
-                "panel": panel,
-                "perfil": "BASTIDOR_LOSA_50",
-                "numero_piezas": 2 * cantidad,
-                "largo_pieza_mm": ANCHO,
-                "total_mm": 2 * ANCHO * cantidad,
-            }
+def _imprimir_tiempos(calculo):
+    # 6) Tiempos por panel
+    tiempos_panel = calculo["tiempos_panel"]
+    tiempo_total_general = calculo["tiempo_total_general"]
+    print("\n=== Tiempos por PANEL (min) ===")
+    print(f"{'Panel':<15} {'Corte':>6} {'Sold.':>6} {'Perf.':>6} {'Total':>6}")
+    for panel, d in tiempos_panel.items():
+        print(
+            f"{panel:<15} {d['tiempo_corte_min']:6.2f} {d['tiempo_soldadura_min']:6.2f} {d['tiempo_perforacion_min']:6.2f} {d['tiempo_total_min']:6.2f}"
         )
-
-    else:
-        print("Tipo de panel no reconocido:", panel_raw)
-        return
+    print(f"\nTiempo TOTAL fabricación: {tiempo_total_general / 60:.2f} horas")
 
 
-def calcular_despiece_desde_agrupado(cantidades_por_base):
-    despiece = []
-    for base, cantidad in cantidades_por_base.items():
-        if cantidad <= 0:
-            continue
-        _agregar_despiece_de_panel(base, cantidad, despiece)
-    return despiece
-
+def _imprimir_costos(calculo):
+    # 7) Costos por panel (fusionado con USD/m² + resumen del pedido)
+    cantidades_por_base = calculo["cantidades_por_base"]
+    costos_por_panel = calculo["costos_por_panel"]
+    print(
+        "\n=== Costos por panel (agrupado por BASE) — incluye USD/m² unit y resumen del pedido ==="
+    )
+    header = (
+        f"{'Panel (base)':<20}"
+        f"{'Cant.':>8}"
+        f"{'Área panel (m²)':>16}"
+        f"{'Costo unit (USD)':>18}"
+        f"{'USD/m² unit':>14}"
+        f"{'MP (USD)':>12}"
+        f"{'MO (USD)':>12}"
+        f"{'Insumos (USD)':>16}"
+        f"{'Energía (USD)':>16}"  # ← NUEVO
+        f"{'Total (USD)':>14}"
+    )
 
-def parse_panel_code(code):
-    """
-    Normaliza y extrae partes del código de panel.
-    Retorna:
-      - tipo: prefijo alfabético (ej. WF, SF, MF, CL, CLE, CLI, CE, IC, OC, BH, BCP, CP, CS)
-      - base: código sin sufijo después de '-' (ej. WF600X2250-ABC -> WF600X2250)
-      - nums: lista de enteros en orden de aparición
-      - partes: lista de strings separadas por 'X'
-    """
-    base = code.split("-", 1)[0]  # quita sufijos después de "-"
-    m = re.match(r"([A-Za-z_]+)", base)  # soporta letras y guiones bajos
-    tipo = m.group(1) if m else ""
-    nums = list(map(int, re.findall(r"\d+", base)))
-    partes = re.split(r"[xX]", base)
+    print(header)
 
-    # --- Normalización de tipos equivalentes ---
-    if tipo in ("ICC", "IC_Chico"):
-        tipo = "IC"
-    elif tipo in ("OCC", "OC_Chico", "OCH"):
-        tipo = "OC"
+    total_area = 0.0
+    total_costo = 0.0
+    total_unidades = 0
+
+    def _mo_total(d):
+        return (
+            d.get("costo_mo_corte_usd", 0.0)
+            + d.get("costo_mo_sold_usd", 0.0)
+            + d.get("costo_mo_perf_usd", 0.0)
+        )
 
-    return {"tipo": tipo, "base": base, "nums": nums, "partes": partes}
+    filas = []
+    for base, cant_total in sorted(
+        cantidades_por_base.items(), key=lambda x: x[0].lower()
+    ):
+        if cant_total <= 0:
+            continue
+        info = parse_panel_code(base)
+        _, _, area_unit = calcular_area(info["nums"])
+        if area_unit <= 0:
+            continue
 
+        dcost = costos_por_panel.get(base, {})
+        total_base = dcost.get("costo_total_usd", 0.0) or 0.0
+        mp_total = dcost.get("costo_mp_usd", 0.0) or 0.0
+        mo_total = _mo_total(dcost)
+        ins_total = dcost.get("costo_insumos_usd", 0.0) or 0.0
+        energia_total = dcost.get("costo_energia_usd", 0.0) or 0.0  # ← NUEVO
 
-def calcular_totales_perfiles(despiece):
-    """
-    Agrupa el despiece por perfil y suma el total de piezas y milímetros.
-    Retorna un diccionario en el que cada clave es el perfil.
-    """
-    totales = {}
-    for item in despiece:
-        perfil = item["perfil"]
-        if perfil not in totales:
-            totales[perfil] = {"numero_piezas": 0, "total_mm": 0}
-        totales[perfil]["numero_piezas"] += item["numero_piezas"]
-        totales[perfil]["total_mm"] += item["total_mm"]
-    return totales
+        costo_unit = total_base / cant_total
+        usd_m2_unit = costo_unit / area_unit
 
+        total_unidades += cant_total
+        total_area += area_unit * cant_total
+        total_costo += total_base
 
-def calcular_materia_prima_por_perfil(despiece, longitud_perfil=5850):
-    """
-    Para cada perfil del despiece, calcula cuántos perfiles de materia prima
-    (de longitud fija, por defecto 5850 mm) se necesitan para cortar todas las piezas,
-    utilizando first-fit decreasing para optimizar la utilización.
-    Retorna un diccionario con:
-      - num_perfiles: cantidad de perfiles necesarios
-      - waste_mm: desperdicio total en mm.
-    """
-    piezas_por_perfil = {}
-    for item in despiece:
-        perfil = item["perfil"]
-        largo = item["largo_pieza_mm"]
-        if largo <= 0:
-            continue
-        count = item["numero_piezas"]
-        piezas_por_perfil.setdefault(perfil, [])
-        piezas_por_perfil[perfil].extend([largo] * count)
-
-    resultados = {}
-    for perfil, piezas in piezas_por_perfil.items():
-        piezas.sort(reverse=True)
-        bins = []
-        for pieza in piezas:
-            placed = False
-            for i in range(len(bins)):
-                if bins[i] >= pieza:
-                    bins[i] -= pieza
-                    placed = True
-                    break
-            if not placed:
-                bins.append(longitud_perfil - pieza)
-        num_perfiles = len(bins)
-        waste = sum(bins)
-        resultados[perfil] = {"num_perfiles": num_perfiles, "waste_mm": waste}
-    return resultados
-
-
-def calcular_totales_por_medida(despiece):
-    """
-    Agrupa el despiece por (perfil, largo_pieza_mm) y suma las cantidades y totales.
-    Retorna un diccionario cuyas llaves son tuplas (perfil, largo_pieza_mm).
-    """
-    totales_medida = {}
-    for item in despiece:
-        key = (item["perfil"], item["largo_pieza_mm"])
-        if key not in totales_medida:
-            totales_medida[key] = {"numero_piezas": 0, "total_mm": 0}
-        totales_medida[key]["numero_piezas"] += item["numero_piezas"]
-        totales_medida[key]["total_mm"] += item["total_mm"]
-    return totales_medida
-
-
-def calcular_tiempos_por_panel(
-    despiece,
-    tiempo_por_corte_min=1.0,
-    velocidad_soldadura_mm_por_min=50.0,
-    tiempos_perforacion_por_tipo=None,
-):
-    if tiempos_perforacion_por_tipo is None:
-        tiempos_perforacion_por_tipo = {}
-
-    cortes_por_panel = {}
-    for item in despiece:
-        panel = item["panel"]
-        cortes_por_panel.setdefault(panel, 0)
-        cortes_por_panel[panel] += item["numero_piezas"]
-
-    soldadura_mm_por_panel = calcular_soldadura_por_panel(despiece)
-
-    tiempos_panel = {}
-    tiempo_total_general = 0.0
-
-    for panel, cortes in cortes_por_panel.items():
-        t_corte = cortes * tiempo_por_corte_min
-        mm_sold = soldadura_mm_por_panel.get(panel, 0)
-        t_sold = (
-            mm_sold / velocidad_soldadura_mm_por_min
-            if velocidad_soldadura_mm_por_min > 0
-            else 0
+        filas.append(
+            (
+                base,
+                cant_total,
+                area_unit,
+                costo_unit,
+                usd_m2_unit,
+                mp_total,
+                mo_total,
+                ins_total,
+                energia_total,
+                total_base,
+            )
         )
 
-        m = re.match(r"([A-Za-z]+)", panel)
-        tipo = m.group(1) if m else panel
-        t_perfor = cortes * tiempos_perforacion_por_tipo.get(tipo, 0)
-        t_total = t_corte + t_sold + t_perfor
-
-        tiempos_panel[panel] = {
-            "tiempo_corte_min": t_corte,
-            "tiempo_soldadura_min": t_sold,
-            "tiempo_perforacion_min": t_perfor,
-            "tiempo_total_min": t_total,
-        }
-        tiempo_total_general += t_total
-
-    return tiempos_panel, tiempo_total_general
-
-
-def calcular_costos_por_panel(
-    despiece,
-    tiempos_por_panel,
-    tasa_clp_usd,
-    detalle_insumos=True,
-    # --- NUEVO: costo de la energía y potencias de máquinas (puedes ajustar)
-    costo_kwh_usd=0.20,
-    potencias_kw=None,
-):
-    """
-    Calcula costos por panel e incluye detalle de insumos (cantidad y costo),
-    incluyendo ojales/remaches y AHORA energía eléctrica (kWh).
-
-    Retorna:
-      1) costos_por_panel: dict con MP, MO, insumos, energía y total por panel
-      2) total_general_usd: suma de todos los paneles en USD
-      3) detalle_costos: dict panel → {insumo/energia_usd: costo_usd, …}
-      4) detalle_unidades: dict panel → {insumo/energia_kwh: cantidad, …}
-    """
-    # --- Parámetros base ---
-    costo_aluminio_usd_por_kg = 3.828
-    peso_por_perfil = {
-        "ALA_LOSA": 4.316,
-        "ALA_MURO": 4.480,
-        "BASTIDOR_LOSA_50": 1.064,
-        "BASTIDOR_LOSA_54": 1.129,
-        "BASTIDOR_MURO_50": 1.368,
-        "BASTIDOR_MURO_54": 1.284,
-        "BCPN": 3.754,
-        "BH120": 4.615,
-        "BH150": 5.034,
-        "CLN100": 5.072,
-        "CLN50": 5.023,
-        "CLN70": 5.294,
-        "ICN": 6.838,
-        "OCN": 2.745,
-        "REFUERZOCHICO": 1.200,
-        "REFUERZOGRANDE": 1.274,
-        "TUBO": 1.923,
-    }
-    materia_prima_por_mm = {
-        p: (w / 1000.0) * costo_aluminio_usd_por_kg for p, w in peso_por_perfil.items()
-    }
-    mano_obra = {
-        "corte": 5056.0 / 60.0,
-        "soldadura": 6611.0 / 60.0,
-        "perforacion": 3889.0 / 60.0,
-    }
-
-    # --- NUEVO: potencias (kW) por proceso; ajusta a tus equipos reales
-    # Ejemplo: sierra tronzadora 2.2 kW, soldadura MIG 5.0 kW, taladro/esmeril 1.5 kW
-    if potencias_kw is None:
-        potencias_kw = {"corte": 5.0, "soldadura": 4.4, "perforacion": 25.0}
-
-    # Insumos estándar (no eléctricos)
-    insumos = {
-        "gas": {"costo": 12.77, "rendimiento": 575, "unidad": "m"},
-        "soldadura": {"costo": 17.62, "rendimiento": 150, "unidad": "m"},
-        "boquillas": {"costo": 0.84, "rendimiento": 150, "unidad": "m"},
-        "teflon": {"costo": 13.37, "rendimiento": 900, "unidad": "m"},
-        "tobera": {"costo": 4.57, "rendimiento": 750, "unidad": "m"},
-        "espiral": {"costo": 6.73, "rendimiento": 750, "unidad": "m"},
-        "difusor": {"costo": 2.42, "rendimiento": 750, "unidad": "m"},
-        "discos_lija": {"costo": 1.91, "rendimiento": 75, "unidad": "m"},
-        "discos_corte": {"costo": 1.06, "rendimiento": 750, "unidad": "m"},
-        "esmeril": {"costo": 37.23, "rendimiento": 30000, "unidad": "m"},
-    }
-
-    # --- Agrupación preliminar (versión segura) ---
-    materia_prima_por_panel = {}
-    cortes_por_panel = {}
-    for it in despiece:
-        p = it["panel"]
-        d = materia_prima_por_panel.setdefault(p, {})
-        d[it["perfil"]] = d.get(it["perfil"], 0) + it["total_mm"]
-        cortes_por_panel[p] = cortes_por_panel.get(p, 0) + it["numero_piezas"]
-
-    # --- Longitud de soldadura por panel ---
-    soldadura_mm_por_panel = calcular_soldadura_por_panel(despiece)
-
-    costos_por_panel = {}
-    detalle_costos = {}
-    detalle_unidades = {}
-    total_general_usd = 0.0
-
-    # --- Cálculo por panel ---
-    for panel, perfiles_mm in materia_prima_por_panel.items():
-        # Materia prima
-        costo_mp = sum(
-            mm * materia_prima_por_mm.get(perfil, 0)
-            for perfil, mm in perfiles_mm.items()
+    for (
+        base,
+        cant,
+        area_unit,
+        costo_unit,
+        usd_m2_unit,
+        mp_total,
+        mo_total,
+        ins_total,
+        energia_total,
+        total_base,
+    ) in filas:
+        print(
+            f"{base:<20}"
+            f"{cant:>8}"
+            f"{area_unit:>16.3f}"
+            f"{costo_unit:>18.2f}"
+            f"{usd_m2_unit:>14.2f}"
+            f"{mp_total:>12.2f}"
+            f"{mo_total:>12.2f}"
+            f"{ins_total:>16.2f}"
+            f"{energia_total:>16.2f}"  # ← NUEVO
+            f"{total_base:>14.2f}"
         )
 
-        # Mano de obra
-        t = tiempos_por_panel.get(panel, {})
-        t_corte_min = t.get("tiempo_corte_min", 0.0)
-        t_sold_min = t.get("tiempo_soldadura_min", 0.0)
-        t_perf_min = t.get("tiempo_perforacion_min", 0.0)
-
-        costo_mo_c = t_corte_min * mano_obra["corte"] / tasa_clp_usd
-        costo_mo_s = t_sold_min * mano_obra["soldadura"] / tasa_clp_usd
-        costo_mo_p = t_perf_min * mano_obra["perforacion"] / tasa_clp_usd
-
-        # Insumos estándar
-        soldadura_length = soldadura_mm_por_panel.get(panel, 0)
-        num_cortes = cortes_por_panel.get(panel, 0)
-
-        detalle_costos[panel] = {}
-        detalle_unidades[panel] = {}
-        costo_insumos = 0.0
-
-        sold_mm = soldadura_length
-        sold_m = sold_mm / 1000.0
-        t_sold = t_sold_min
-        cortes = num_cortes
-
-        for nombre, cfg in insumos.items():
-            rend = cfg.get("rendimiento", 0) or 0
-            unidad = cfg.get("unidad", "m")
-
-            if rend <= 0:
-                uds = 0.0
-            elif unidad == "m":
-                uds = sold_m / rend
-            elif unidad == "mm":
-                uds = sold_mm / rend
-            elif unidad == "min":
-                uds = t_sold / rend
-            elif unidad == "corte":
-                uds = cortes / rend
-            else:
-                uds = sold_m / rend
-
-            costo = uds * cfg["costo"]
-            detalle_unidades[panel][nombre] = round(uds, 3)
-            detalle_costos[panel][nombre] = costo
-            costo_insumos += costo
-
-        # --- Ojales y remaches (WF siempre; SF/MF solo si ANCHO=600) ---
-        info_panel = parse_panel_code(panel)
-        tipo_p = info_panel["tipo"]
-        nums_p = info_panel["nums"]
-
-        def _agregar_ojales_remaches(alto_mm):
-            ojal_count = (alto_mm // 300) * 2
-            remache_count = ojal_count * 2
-            detalle_unidades[panel]["ojales"] = ojal_count
-            cost_ojal = ojal_count * 0.927
-            detalle_costos[panel]["ojales"] = cost_ojal
-            detalle_unidades[panel]["remaches"] = remache_count
-            cost_rem = remache_count * 0.135
-            detalle_costos[panel]["remaches"] = cost_rem
-            return cost_ojal + cost_rem
-
-        if tipo_p == "WF":
-            alto_mm = nums_p[1] if len(nums_p) > 1 else 0
-            costo_insumos += _agregar_ojales_remaches(alto_mm)
-        elif tipo_p in ("SF", "MF"):
-            if len(nums_p) >= 2:
-                ancho_mm, alto_mm = nums_p[0], nums_p[1]
-                if ancho_mm == 600:
-                    costo_insumos += _agregar_ojales_remaches(alto_mm)
-
-        # --- NUEVO: Energía eléctrica (kWh y costo) ---
-        kwh_corte = (t_corte_min / 60.0) * (potencias_kw.get("corte", 0.0) or 0.0)
-        kwh_sold = (t_sold_min / 60.0) * (potencias_kw.get("soldadura", 0.0) or 0.0)
-        kwh_perf = (t_perf_min / 60.0) * (potencias_kw.get("perforacion", 0.0) or 0.0)
-        energia_kwh = kwh_corte + kwh_sold + kwh_perf
-        costo_energia = energia_kwh * costo_kwh_usd
-
-        # Guardar en detalle
-        detalle_unidades[panel]["energia_kwh"] = round(energia_kwh, 4)
-        detalle_costos[panel]["energia_usd"] = costo_energia
-
-        # Total por panel
-        total_panel = (
-            costo_mp
-            + costo_mo_c
-            + costo_mo_s
-            + costo_mo_p
-            + costo_insumos
-            + costo_energia
-        )
-        costos_por_panel[panel] = {
-            "costo_mp_usd": costo_mp,
-            "costo_mo_corte_usd": costo_mo_c,
-            "costo_mo_sold_usd": costo_mo_s,
-            "costo_mo_perf_usd": costo_mo_p,
-            "costo_insumos_usd": costo_insumos,
-            "costo_energia_usd": costo_energia,  # ← NUEVO
-            "costo_total_usd": total_panel,
-        }
-        total_general_usd += total_panel
-
-    return costos_por_panel, total_general_usd, detalle_costos, detalle_unidades
-
-
-def calcular_detalle_insumos(detalle_costos, detalle_unidades):
-    detalle_por_pieza = {}
-    total_pedido = {}
-
-    for panel, costos in detalle_costos.items():
-        detalle_por_pieza[panel] = {}
-        for insumo, costo in costos.items():  # << ahora usa 'costos'
-            uds = detalle_unidades.get(panel, {}).get(insumo, 0)
-            detalle_por_pieza[panel][insumo] = {"cantidad": uds, "costo_usd": costo}
-            if insumo not in total_pedido:
-                total_pedido[insumo] = {"cantidad_total": 0, "costo_total_usd": 0.0}
-            total_pedido[insumo]["cantidad_total"] += uds
-            total_pedido[insumo]["costo_total_usd"] += costo
-
-    return detalle_por_pieza, total_pedido
-
-
-def calcular_soldadura_por_panel(despiece):
-    # Agrupar items por panel
-    paneles = {}
-    for item in despiece:
-        panel_code = item["panel"]
-        paneles.setdefault(panel_code, []).append(item)
-
-    soldadura_por_panel = {}
-
-    for panel, items in paneles.items():
-        soldadura_total = 0
-        ala_muro_contado = (
-            False  # ALA_MURO / ALA_LOSA se cuentan una sola vez (tu regla actual)
+    precio_medio = (total_costo / total_area) if total_area > 0 else 0.0
+    print("\n--- Resumen del pedido ---")
+    print(f"Unidades totales           : {total_unidades}")
+    print(f"Área total del pedido (m²) : {total_area:.3f}")
+    print(f"Costo TOTAL pedido (USD)   : {total_costo:.2f}")
+    print(f"Precio medio (USD/m²)      : {precio_medio:.2f}\n")
+
+
+def _imprimir_insumos(calculo):
+    # 8) Detalle de insumos
+    detalle_por_pieza = calculo["detalle_por_pieza"]
+    total_insumos_pedido = calculo["total_insumos_pedido"]
+    print("\n=== Detalle de insumos POR PIEZA ===")
+    print(f"{'Panel':<15}{'Insumo':<15}{'Cantidad':>10}{'Costo USD':>12}")
+    for panel, insumos in detalle_por_pieza.items():
+        for nombre, datos in insumos.items():
+            cantidad = datos["cantidad"]
+            costo_usd = datos["costo_usd"]
+            print(f"{panel:<15}{nombre:<15}{cantidad:>10.3f}{costo_usd:>12.2f}")
+    print("\n=== Total insumos TODO PEDIDO ===")
+    print(f"{'Insumo':<15}{'Cant. Total':>12}{'Costo Total USD':>16}")
+    for nombre, tot in total_insumos_pedido.items():
+        print(
+            f"{nombre:<15}{tot['cantidad_total']:>12.3f}{tot['costo_total_usd']:>16.2f}"
         )
 
-        # Info base del código (tipo, números, etc.)
-        info = parse_panel_code(panel)
-        tipo = info["tipo"]
-        nums = info["nums"]
-
-        # 1) Aportes por perfil de cada ítem
-        for it in items:
-            perfil = it["perfil"]
-            largo = it["largo_pieza_mm"]
-            piezas = it["numero_piezas"]
-
-            if perfil in ("ALA_MURO", "ALA_LOSA"):
-                # regla actual: contar una sola vez por panel
-                if not ala_muro_contado:
-                    soldadura_total += largo
-                    ala_muro_contado = True
-
-            elif perfil in ("BASTIDOR_MURO_50", "BASTIDOR_LOSA_50"):
-                soldadura_total += (largo + 100) * piezas
-
-            elif perfil == "REFUERZOCHICO":
-                soldadura_total += (math.ceil(largo / 120) * 100 + 240) * piezas
-
-            elif perfil == "REFUERZOGRANDE":
-                soldadura_total += (math.ceil(largo / 120) * 100 + 400) * piezas
-
-            elif perfil == "REFUERZO_CL70":
-                soldadura_total += 270 * piezas
-
-            elif perfil in ("REFUERZO_CL100", "REFUERZO_CL50"):
-                soldadura_total += 250 * piezas
-
-            elif perfil == "REFUERZO_IC":
-                soldadura_total += 300 * piezas
-
-            elif perfil == "TUBO":
-                soldadura_total += 157 * piezas
-
-            # Otros perfiles: sin aporte de soldadura
-
-        # 2) Extras por tipo de panel (manteniendo tu lógica original)
-
-        # CLI / CLE: extra fijo
-        if "CLI" in panel or "CLE" in panel:
-            soldadura_total += 270 + 200
-
-        # CS / CP / BCP: usar helper para ALTO/ANCHO y sumar extras
-        if tipo in ("CS", "CP", "BCP"):
-            try:
-                # Para BCP/CP definimos antes ALTO, ANCHO (en ese orden)
-                # Para CS definimos ANCHO, LARGO, pero aquí sólo necesitamos ANCHO y ALTO.
-                # En tu lógica original, ALTO se lee del prefijo (CL/BCP/CP), para CS no está explícito.
-                # Conservamos tu criterio: en BCP/CP, ALTO es nums[0], ANCHO es nums[1].
-                if tipo in ("BCP", "CP"):
-                    ALTO, ANCHO = nums[0], nums[1]
-                    if tipo == "BCP":
-                        soldadura_total += 200  # extra cuando empieza con 'B' (BCP)
-                else:
-                    # CS: en tu cálculo original no se usó ALTO directamente aquí,
-                    # sólo después para condiciones en BCP/CP. Así que no hacemos nada especial.
-                    # Si alguna vez necesitas ALTO para CS, ajusta la regla aquí.
-                    ANCHO = nums[0]  # primera cifra es ANCHO en CS
-                    ALTO = None
-
-                if ALTO is not None:
-                    if ALTO > 150:
-                        soldadura_total += ANCHO * 2
-                    if ALTO < 150:
-                        soldadura_total += ANCHO
-            except Exception:
-                # Si falla el parse, no sumamos extras (mantenemos robustez)
-                pass
-
-        # IC: usar helper para ANCHO/ALTO/LARGO y sumar extras
-        if tipo == "IC":
-            try:
-                ANCHO, ALTO, LARGO = nums[0], nums[1], nums[2]
-                if ANCHO > 150 or ALTO > 150:
-                    soldadura_total += LARGO * 2
-                if ANCHO < 150 or ALTO < 150:
-                    soldadura_total += LARGO
-            except Exception:
-                pass
-
-        # WF: extra fijo
-        if tipo == "WF":
-            soldadura_total += 300
-
-        # CE: si ANCHO == 600, sumar 600
-        if tipo == "CE":
-            try:
-                ANCHO = nums[0]
-                if ANCHO == 600:
-                    soldadura_total += 600
-            except Exception:
-                pass
-
-        soldadura_por_panel[panel] = soldadura_total
-
-    return soldadura_por_panel
-
-
-# === Función para calcular área ===
-def calcular_area(dimensiones):
-    """
-    A partir de una lista de dimensiones (X-separadas), devuelve:
-      - ancho (mm)
-      - largo (mm)
-      - área en m²
-    """
-    if len(dimensiones) == 1:
-        ancho = 108
-        largo = dimensiones[0]
-    elif len(dimensiones) == 2:
-        ancho, largo = dimensiones
-    elif len(dimensiones) == 3:
-        ancho = dimensiones[0] + dimensiones[1]
-        largo = dimensiones[2]
-    elif len(dimensiones) == 4:
-        ancho = dimensiones[0] + dimensiones[1]
-        largo = dimensiones[2] + dimensiones[3]
-    else:
-        return 0, 0, 0
-    area = ancho * largo / 1_000_000
-    return ancho, largo, area
-
-
-# === Función para leer cantidades y calcular áreas ===
-def calcular_areas_por_panel(input_csv="paneles.csv"):
-    panel_counts = {}
-    with open(input_csv, mode="r") as f:
-        reader = csv.reader(f)
-        next(reader, None)  # Saltar encabezado
-        for row in reader:
-            if not row:
-                continue
-            panel, cant = row[0], row[1]
-            cantidad = (
-                int(re.sub(r"\D", "", cant)) if re.search(r"\d", cant or "") else 0
-            )
-            if cantidad == 0:
-                continue
-            panel_counts[panel] = cantidad
-
-    areas = {}
-    for panel, cantidad in panel_counts.items():
-        info = parse_panel_code(panel)
-        base = info["base"]
-        ancho, largo, area = calcular_area(info["nums"])
-        if area <= 0:
-            continue
-        areas[base] = {
-            "ancho_mm": ancho,
-            "largo_mm": largo,
-            "area_m2": area,
-            "cantidad": cantidad,
-            "area_total_m2": area * cantidad,
-        }
-
-    return areas
 
-
-def calcular_areas_por_base(cantidades_por_base):
-    filas = []
-    total_area = 0.0
-    for base, cant in sorted(cantidades_por_base.items(), key=lambda x: x[0].lower()):
-        _, _, area_unit = calcular_area(parse_panel_code(base)["nums"])
-        if area_unit <= 0:
-            continue
-        area_total = area_unit * cant
-        filas.append(
-            {
-                "Panel (base)": base,
-                "Cantidad": cant,
-                "Área panel (m²)": round(area_unit, 3),
-                "Área total (m²)": round(area_total, 3),
-            }
+def _imprimir_areas(calculo):
+    # 9) Cálculo de área (AGRUPADO por BASE)
+    cantidades_por_base = calculo["cantidades_por_base"]
+    filas_area, total_area_pedido = calcular_areas_por_base(cantidades_por_base)
+    print("\n=== Área por panel (agrupado por BASE) ===")
+    print(
+        f"{'Panel (base)':<20}{'Cant.':>8}{'Área panel (m²)':>16}{'Área total (m²)':>18}"
+    )
+    for r in filas_area:
+        print(
+            f"{r['Panel (base)']:<20}{r['Cantidad']:>8}{r['Área panel (m²)']:>16.3f}{r['Área total (m²)']:>18.3f}"
         )
-        total_area += area_total
-    return filas, total_area
-
-
-def resumen_totales_pedido(
-    resultado_despiece,
-    tiempos_panel,
-    tiempo_total_general,
-    costos_por_panel,
-    total_general_usd,
-    input_csv="paneles.csv",
-    cantidades_por_base=None,
-):
-    """
-    Resumen global del pedido ALINEADO con el cálculo por BASE:
-      - total_piezas_despiece
-      - total_paneles
-      - total_area_m2
-      - total_costo_usd
-      - total_tiempo_min / horas / días
-      - costo_promedio_usd_m2
-    """
-    # 1) Total piezas del despiece
-    total_piezas_despiece = sum(it.get("numero_piezas", 0) for it in resultado_despiece)
-
-    # 2) Si no viene el agrupado, lo construimos
-    if cantidades_por_base is None:
-        from collections import defaultdict
-
-        cantidades_por_base = defaultdict(int)
-        with open(input_csv, mode="r") as f:
-            reader = csv.reader(f)
-            next(reader, None)
-            for row in reader:
-                if not row:
-                    continue
-                panel = row[0]
-                raw = row[1] if len(row) > 1 else "0"
-                cant = int(re.sub(r"\D", "", raw)) if re.search(r"\d", raw or "") else 0
-                if cant <= 0:
-                    continue
-                base = parse_panel_code(panel)["base"]
-                cantidades_por_base[base] += cant
-        cantidades_por_base = dict(cantidades_por_base)
-
-    # 3) Totales
-    total_paneles = sum(cantidades_por_base.values())
-
-    # 4) Área TOTAL por BASE (una sola vez, usando el agrupado)
-    _, total_area_m2 = calcular_areas_por_base(cantidades_por_base)
-
-    # 5) Costos y tiempos
-    total_costo_usd = float(total_general_usd or 0.0)
-    total_tiempo_min = float(tiempo_total_general or 0.0)
-    total_tiempo_horas = total_tiempo_min / 60.0 if total_tiempo_min > 0 else 0.0
-    total_tiempo_dias = total_tiempo_horas / 8.0 if total_tiempo_horas > 0 else 0.0
-
-    # 6) Promedio USD/m²
-    costo_promedio_usd_m2 = (
-        (total_costo_usd / total_area_m2) if total_area_m2 > 0 else 0.0
+    print(f"\nÁrea TOTAL del pedido (m²): {total_area_pedido:.3f}")
+
+
+def _imprimir_resumen(calculo):
+    # 11) Resumen global
+    resumen = calculo["resumen"]
+    print("\n=== Resumen global del pedido ===")
+    print(f"{'Total piezas (despiece)':<30}: {resumen['total_piezas_despiece']}")
+    print(f"{'Total paneles (CSV)':<30}: {resumen['total_paneles']}")
+    print(f"{'Área total (m²)':<30}: {resumen['total_area_m2']:.3f}")
+    print(f"{'Costo total (USD)':<30}: {resumen['total_costo_usd']:.2f}")
+    print(f"{'Costo promedio (USD/m²)':<30}: {resumen['costo_promedio_usd_m2']:.2f}")
+    print(f"{'Tiempo total (min)':<30}: {resumen['total_tiempo_min']:.2f}")
+    print(f"{'Tiempo total (horas)':<30}: {resumen['total_tiempo_horas']:.2f}")
+    print(f"{'Tiempo total (días, 8h)':<30}: {resumen['total_tiempo_dias']:.2f}")
+
+
+# Reportes por nombre, en el orden del menú, y su opción en el menú interactivo
+REPORTES = {
+    "pedido": _imprimir_pedido,
+    "despiece": _imprimir_despiece,
+    "totales": _imprimir_totales,
+    "medidas": _imprimir_medidas,
+    "materia_prima": _imprimir_materia_prima,
+    "soldadura": _imprimir_soldadura,
+    "tiempos": _imprimir_tiempos,
+    "costos": _imprimir_costos,
+    "insumos": _imprimir_insumos,
+    "areas": _imprimir_areas,
+    "resumen": _imprimir_resumen,
+}
+OPCIONES = {
+    "1": "despiece",
+    "2": "totales",
+    "3": "medidas",
+    "4": "materia_prima",
+    "5": "soldadura",
+    "6": "tiempos",
+    "7": "costos",
+    "8": "insumos",
+    "9": "areas",
+    "11": "resumen",
+}
+# Hoja de exportar_todo / tabla de exportar_tablas de cada reporte (totales y
+# medidas sólo existen como texto; la materia prima ya incluye los totales)
+HOJAS_POR_REPORTE = {
+    "pedido": "Pedido_agrupado",
+    "despiece": "Despiece",
+    "materia_prima": "Materia prima",
+    "soldadura": "Soldadura",
+    "tiempos": "Tiempos",
+    "costos": "Costos",
+    "insumos": "Insumos",
+    "areas": "Áreas_BASE",
+    "resumen": "Resumen",
+}
+FORMATOS = ("txt", "xlsx", "parquet", "arrow")
+
+
+def _args_exportacion(calculo):
+    return (
+        calculo["resultado_despiece"],
+        calculo["cantidades_por_base"],
+        calculo["df_pedido"],
+        calculo["costos_por_panel"],
+        calculo["tiempos_panel"],
+        calculo["detalle_por_pieza"],
+        calculo["tasa"],
+        calculo["resumen"],
     )
 
-    return {
-        "total_piezas_despiece": total_piezas_despiece,
-        "total_paneles": total_paneles,
-        "total_area_m2": total_area_m2,
-        "total_costo_usd": total_costo_usd,
-        "total_tiempo_min": total_tiempo_min,
-        "total_tiempo_horas": total_tiempo_horas,
-        "total_tiempo_dias": total_tiempo_dias,
-        "costo_promedio_usd_m2": costo_promedio_usd_m2,
-    }
 
-
-def menu_exportacion(
-    resultado_despiece, cantidades_por_base, df_pedido, input_csv="paneles.csv"
-):
-    desired_order = [
-        "ALA_LOSA",
-        "ALA_MURO",
-        "BASTIDOR_LOSA_50",
-        "BASTIDOR_LOSA_54",
-        "BASTIDOR_MURO_50",
-        "BASTIDOR_MURO_54",
-        "BCPN",
-        "BH120",
-        "BH150",
-        "CLN50",
-        "CLN70",
-        "CLN100",
-        "ICN",
-        "OCN",
-        "REFUERZOCHICO",
-        "REFUERZOGRANDE",
-        "TUBO",
-    ]
-
-    # Valores por defecto y tiempos predefinidos
-    tiempo_por_corte = 1.25
-    velocidad_sold = 200.0
-    entrada = (
-        "WF:2,SF:2,MF:2,CL:0.2,CLI:1.5,CLE:1.5,IC:4,OC:1,BH:5,BCP:1,CP:0.9,CE:0.6,CS:1"
-    )
-    tiempos_perforacion_por_tipo = {}
-    for parte in entrada.split(","):
-        tipo, val = parte.split(":", 1)
-        try:
-            tiempos_perforacion_por_tipo[tipo] = float(val)
-        except ValueError:
-            tiempos_perforacion_por_tipo[tipo] = 0.0
-
-    # Pre-cálculos (una sola vez)
-    tiempos_panel, tiempo_total_general = calcular_tiempos_por_panel(
-        resultado_despiece,
-        tiempo_por_corte_min=tiempo_por_corte,
-        velocidad_soldadura_mm_por_min=velocidad_sold,
-        tiempos_perforacion_por_tipo=tiempos_perforacion_por_tipo,
-    )
+def menu_interactivo(input_csv="paneles.csv", catalogo=None):
+    # el pedido y el despiece quedan en caché: calcular_pedido los reutiliza
+    cantidades_por_base, df_pedido = cargar_pedido_agrupado(input_csv)
+    _imprimir_pedido({"df_pedido": df_pedido})
+    calcular_despiece_desde_agrupado(cantidades_por_base)
 
     # Pedir tasa con validación
     while True:
@@ -1637,25 +381,15 @@ def menu_exportacion(
         except ValueError:
             print("⚠️ Ingresa un número válido (ej: 970).")
 
-    costos_por_panel, total_general_usd, detalle_costos, detalle_unidades = (
-        calcular_costos_por_panel(resultado_despiece, tiempos_panel, tasa, True)
-    )
-
-    detalle_por_pieza, total_insumos_pedido = calcular_detalle_insumos(
-        detalle_costos, detalle_unidades
-    )
-    resumen = resumen_totales_pedido(
-        resultado_despiece=resultado_despiece,
-        tiempos_panel=tiempos_panel,
-        tiempo_total_general=tiempo_total_general,
-        costos_por_panel=costos_por_panel,
-        total_general_usd=total_general_usd,
-        input_csv=input_csv,
-        cantidades_por_base=cantidades_por_base,  # 👈 ¡clave!
-    )
+    calculo = calcular_pedido(input_csv, tasa)
+    if catalogo is not None:
+        catalogo.registrar(calculo["cantidades_por_base"])
 
     # --- Autotest rápido de consistencia de área ---
-    filas_area_test, total_area_test = calcular_areas_por_base(cantidades_por_base)
+    resumen = calculo["resumen"]
+    filas_area_test, total_area_test = calcular_areas_por_base(
+        calculo["cantidades_por_base"]
+    )
     if abs(resumen["total_area_m2"] - total_area_test) > 1e-9:
         print(
             f"⚠️ Inconsistencia de área. Resumen={resumen['total_area_m2']:.3f} vs cálculo por BASE={total_area_test:.3f}"
@@ -1682,417 +416,13 @@ def menu_exportacion(
             print("¡Hasta luego!")
             break
 
-        # 1) Despiece detallado
-        if opcion in ("1", "12"):
-            print("\n=== Despiece detallado ===")
-            print(
-                f"{'Panel':<15} {'Perfil':<35} {'Piezas':<8} {'Largo(mm)':<10} {'Total(mm)':<10}"
-            )
-            for item in resultado_despiece:
-                print(
-                    f"{item['panel']:<15} {item['perfil']:<35} {item['numero_piezas']:<8} {item['largo_pieza_mm']:<10} {item['total_mm']:<10}"
-                )
-
-        # 2) Totales de perfiles
-        if opcion in ("2", "12"):
-            totales = calcular_totales_perfiles(resultado_despiece)
-            print("\n=== Totales de perfiles ===")
-            print(f"{'Perfil':<35} {'Piezas totales':<15} {'Total(mm)':<10}")
-            for perfil, datos in totales.items():
-                print(
-                    f"{perfil:<35} {datos['numero_piezas']:<15} {datos['total_mm']:<10}"
-                )
-
-        # 3) Totales por medida
-        if opcion in ("3", "12"):
-            totales_medida = calcular_totales_por_medida(resultado_despiece)
-            print("\n=== Totales por medida (Perfil + Largo) ===")
-            print(
-                f"{'Perfil':<35} {'Largo(mm)':<10} {'Piezas totales':<15} {'Total(mm)':<10}"
-            )
-            for (perfil, largo), datos in sorted(
-                totales_medida.items(), key=lambda x: (x[0][0].lower(), x[0][1])
-            ):
-                print(
-                    f"{perfil:<35} {largo:<10} {datos['numero_piezas']:<15} {datos['total_mm']:<10}"
-                )
-
-        # 4) Materia prima por perfil (unificado con totales de perfiles)
-        if opcion in ("4", "12"):
-            totales = calcular_totales_perfiles(
-                resultado_despiece
-            )  # {perfil: {numero_piezas, total_mm}}
-            materia_prima = calcular_materia_prima_por_perfil(
-                resultado_despiece, longitud_perfil=5850
-            )
-
-            print("\n=== Materia Prima necesaria por perfil (incluye totales) ===")
-            print(
-                f"{'Perfil':<35} {'Piezas totales':>15} {'Total(mm)':>12} {'Perfiles necesarios':>22} {'Waste (mm)':>12}"
-            )
-
-            # primero en el orden deseado
-            for perfil in desired_order:
-                d_tot = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
-                d_mp = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
-                print(
-                    f"{perfil:<35} {d_tot['numero_piezas']:>15} {d_tot['total_mm']:>12} {d_mp['num_perfiles']:>22} {d_mp['waste_mm']:>12}"
-                )
-
-            # luego los que no están en desired_order (orden alfabético)
-            otros = sorted(
-                [
-                    p
-                    for p in set(list(totales.keys()) + list(materia_prima.keys()))
-                    if p not in desired_order
-                ]
-            )
-            for p in otros:
-                d_tot = totales.get(p, {"numero_piezas": 0, "total_mm": 0})
-                d_mp = materia_prima.get(p, {"num_perfiles": 0, "waste_mm": 0})
-                print(
-                    f"{p:<35} {d_tot['numero_piezas']:>15} {d_tot['total_mm']:>12} {d_mp['num_perfiles']:>22} {d_mp['waste_mm']:>12}"
-                )
-
-        # 5) Soldadura por panel
-        if opcion in ("5", "12"):
-            soldadura = calcular_soldadura_por_panel(resultado_despiece)
-            print("\n=== Soldadura necesaria por panel ===")
-            print(f"{'Panel':<15} {'Soldadura (mm)':<15}")
-            for panel in sorted(soldadura.keys(), key=lambda x: x.lower()):
-                print(f"{panel:<15} {soldadura[panel]:<15}")
-
-        # 6) Tiempos por panel
-        if opcion in ("6", "12"):
-            print("\n=== Tiempos por PANEL (min) ===")
-            print(f"{'Panel':<15} {'Corte':>6} {'Sold.':>6} {'Perf.':>6} {'Total':>6}")
-            for panel, d in tiempos_panel.items():
-                print(
-                    f"{panel:<15} {d['tiempo_corte_min']:6.2f} {d['tiempo_soldadura_min']:6.2f} {d['tiempo_perforacion_min']:6.2f} {d['tiempo_total_min']:6.2f}"
-                )
-            print(f"\nTiempo TOTAL fabricación: {tiempo_total_general / 60:.2f} horas")
-
-        # 7) Costos por panel (fusionado con USD/m² + resumen del pedido)
-        if opcion in ("7", "12"):
-            print(
-                "\n=== Costos por panel (agrupado por BASE) — incluye USD/m² unit y resumen del pedido ==="
-            )
-            header = (
-                f"{'Panel (base)':<20}"
-                f"{'Cant.':>8}"
-                f"{'Área panel (m²)':>16}"
-                f"{'Costo unit (USD)':>18}"
-                f"{'USD/m² unit':>14}"
-                f"{'MP (USD)':>12}"
-                f"{'MO (USD)':>12}"
-                f"{'Insumos (USD)':>16}"
-                f"{'Energía (USD)':>16}"  # ← NUEVO
-                f"{'Total (USD)':>14}"
-            )
-
-            print(header)
-
-            total_area = 0.0
-            total_costo = 0.0
-            total_unidades = 0
-
-            def _mo_total(d):
-                return (
-                    d.get("costo_mo_corte_usd", 0.0)
-                    + d.get("costo_mo_sold_usd", 0.0)
-                    + d.get("costo_mo_perf_usd", 0.0)
-                )
-
-            filas = []
-            for base, cant_total in sorted(
-                cantidades_por_base.items(), key=lambda x: x[0].lower()
-            ):
-                if cant_total <= 0:
-                    continue
-                info = parse_panel_code(base)
-                _, _, area_unit = calcular_area(info["nums"])
-                if area_unit <= 0:
-                    continue
-
-                dcost = costos_por_panel.get(base, {})
-                total_base = dcost.get("costo_total_usd", 0.0) or 0.0
-                mp_total = dcost.get("costo_mp_usd", 0.0) or 0.0
-                mo_total = _mo_total(dcost)
-                ins_total = dcost.get("costo_insumos_usd", 0.0) or 0.0
-                energia_total = dcost.get("costo_energia_usd", 0.0) or 0.0  # ← NUEVO
-
-                costo_unit = total_base / cant_total
-                usd_m2_unit = costo_unit / area_unit
-
-                total_unidades += cant_total
-                total_area += area_unit * cant_total
-                total_costo += total_base
-
-                filas.append(
-                    (
-                        base,
-                        cant_total,
-                        area_unit,
-                        costo_unit,
-                        usd_m2_unit,
-                        mp_total,
-                        mo_total,
-                        ins_total,
-                        energia_total,
-                        total_base,
-                    )
-                )
-
-            for (
-                base,
-                cant,
-                area_unit,
-                costo_unit,
-                usd_m2_unit,
-                mp_total,
-                mo_total,
-                ins_total,
-                energia_total,
-                total_base,
-            ) in filas:
-                print(
-                    f"{base:<20}"
-                    f"{cant:>8}"
-                    f"{area_unit:>16.3f}"
-                    f"{costo_unit:>18.2f}"
-                    f"{usd_m2_unit:>14.2f}"
-                    f"{mp_total:>12.2f}"
-                    f"{mo_total:>12.2f}"
-                    f"{ins_total:>16.2f}"
-                    f"{energia_total:>16.2f}"  # ← NUEVO
-                    f"{total_base:>14.2f}"
-                )
-
-            precio_medio = (total_costo / total_area) if total_area > 0 else 0.0
-            print("\n--- Resumen del pedido ---")
-            print(f"Unidades totales           : {total_unidades}")
-            print(f"Área total del pedido (m²) : {total_area:.3f}")
-            print(f"Costo TOTAL pedido (USD)   : {total_costo:.2f}")
-            print(f"Precio medio (USD/m²)      : {precio_medio:.2f}\n")
-
-        # 8) Detalle de insumos
-        if opcion in ("8", "12"):
-            print("\n=== Detalle de insumos POR PIEZA ===")
-            print(f"{'Panel':<15}{'Insumo':<15}{'Cantidad':>10}{'Costo USD':>12}")
-            for panel, insumos in detalle_por_pieza.items():
-                for nombre, datos in insumos.items():
-                    cantidad = datos["cantidad"]
-                    costo_usd = datos["costo_usd"]
-                    print(f"{panel:<15}{nombre:<15}{cantidad:>10.3f}{costo_usd:>12.2f}")
-            print("\n=== Total insumos TODO PEDIDO ===")
-            print(f"{'Insumo':<15}{'Cant. Total':>12}{'Costo Total USD':>16}")
-            for nombre, tot in total_insumos_pedido.items():
-                print(
-                    f"{nombre:<15}{tot['cantidad_total']:>12.3f}{tot['costo_total_usd']:>16.2f}"
-                )
-
-        # 9) Cálculo de área (AGRUPADO por BASE)
-        if opcion in ("9", "12"):
-            filas_area, total_area_pedido = calcular_areas_por_base(cantidades_por_base)
-            print("\n=== Área por panel (agrupado por BASE) ===")
-            print(
-                f"{'Panel (base)':<20}{'Cant.':>8}{'Área panel (m²)':>16}{'Área total (m²)':>18}"
-            )
-            for r in filas_area:
-                print(
-                    f"{r['Panel (base)']:<20}{r['Cantidad']:>8}{r['Área panel (m²)']:>16.3f}{r['Área total (m²)']:>18.3f}"
-                )
-            print(f"\nÁrea TOTAL del pedido (m²): {total_area_pedido:.3f}")
-
-        # 11) Resumen global
-        if opcion in ("11", "12"):
-            print("\n=== Resumen global del pedido ===")
-            print(
-                f"{'Total piezas (despiece)':<30}: {resumen['total_piezas_despiece']}"
-            )
-            print(f"{'Total paneles (CSV)':<30}: {resumen['total_paneles']}")
-            print(f"{'Área total (m²)':<30}: {resumen['total_area_m2']:.3f}")
-            print(f"{'Costo total (USD)':<30}: {resumen['total_costo_usd']:.2f}")
-            print(
-                f"{'Costo promedio (USD/m²)':<30}: {resumen['costo_promedio_usd_m2']:.2f}"
-            )
-            print(f"{'Tiempo total (min)':<30}: {resumen['total_tiempo_min']:.2f}")
-            print(f"{'Tiempo total (horas)':<30}: {resumen['total_tiempo_horas']:.2f}")
-            print(
-                f"{'Tiempo total (días, 8h)':<30}: {resumen['total_tiempo_dias']:.2f}"
-            )
+        for numero, nombre in OPCIONES.items():
+            if opcion in (numero, "12"):
+                REPORTES[nombre](calculo)
 
         # 12) Exportar TODO a Excel (además de imprimir)
         if opcion == "12":
-            # Reconstruimos estructuras que usamos arriba
-            totales = calcular_totales_perfiles(resultado_despiece)
-            materia_prima = calcular_materia_prima_por_perfil(
-                resultado_despiece, longitud_perfil=5850
-            )
-            soldadura = calcular_soldadura_por_panel(resultado_despiece)
-
-            # Áreas por BASE (misma lógica que opción 9 y resumen)
-            filas_area_base, total_area_base = calcular_areas_por_base(
-                cantidades_por_base
-            )
-
-            with pd.ExcelWriter("reporte_completo.xlsx", engine="openpyxl") as writer:
-                # 0) Pedido agrupado
-                df_pedido.to_excel(writer, sheet_name="Pedido_agrupado", index=False)
-
-                # 1) Despiece detallado
-                pd.DataFrame(resultado_despiece).to_excel(
-                    writer, sheet_name="Despiece", index=False
-                )
-
-                # 2) Materia prima (unificada con totales)
-                filas_mp = []
-                # primero desired_order
-                for perfil in desired_order:
-                    t = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
-                    m = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
-                    filas_mp.append(
-                        {
-                            "Perfil": perfil,
-                            "Piezas totales": t["numero_piezas"],
-                            "Total(mm)": t["total_mm"],
-                            "Perfiles necesarios (5850mm)": m["num_perfiles"],
-                            "Waste (mm)": m["waste_mm"],
-                        }
-                    )
-                # luego otros perfiles
-                otros = sorted(
-                    [
-                        p
-                        for p in set(list(totales.keys()) + list(materia_prima.keys()))
-                        if p not in desired_order
-                    ]
-                )
-                for p in otros:
-                    t = totales.get(p, {"numero_piezas": 0, "total_mm": 0})
-                    m = materia_prima.get(p, {"num_perfiles": 0, "waste_mm": 0})
-                    filas_mp.append(
-                        {
-                            "Perfil": p,
-                            "Piezas totales": t["numero_piezas"],
-                            "Total(mm)": t["total_mm"],
-                            "Perfiles necesarios (5850mm)": m["num_perfiles"],
-                            "Waste (mm)": m["waste_mm"],
-                        }
-                    )
-                pd.DataFrame(filas_mp).to_excel(
-                    writer, sheet_name="Materia prima", index=False
-                )
-
-                # 3) Soldadura
-                pd.DataFrame(
-                    [{"Panel": k, "Soldadura(mm)": v} for k, v in soldadura.items()]
-                ).to_excel(writer, sheet_name="Soldadura", index=False)
-
-                # 4) Tiempos por panel
-                df_tiempos = pd.DataFrame.from_dict(
-                    tiempos_panel, orient="index"
-                ).reset_index()
-                df_tiempos.rename(columns={"index": "Panel"}, inplace=True)
-                df_tiempos.to_excel(writer, sheet_name="Tiempos", index=False)
-
-                # 5) Costos por panel (agrupado por BASE) — usa cantidades_por_base ya existente
-                filas_costos = []
-
-                def _mo_total(d):
-                    return (
-                        (d.get("costo_mo_corte_usd", 0.0) or 0.0)
-                        + (d.get("costo_mo_sold_usd", 0.0) or 0.0)
-                        + (d.get("costo_mo_perf_usd", 0.0) or 0.0)
-                    )
-
-                for base, cant_total in sorted(
-                    cantidades_por_base.items(), key=lambda x: x[0].lower()
-                ):
-                    if cant_total <= 0:
-                        continue
-                    info = parse_panel_code(base)
-                    _, _, area_unit = calcular_area(info["nums"])
-                    if area_unit <= 0:
-                        continue
-
-                    dcost = costos_por_panel.get(base, {})
-                    mp_total = dcost.get("costo_mp_usd", 0.0) or 0.0
-                    mo_total = _mo_total(dcost)
-                    insumos_total = dcost.get("costo_insumos_usd", 0.0) or 0.0
-                    total_base = dcost.get("costo_total_usd", 0.0) or 0.0
-
-                    energia_total = (
-                        dcost.get("costo_energia_usd", 0.0) or 0.0
-                    )  # ← NUEVO
-
-                    costo_unit = total_base / cant_total if cant_total else 0.0
-                    usd_m2_unit = (costo_unit / area_unit) if area_unit > 0 else 0.0
-
-                    filas_costos.append(
-                        {
-                            "Panel (base)": base,
-                            "Cantidad": cant_total,
-                            "Área panel (m²)": round(area_unit, 3),
-                            "Costo unit (USD)": round(costo_unit, 2),
-                            "USD/m² unit": round(usd_m2_unit, 2),
-                            "MP (USD)": round(mp_total, 2),
-                            "MO (USD)": round(mo_total, 2),
-                            "Insumos (USD)": round(insumos_total, 2),
-                            "Energía (USD)": round(energia_total, 2),  # ← NUEVO
-                            "Total (USD)": round(total_base, 2),
-                        }
-                    )
-
-                pd.DataFrame(filas_costos).to_excel(
-                    writer, sheet_name="Costos", index=False
-                )
-
-                # 6) Detalle de insumos por pieza
-                filas_insumos = []
-                for panel, ins in detalle_por_pieza.items():
-                    for nombre, datos in ins.items():
-                        filas_insumos.append(
-                            {
-                                "Panel": panel,
-                                "Insumo": nombre,
-                                "Cantidad": datos["cantidad"],
-                                "Costo USD": datos["costo_usd"],
-                            }
-                        )
-                pd.DataFrame(filas_insumos).to_excel(
-                    writer, sheet_name="Insumos", index=False
-                )
-
-                # 7) Áreas (por BASE)
-                pd.DataFrame(filas_area_base).to_excel(
-                    writer, sheet_name="Áreas_BASE", index=False
-                )
-
-                # 8) Resumen (mismas métricas que 'resumen' ya calculado)
-                df_resumen = pd.DataFrame(
-                    [
-                        {
-                            "Total piezas (despiece)": resumen["total_piezas_despiece"],
-                            "Total paneles (CSV)": resumen["total_paneles"],
-                            "Área total (m²)": round(
-                                resumen["total_area_m2"], 3
-                            ),  # viene de calcular_areas_por_base
-                            "Costo total (USD)": round(resumen["total_costo_usd"], 2),
-                            "Costo promedio (USD/m²)": round(
-                                resumen["costo_promedio_usd_m2"], 2
-                            ),
-                            "Tiempo total (horas)": round(
-                                resumen["total_tiempo_horas"], 2
-                            ),
-                            "Tiempo total (días, 8h)": round(
-                                resumen["total_tiempo_dias"], 2
-                            ),
-                            "Tasa CLP→USD usada": tasa,
-                        }
-                    ]
-                )
-                df_resumen.to_excel(writer, sheet_name="Resumen", index=False)
+            exportar_todo(*_args_exportacion(calculo), destino="reporte_completo.xlsx")
 
             print(
                 "\n📂 Archivo 'reporte_completo.xlsx' generado con todas las pestañas."
@@ -2103,18 +433,244 @@ def menu_exportacion(
             print("⚠️ Opción no válida, inténtalo de nuevo.")
 
 
-if __name__ == "__main__":
-    input_csv = "paneles.csv"
-    cantidades_por_base, df_pedido = cargar_pedido_agrupado(input_csv)
+def _nombre_reporte(input_csv):
+    """Nombre de los reportes de un pedido: el de su CSV, sin extensión."""
+    return os.path.splitext(os.path.basename(input_csv))[0]
 
-    # Mostrar la “tabla dinámica”
-    print("\n=== Pedido agrupado por BASE ===")
-    print(f"{'Panel (base)':<20}{'Cantidad':>10}")
-    for _, row in df_pedido.iterrows():
-        print(f"{row['Panel (base)']:<20}{int(row['Cantidad']):>10}")
 
-    # Despiece SOLO desde el agrupado
-    resultado_despiece = calcular_despiece_desde_agrupado(cantidades_por_base)
+def _escribir_reportes(input_csv, calculo, reportes, formato, salida):
+    """
+    Escribe los reportes de un pedido en salida (corre en el proceso del
+    pedido, ver pedidos.procesar_pedidos).
+    Retorna la ruta escrita.
+    """
+    nombre = _nombre_reporte(input_csv)
+    if formato == "txt":
+        destino = os.path.join(salida, f"{nombre}.txt")
+        with open(destino, "w", encoding="utf-8") as f:
+            with contextlib.redirect_stdout(f):
+                for reporte in reportes:
+                    REPORTES[reporte](calculo)
+        return destino
+
+    hojas = [HOJAS_POR_REPORTE[r] for r in reportes]
+    if formato == "xlsx":
+        destino = os.path.join(salida, f"{nombre}.xlsx")
+        exportar_todo(*_args_exportacion(calculo), destino=destino, hojas=hojas)
+    else:
+        destino = os.path.join(salida, nombre)
+        os.makedirs(destino, exist_ok=True)
+        exportar_tablas(
+            *_args_exportacion(calculo), destino=destino, formato=formato, hojas=hojas
+        )
+    return destino
+
+
+def _escribir_con_bases(input_csv, calculo, **kwargs):
+    """
+    Escribe los reportes del pedido (ver _escribir_reportes).
+    Retorna (ruta escrita, bases del pedido), para registrarlas en el catálogo.
+    """
+    destino = _escribir_reportes(input_csv, calculo, **kwargs)
+    return destino, list(calculo["cantidades_por_base"])
 
-    # 👇 pasa el agrupado y el df
-    menu_exportacion(resultado_despiece, cantidades_por_base, df_pedido, input_csv)
+
+def _registrar_en_catalogo(ruta, bases):
+    # el catálogo es un caché: si falla, se avisa y los pedidos siguen escritos
+    try:
+        catalogo = Catalogo(ruta)
+        try:
+            catalogo.registrar(bases)
+        finally:
+            catalogo.cerrar()
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el catálogo {ruta}: {e}", file=sys.stderr)
+
+
+def _escribir_consolidado(consolidado, formato, salida):
+    """Escribe el plan de corte consolidado. Retorna la ruta escrita."""
+    perfiles, asignacion = tablas_consolidado(consolidado)
+    if formato == "txt":
+        destino = os.path.join(salida, "consolidado.txt")
+        with open(destino, "w", encoding="utf-8") as f:
+            f.write("=== Plan de corte consolidado por perfil ===\n")
+            f.write(perfiles.to_string(index=False))
+            f.write("\n\n=== Asignación a cada pedido ===\n")
+            f.write(asignacion.to_string(index=False) + "\n")
+    elif formato == "xlsx":
+        destino = os.path.join(salida, "consolidado.xlsx")
+        with pd.ExcelWriter(destino, engine="openpyxl") as writer:
+            perfiles.to_excel(writer, sheet_name="Consolidado", index=False)
+            asignacion.to_excel(writer, sheet_name="Asignación", index=False)
+    else:
+        destino = os.path.join(salida, "consolidado")
+        os.makedirs(destino, exist_ok=True)
+        for nombre, tabla in (("perfiles", perfiles), ("asignacion", asignacion)):
+            ruta = os.path.join(destino, f"{nombre}.{formato}")
+            if formato == "parquet":
+                tabla.to_parquet(ruta, index=False)
+            else:
+                tabla.to_feather(ruta, compression="uncompressed")  # Arrow IPC
+    return destino
+
+
+def procesar_lote(
+    entradas,
+    tasa,
+    reportes,
+    formato="txt",
+    salida=".",
+    procesos=None,
+    consolidar=False,
+    catalogo=None,
+):
+    """
+    Procesa varios pedidos sin preguntar nada: los imports se pagan una vez y
+    los pedidos se reparten entre procesos (ver pedidos.procesar_pedidos).
+    entradas: rutas de CSV o directorios (se toman sus *.csv).
+    Escribe en salida un <pedido>.txt / <pedido>.xlsx, o un directorio
+    <pedido>/ con una tabla por reporte (parquet/arrow). Con consolidar,
+    además el plan de corte de todos los pedidos juntos ("consolidado"). Si
+    dos reportes quedarían con el mismo nombre, no procesa nada (ValueError).
+    catalogo: ruta de un catalogo.Catalogo para partir con sus plantillas y
+    guardar al final las bases nuevas (si eso falla sólo se avisa).
+    Retorna (rutas escritas, [(csv, error)] de los pedidos que fallaron).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no reconocido: {formato}")
+    if formato != "txt":
+        sin_hoja = [r for r in reportes if r not in HOJAS_POR_REPORTE]
+        if sin_hoja:
+            raise ValueError(
+                f"Reportes sin tabla para {formato}: {', '.join(sin_hoja)}"
+            )
+
+    archivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            archivos.extend(sorted(glob.glob(os.path.join(entrada, "*.csv"))))
+        else:
+            archivos.append(entrada)
+    # todos los reportes van al mismo directorio: dos pedidos con el mismo
+    # nombre (ej. x/pedido.csv e y/pedido.csv) se pisarían
+    vistos = {"consolidado": "el consolidado"} if consolidar else {}
+    for archivo in archivos:
+        nombre = _nombre_reporte(archivo)
+        if nombre in vistos:
+            raise ValueError(
+                f"{archivo} y {vistos[nombre]} escribirían el mismo reporte"
+                f" ({nombre}) en {salida}"
+            )
+        vistos[nombre] = archivo
+
+    os.makedirs(salida, exist_ok=True)
+    procesar = functools.partial(
+        _escribir_reportes, reportes=reportes, formato=formato, salida=salida
+    )
+    if catalogo:
+        calentar(catalogo).cerrar()  # antes de crear los procesos: lo heredan
+        procesar = functools.partial(
+            _escribir_con_bases,
+            reportes=reportes,
+            formato=formato,
+            salida=salida,
+        )
+    lote = procesar_pedidos(
+        archivos,
+        tasa,
+        procesar=procesar,
+        procesos=procesos,
+        consolidar=consolidar,
+    )
+    escritos = list(lote["pedidos"].values())
+    if catalogo:
+        # una sola escritura, desde este proceso, con las bases de todos
+        _registrar_en_catalogo(catalogo, [b for _, bases in escritos for b in bases])
+        escritos = [destino for destino, _ in escritos]
+    if consolidar and lote["pedidos"]:
+        escritos.append(_escribir_consolidado(lote["consolidado"], formato, salida))
+    return escritos, list(lote["errores"].items())
+
+
+def _lista_reportes(texto):
+    reportes = [r.strip() for r in texto.split(",") if r.strip()]
+    desconocidos = [r for r in reportes if r not in REPORTES]
+    if desconocidos:
+        raise argparse.ArgumentTypeError(
+            f"reportes desconocidos: {', '.join(desconocidos)} "
+            f"(opciones: {', '.join(REPORTES)})"
+        )
+    return reportes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes de pedidos de paneles.")
+    parser.add_argument(
+        "--reglas",
+        default=None,
+        help="JSON con otro juego de reglas de despiece (ver reglas.py)",
+    )
+    parser.add_argument(
+        "--catalogo",
+        default="catalogo.db",
+        help="catálogo de paneles ya calculados ('' para no usarlo)",
+    )
+    sub = parser.add_subparsers(dest="comando")
+    lote = sub.add_parser("lote", help="procesa pedidos sin preguntar nada")
+    lote.add_argument("entradas", nargs="+", help="CSV de pedidos o directorios")
+    lote.add_argument("--dolar", type=float, required=True, help="tasa CLP→USD")
+    lote.add_argument(
+        "--reportes",
+        type=_lista_reportes,
+        default=None,
+        help="lista separada por comas (por defecto todos los del formato)",
+    )
+    lote.add_argument("--formato", choices=FORMATOS, default="txt")
+    lote.add_argument("--salida", default=".", help="directorio de salida")
+    lote.add_argument(
+        "--procesos",
+        type=int,
+        default=None,
+        help="procesos en paralelo (por defecto uno por núcleo)",
+    )
+    lote.add_argument(
+        "--consolidar",
+        action="store_true",
+        help="además, plan de corte con las piezas de todos los pedidos juntas",
+    )
+    args = parser.parse_args(argv)
+    if args.reglas:
+        usar_reglas(args.reglas)  # antes del catálogo: su versión depende de las reglas
+
+    if args.comando is None:
+        catalogo = calentar(args.catalogo) if args.catalogo else None
+        menu_interactivo("paneles.csv", catalogo)
+        return 0
+
+    if args.dolar <= 0:
+        parser.error("la tasa debe ser mayor que 0")
+    reportes = args.reportes
+    if reportes is None:
+        reportes = list(REPORTES if args.formato == "txt" else HOJAS_POR_REPORTE)
+    try:
+        escritos, errores = procesar_lote(
+            args.entradas,
+            args.dolar,
+            reportes,
+            args.formato,
+            args.salida,
+            procesos=args.procesos,
+            consolidar=args.consolidar,
+            catalogo=args.catalogo,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    for ruta in escritos:
+        print(ruta)
+    for input_csv, error in errores:
+        print(f"⚠️ {input_csv}: {error}", file=sys.stderr)
+    return 1 if errores or not escritos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Vistas paginadas de tablas grandes: el filtro y el orden se hacen en el
+servidor y al navegador sólo se envía la página visible.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_PAGINA = 100
+
+
+def filtrar_y_ordenar(tabla, filtro="", ordenar_por=None, descendente=False):
+    """
+    Filtra las filas donde alguna columna de texto contiene filtro (sin
+    distinguir mayúsculas) y ordena por la columna ordenar_por (None = orden
+    original). Las columnas categóricas se filtran sobre sus categorías, sin
+    recorrer cada fila como string, y se ordenan alfabéticamente (no en el
+    orden de sus categorías).
+    Retorna un DataFrame nuevo con índice 0..n-1.
+    """
+    if filtro:
+        filtro = filtro.lower()
+        mascara = np.zeros(len(tabla), dtype=bool)
+        for columna in tabla.columns:
+            valores = tabla[columna]
+            if isinstance(valores.dtype, pd.CategoricalDtype):
+                categorias = valores.cat.categories.astype(str).str.lower()
+                coincide = np.append(
+                    categorias.str.contains(filtro, regex=False), False
+                )
+                # código -1 (nulo) cae en el False agregado al final
+                mascara |= coincide[valores.cat.codes.to_numpy()]
+            elif pd.api.types.is_string_dtype(valores):
+                mascara |= (
+                    valores.astype(str)
+                    .str.lower()
+                    .str.contains(filtro, regex=False)
+                    .to_numpy(dtype=bool)
+                )
+        tabla = tabla[mascara]
+    if ordenar_por is not None:
+        tabla = tabla.sort_values(
+            ordenar_por, ascending=not descendente, kind="stable", key=_clave_orden
+        )
+    return tabla.reset_index(drop=True)
+
+
+def _clave_orden(valores):
+    # las categorías vienen en orden de aparición (ej. Despiece.a_dataframe):
+    # se reordenan alfabéticamente, sin convertir cada fila a string
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        categorias = valores.cat.categories
+        orden = np.argsort(categorias.astype(str), kind="stable")
+        return valores.cat.reorder_categories(categorias[orden], ordered=True)
+    return valores
+
+
+def paginar(tabla, pagina, filas_por_pagina=FILAS_POR_PAGINA):
+    """
+    Corta la página pedida (desde 1; se ajusta al rango válido).
+    Retorna (filas de la página, número de páginas).
+    """
+    paginas = max(1, math.ceil(len(tabla) / filas_por_pagina))
+    pagina = min(max(1, pagina), paginas)
+    inicio = (pagina - 1) * filas_por_pagina
+    return tabla.iloc[inicio : inicio + filas_por_pagina], paginas
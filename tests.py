@@ -1,24 +1,59 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import zipfile
+
 import pandas as pd
+import pyarrow as pa
+from openpyxl import load_workbook
 
+from codigos import parse_many
+from ejemplos import CANTIDADES_POR_BASE, DF_PEDIDO
+from huellas import cache_por_huella
+from pipeline import Pipeline
+import trabajos
+from tablas import filtrar_y_ordenar, paginar
+from corte import corte_optimo, first_fit_decreasing, plan_de_corte
+from retazos import InventarioRetazos
+from escenarios import (
+    coeficientes_de_costo,
+    costos_por_panel_escenarios,
+    evaluar_escenarios,
+    grilla_de_escenarios,
+)
+from modelo_costos import IndiceCostos
+from catalogo import Catalogo
+from reglas import REGLAS, compilar_reglas, guardar_reglas
+from refuerzos import refuerzos_cs, refuerzos_mf, refuerzos_sf
+from pedidos import consolidar_materia_prima
+from script import procesar_lote
 from backend import (
+    HOJAS_EXPORTACION,
+    Despiece,
+    _agregar_despiece_de_panel,
+    _plantilla_despiece,
+    calcular_costos_por_panel,
+    calcular_despiece_desde_agrupado,
+    calcular_totales_perfiles,
+    calcular_detalle_insumos,
+    calcular_tiempos_pedido,
+    calcular_tiempos_por_panel,
+    cargar_pedido_agrupado,
+    exportar_tablas,
+    exportar_todo,
+    menu_exportacion,
+    usar_reglas,
+    resumen_totales_pedido,
     parse_panel_code,
 )
 
 
-CANTIDADES_POR_BASE = {"WF600X2250": 10, "SF400X2000": 5}
-DF_PEDIDO = pd.DataFrame(
-    [
-        {"Panel (base)": "WF600X2250", "Cantidad": 10},
-        {"Panel (base)": "SF400X2000", "Cantidad": 5},
-    ]
-)
-
-
 def assert_equals(x, y):
     assert x == y, f"{x} != {y}"
 
 
-
 assert_equals(
     parse_panel_code(list(CANTIDADES_POR_BASE.keys())[0]),
     {
@@ -29,5 +64,442 @@ assert_equals(
     },
 )
 
+despiece_esperado = []
+for base, cantidad in CANTIDADES_POR_BASE.items():
+    _agregar_despiece_de_panel(base, cantidad, despiece_esperado)
+assert_equals(
+    list(calcular_despiece_desde_agrupado(CANTIDADES_POR_BASE)), despiece_esperado
+)
+assert_equals(list(Despiece.desde_filas(despiece_esperado)), despiece_esperado)
+assert_equals(
+    calcular_totales_perfiles(pd.DataFrame(despiece_esperado)),
+    calcular_totales_perfiles(despiece_esperado),
+)
+assert_equals(
+    calcular_totales_perfiles(despiece_esperado)["ALA_MURO"],
+    {"numero_piezas": 20 + 10, "total_mm": 20 * 2250 + 10 * 2000},
+)
+
+
+# Refuerzos en forma cerrada == los ciclos originales, para todo alto permitido
+# (SF 100-2249, MF 100-2100; CS no tiene límite)
+def _ciclo_sf(alto):
+    a, signo, rg, rch = 280, 1, 0, 0
+    while a < alto:
+        if signo == 1 and a == 280:
+            a += 79
+        elif signo == 1:
+            rg += 1
+            rch -= 1
+            a += 160
+        else:
+            rch += 1
+            a += 140
+        signo *= -1
+    return rg, rch
+
+
+def _ciclo_mf(alto):
+    a, b, c, rg, rch = 300, alto, 0, 0, 0
+    while a < alto:
+        if a == 300:
+            rch += 1
+        else:
+            rg += 1
+            c += 1
+        a += 300
+    if c != 0:
+        b = alto - 275 - 300 * (c - 1)
+    return rg, rch, b
+
+
+def _ciclo_cs(largo):
+    a, c = 100, 0
+    while a <= largo:
+        if a == 100:
+            a += 400
+        elif a == 500:
+            a += 400
+            c += 1
+        else:
+            a += 300
+            c += 1
+    return c
+
+
+for alto in range(0, 6001):
+    if alto <= 2249:
+        assert_equals(refuerzos_sf(alto), _ciclo_sf(alto))
+    if alto <= 2100:
+        assert_equals(refuerzos_mf(alto), _ciclo_mf(alto))
+    assert_equals(refuerzos_cs(alto), _ciclo_cs(alto))
+
+# Reglas como datos: el juego de reglas de otra planta se carga desde JSON sin
+# tocar código, y los tramos traslapados se rechazan al compilar
+planta = {
+    "WF": {
+        "dimensiones": {"ANCHO": "nums[0]", "ALTO": "nums[1]"},
+        "pasos": [
+            {
+                "segun": "ANCHO",
+                "tramos": [
+                    {"desde": 100, "hasta": 600, "filas": [["ALA_MURO", 2, "ALTO"]]}
+                ],
+                "error": "WF fuera de catálogo:",
+            }
+        ],
+    }
+}
+# Los resultados derivados del despiece y el catálogo siguen a las reglas
+pedido_wf = {"WF600X2250": 3}
+calcular_totales_perfiles(calcular_despiece_desde_agrupado(pedido_wf))
+catalogo = Catalogo(":memory:")
+version_original = catalogo.version
+with tempfile.TemporaryDirectory() as directorio:
+    ruta_reglas = os.path.join(directorio, "planta.json")
+    guardar_reglas(ruta_reglas, planta)
+    usar_reglas(ruta_reglas)
+    despiece_planta = calcular_despiece_desde_agrupado(pedido_wf)
+    assert_equals(
+        list(despiece_planta),
+        [
+            {
+                "panel": "WF600X2250",
+                "perfil": "ALA_MURO",
+                "numero_piezas": 6,
+                "largo_pieza_mm": 2250,
+                "total_mm": 13500,
+            }
+        ],
+    )
+    assert_equals(
+        calcular_totales_perfiles(despiece_planta),
+        {"ALA_MURO": {"numero_piezas": 6, "total_mm": 13500}},
+    )
+    assert_equals(catalogo.registrar(pedido_wf), 1)
+    assert_equals(catalogo.version != version_original, True)
+    assert_equals(
+        catalogo.obtener("WF600X2250")["plantilla"], _plantilla_despiece("WF600X2250")
+    )
+usar_reglas(REGLAS)
+assert_equals(catalogo.registrar(pedido_wf), 1)  # otra versión: se vuelve a guardar
+catalogo.cerrar()
+assert_equals(
+    list(calcular_despiece_desde_agrupado(CANTIDADES_POR_BASE)), despiece_esperado
+)
+planta["WF"]["pasos"][0]["tramos"].append({"desde": 600, "hasta": 700})
+try:
+    compilar_reglas(planta)
+    raise AssertionError("se esperaba ValueError por tramos traslapados")
+except ValueError:
+    pass
+
+# FFD por lotes == FFD pieza a pieza: [900 x 2] | [700 x 3] | [400 x 5] | [400 x 4]
+assert_equals(
+    first_fit_decreasing([(400, 9), (900, 2), (700, 3)], longitud_perfil=2100),
+    [300, 0, 100, 500],
+)
+assert_equals(first_fit_decreasing([(2500, 2)], longitud_perfil=2100), [-400, -400])
+
+# FFD usa 4 barras; el óptimo es 3: [46, 46] | [46, 23, 23] | [33, 33, 33]
+optimo = corte_optimo([(23, 2), (46, 3), (33, 3)], longitud_perfil=100)
+assert_equals(
+    (optimo["num_perfiles"], optimo["waste_mm"], optimo["cota_inferior"]), (3, 17, 3)
+)
+
+# Con 10 mm de sierra, 3 piezas de 1000 no caben en 2000 y sí en una de 3100
+plan = plan_de_corte([(1000, 3)], largos_barra=(2000, 3100), kerf_mm=10)
+assert_equals((plan["barras"], plan["sobrantes"]), ({3100: 1}, [(3100, 70)]))
+
+# El retazo se usa primero; la pieza restante cabe en la barra corta tras recortes
+plan = plan_de_corte(
+    [(1000, 2)],
+    largos_barra=(2000, 3100),
+    kerf_mm=10,
+    recorte_cabeza_mm=5,
+    recorte_cola_mm=5,
+    retazos=[1500],
+)
+assert_equals(
+    (plan["barras"], plan["retazos_usados"], plan["sobrantes"]),
+    ({2000: 1}, [1500], [(1500, 480), (2000, 980)]),
+)
+
+# El inventario entrega el retazo, lo retira y guarda los sobrantes útiles
+inventario = InventarioRetazos(":memory:", largo_minimo_mm=500)
+inventario.agregar("ALA_MURO", [1500, 200])
+plan = plan_de_corte(
+    [(1000, 2)], largos_barra=(2000,), retazos=inventario.disponibles("ALA_MURO")
+)
+assert_equals(inventario.registrar_plan("ALA_MURO", plan), 2)
+assert_equals(inventario.disponibles("ALA_MURO"), [500, 1000])
+
+# Con recortes, el retazo se guarda con su largo físico (1500 - 5 de cabeza -
+# 1000; la cola sigue pegada) y al reusarlo los recortes se descuentan una vez
+recortes = {"recorte_cabeza_mm": 5, "recorte_cola_mm": 5}
+inventario = InventarioRetazos(":memory:", largo_minimo_mm=300)
+inventario.agregar("ALA_MURO", [1500])
+plan = plan_de_corte(
+    [(1000, 1)],
+    largos_barra=(2000,),
+    retazos=inventario.disponibles("ALA_MURO"),
+    **recortes,
+)
+inventario.registrar_plan("ALA_MURO", plan)
+assert_equals(inventario.disponibles("ALA_MURO"), [495])
+plan = plan_de_corte(
+    [(485, 1)],
+    largos_barra=(2000,),
+    retazos=inventario.disponibles("ALA_MURO"),
+    **recortes,
+)
+assert_equals((plan["barras"], plan["retazos_usados"]), ({}, [495]))
+
+# Lectura en streaming: se agrupa por base y se puede releer el mismo archivo
+csv_file = io.BytesIO(
+    "Panel,Cantidad\nWF600X2250-A,4\nSF400X2000-B,5 un\n\nWF600X2250-C,6\n".encode()
+)
+for _ in range(2):
+    cantidades, df_pedido = cargar_pedido_agrupado(csv_file)
+    assert_equals(cantidades, CANTIDADES_POR_BASE)
+assert_equals(df_pedido.to_dict("records"), DF_PEDIDO[::-1].to_dict("records"))
+
+# Los sufijos comparten el mismo resultado (inmutable) de la base
+wf_a, ic, wf_b = parse_many(["WF600X2250-A", "IC_Chico100X200", "WF600X2250-B"])
+assert_equals(wf_a is wf_b, True)
+assert_equals((ic.tipo, ic.letras, ic.nums), ("IC", "IC", (100, 200)))
+
+# Caché por huella: la misma llamada (con argumentos normalizados) no se recalcula
+llamadas = []
+
+
+@cache_por_huella()
+def _doble(valores, factor=2):
+    llamadas.append(factor)
+    return [v * factor for v in valores]
+
+
+doble = _doble([1, 2])
+assert_equals(_doble(doble) is _doble(doble, factor=2), True)
+assert_equals((_doble([1, 2], 3), llamadas), ([3, 6], [2, 2, 3]))
+
+# Pipeline: al cambiar una entrada sólo se recalculan las etapas que dependen de ella
+calculos = []
+pipeline = Pipeline()
+pipeline.etapa("doble", lambda x: calculos.append("doble") or 2 * x, "x")
+pipeline.etapa("suma", lambda d, y: calculos.append("suma") or d + y, "doble", "y")
+pipeline.entrada("x", 1)
+pipeline.entrada("y", 10)
+assert_equals(pipeline.obtener("suma"), 12)
+pipeline.entrada("x", 1)  # mismo valor: no es un cambio
+pipeline.entrada("y", 20)
+assert_equals(pipeline.obtener("suma"), 22)
+assert_equals(calculos, ["doble", "suma", "suma"])
+
+# Vista paginada: filtra (también categóricas), ordena y corta la página en el servidor
+tabla = calcular_despiece_desde_agrupado(CANTIDADES_POR_BASE).a_dataframe()
+vista = filtrar_y_ordenar(tabla, "ala_", ordenar_por="total_mm", descendente=True)
+assert_equals(vista["total_mm"].tolist(), [45000, 20000])
+# las categóricas se ordenan por su texto, no por orden de aparición
+for descendente in (False, True):
+    vista = filtrar_y_ordenar(tabla, ordenar_por="perfil", descendente=descendente)
+    perfiles = vista["perfil"].astype(str).tolist()
+    assert_equals(perfiles, sorted(perfiles, reverse=descendente))
+pagina, paginas = paginar(tabla, 99, filas_por_pagina=5)
+assert_equals(
+    (len(pagina), paginas), (len(tabla) - 5 * (paginas - 1), -(-len(tabla) // 5))
+)
+
+# Excel en modo write-only: nueve hojas, con las filas del despiece tal cual
+despiece = calcular_despiece_desde_agrupado(CANTIDADES_POR_BASE)
+costos = menu_exportacion(despiece, 970)
+tiempos = calcular_tiempos_por_panel(despiece)
+args_exportacion = (
+    despiece,
+    CANTIDADES_POR_BASE,
+    DF_PEDIDO,
+    costos[0],
+    tiempos[0],
+    calcular_detalle_insumos(costos[2], costos[3])[0],
+    970,
+    resumen_totales_pedido(
+        despiece, tiempos[0], tiempos[1], costos[0], costos[1], CANTIDADES_POR_BASE
+    ),
+)
+libro = load_workbook(exportar_todo(*args_exportacion), read_only=True)
+assert_equals(libro.sheetnames, list(HOJAS_EXPORTACION))
+assert_equals(
+    list(libro["Despiece"].values)[1:], [tuple(fila) for fila in despiece.filas()]
+)
+# Tablas Arrow en un zip: tipadas y con panel/perfil como diccionario
+with zipfile.ZipFile(exportar_tablas(*args_exportacion, destino=io.BytesIO())) as z:
+    assert_equals(len(z.namelist()), len(HOJAS_EXPORTACION))
+    tabla = pa.ipc.open_file(z.read("despiece.arrow")).read_all()
+assert_equals(pa.types.is_dictionary(tabla.schema.field("perfil").type), True)
+assert_equals(tabla.column("total_mm").to_pylist(), despiece.total_mm.tolist())
+
+
+# Sólo las hojas pedidas, y el modo lote de script.py: un reporte por pedido
+libro = load_workbook(
+    exportar_todo(*args_exportacion, hojas=("Costos", "Resumen")), read_only=True
+)
+assert_equals(libro.sheetnames, ["Costos", "Resumen"])
+with tempfile.TemporaryDirectory() as directorio:
+    pedido_csv = os.path.join(directorio, "semana.csv")
+    with open(pedido_csv, "w") as f:
+        f.write("Panel,Cantidad\nWF600X2250-A,10\nSF400X2000,5\n")
+    escritos, errores = procesar_lote(
+        [directorio, "no_existe.csv"], 970, ["resumen"], "xlsx", directorio, procesos=1
+    )
+    assert_equals([os.path.basename(r) for r in escritos], ["semana.xlsx"])
+    assert_equals([csv for csv, _ in errores], ["no_existe.csv"])
+    assert_equals(load_workbook(escritos[0]).sheetnames, ["Resumen"])
+
+    # Con catálogo, las bases de los pedidos se guardan al final del lote
+    ruta_catalogo = os.path.join(directorio, "catalogo.db")
+    escritos, errores = procesar_lote(
+        [pedido_csv],
+        970,
+        ["resumen"],
+        "xlsx",
+        directorio,
+        procesos=1,
+        catalogo=ruta_catalogo,
+    )
+    assert_equals(
+        ([os.path.basename(r) for r in escritos], errores), (["semana.xlsx"], [])
+    )
+    catalogo = Catalogo(ruta_catalogo)
+    assert_equals(sorted(catalogo.plantillas()), ["SF400X2000", "WF600X2250"])
+    catalogo.cerrar()
+
+    # Dos pedidos con el mismo nombre en distintos directorios se pisarían
+    otro = os.path.join(directorio, "otro")
+    os.makedirs(otro)
+    with open(os.path.join(otro, "semana.csv"), "w") as f:
+        f.write("Panel,Cantidad\nWF600X2250,1\n")
+    try:
+        procesar_lote([directorio, otro], 970, ["resumen"], "xlsx", directorio)
+        raise AssertionError("se esperaba ValueError por reportes con el mismo nombre")
+    except ValueError:
+        pass
+
+# Varios pedidos: las piezas de un perfil se cortan juntas y las barras se
+# reparten entre los pedidos según sus mm
+consolidado = consolidar_materia_prima(
+    {"a": {"TUBO": [(1900, 2)]}, "b": {"TUBO": [(1900, 1)], "ICN": [(900, 1)]}}
+)
+assert_equals(
+    (
+        consolidado["TUBO"]["num_perfiles"],
+        consolidado["TUBO"]["num_perfiles_por_separado"],
+    ),
+    (1, 2),
+)
+assert_equals(
+    {p: a["perfiles_asignados"] for p, a in consolidado["TUBO"]["pedidos"].items()},
+    {"a": 2 / 3, "b": 1 / 3},
+)
+assert_equals(list(consolidado["ICN"]["pedidos"]), ["b"])
+
+# Escenarios: la grilla se evalúa con los coeficientes del pedido y da lo
+# mismo que recalcular los costos con cada tasa
+coeficientes = coeficientes_de_costo(despiece, tiempos[0])
+escenarios = evaluar_escenarios(
+    coeficientes, grilla_de_escenarios([800, 970], [3.828], [0.2, 0.3])
+)
+assert_equals(len(escenarios), 4)
+for fila in escenarios.itertuples():
+    _, total, _, _ = calcular_costos_por_panel(
+        despiece, tiempos[0], fila.tasa_clp_usd, costo_kwh_usd=fila.costo_kwh_usd
+    )
+    assert_equals(round(fila.costo_total_usd, 6), round(total, 6))
+por_panel = costos_por_panel_escenarios(coeficientes, grilla_de_escenarios([970]))
+assert_equals(
+    round(por_panel[0].sum(), 6),
+    round(calcular_costos_por_panel(despiece, tiempos[0], 970)[1], 6),
+)
+
+# Modelo lineal por base: compilado una vez, valoriza cualquier cantidad (las
+# partes fijas por línea, como ojales y remaches, no escalan) igual que el
+# cálculo completo
+indice = IndiceCostos(":memory:")
+for pedido in (CANTIDADES_POR_BASE, {"WF600X2250": 7, "SF600X1200": 3}):
+    costos_modelo = indice.valorizar(pedido, 970)
+    costos_reglas, _, _, _ = menu_exportacion(
+        calcular_despiece_desde_agrupado(pedido), 970
+    )
+    for base, costo in costos_reglas.items():
+        for componente, valor in costo.items():
+            assert_equals(
+                round(costos_modelo.loc[base, componente], 6), round(valor, 6)
+            )
+assert_equals(len(indice), 3)
+
+# Las bases sin despiece no aparecen, como en menu_exportacion
+costos_modelo = indice.valorizar({"WF600X2250": 1, "ZZ100": 2}, 970)
+assert_equals(list(costos_modelo.index), ["WF600X2250"])
+indice.cerrar()
+
+# Catálogo persistente: guarda la plantilla de las reglas y sólo se ve con la
+# misma versión de reglas y constantes
+with tempfile.TemporaryDirectory() as directorio:
+    ruta_catalogo = os.path.join(directorio, "catalogo.db")
+    catalogo = Catalogo(ruta_catalogo)
+    assert_equals(catalogo.registrar(CANTIDADES_POR_BASE), 2)
+    assert_equals(catalogo.registrar(CANTIDADES_POR_BASE), 0)
+    catalogo.cerrar()
+    catalogo = Catalogo(ruta_catalogo)
+    guardado = catalogo.obtener("WF600X2250")
+    assert_equals(guardado["plantilla"], _plantilla_despiece("WF600X2250"))
+    assert_equals(guardado["area_m2"], 1.35)
+    assert_equals(catalogo.calentar(), 2)
+
+    # Una base con medidas fuera de las reglas no se guarda a medias: al
+    # calentar el catálogo (otra sesión) se vuelve a evaluar y a avisar
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        assert_equals(catalogo.registrar({"SF400X3000": 1}), 0)
+        assert_equals(catalogo.calentar(), 2)
+        _plantilla_despiece("SF400X3000")
+    assert_equals(salida.getvalue(), "ALTO no permitido en panel SF: SF400X3000\n")
+    catalogo.cerrar()
+    assert_equals(len(Catalogo(ruta_catalogo, version="otra")), 0)
+
+
+# script.py y web.py comparten núcleo: los tiempos del CLI salen del mismo
+# caché que usa menu_exportacion para los costos
+tiempos_cli = calcular_tiempos_pedido(despiece)
+assert_equals(calcular_tiempos_pedido(despiece) is tiempos_cli, True)
+assert_equals(
+    tiempos_cli[0]["WF600X2250"]["tiempo_corte_min"],
+    1.25 * sum(f[2] for f in despiece.filas() if f[0] == "WF600X2250"),
+)
+
+
+# Trabajo en segundo plano: informa su progreso y deja el resultado
+trabajo = trabajos.lanzar(
+    "prueba", lambda x, progreso: progreso(0.5, "mitad") or 2 * x, 21
+)
+while not trabajo.terminado:
+    time.sleep(0.01)
+assert_equals(
+    (trabajo.estado, trabajo.resultado, trabajo.detalle), ("listo", 42, "mitad")
+)
+assert_equals(trabajos.obtener(trabajo.id) is trabajo, True)
+
+
+# El modo paralelo abre procesos: sólo al correr tests.py directamente (con
+# "spawn" los hijos reimportan el módulo principal). Sin el caché, que no
+# distingue procesos, para que el cálculo en serie no sea el mismo objeto
+if __name__ == "__main__":
+    pedido = {f"WF{ancho}X2250": ancho // 50 for ancho in range(300, 650, 50)}
+    pedido.update(CANTIDADES_POR_BASE)
+    sin_cache = calcular_despiece_desde_agrupado.__wrapped__
+    paralelo = sin_cache(pedido, procesos=2, umbral_paralelo=1)
+    serie = sin_cache(pedido)
+    assert_equals(paralelo is serie, False)
+    assert_equals(list(paralelo), list(serie))
+
 
 print("All tests passed!")
@@ -0,0 +1,68 @@
+"""
+Trabajos en segundo plano (ej. la exportación a Excel) con id y progreso.
+
+La función del trabajo recibe un callback progreso(fraccion, detalle) para
+informar su avance; quien lo lanzó consulta el estado sin bloquearse.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import uuid
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="trabajo")
+_lock = threading.Lock()
+_trabajos = OrderedDict()  # id -> Trabajo, sólo los últimos MAX_TRABAJOS
+MAX_TRABAJOS = 16
+
+
+class Trabajo:
+    def __init__(self, nombre):
+        self.id = uuid.uuid4().hex[:8]
+        self.nombre = nombre
+        self.estado = "en cola"  # en cola | corriendo | listo | error
+        self.progreso = 0.0
+        self.detalle = ""
+        self.resultado = None
+        self.error = None
+
+    def __repr__(self):
+        return f"Trabajo({self.nombre!r}, id={self.id}, {self.estado}, {self.progreso:.0%})"
+
+    @property
+    def terminado(self):
+        return self.estado in ("listo", "error")
+
+    def avanzar(self, progreso, detalle=""):
+        self.progreso = progreso
+        self.detalle = detalle
+
+    def _correr(self, funcion, args, kwargs):
+        self.estado = "corriendo"
+        try:
+            self.resultado = funcion(*args, progreso=self.avanzar, **kwargs)
+        except Exception as e:
+            self.error = e
+            self.estado = "error"
+        else:
+            self.progreso = 1.0
+            self.estado = "listo"
+
+
+def lanzar(nombre, funcion, *args, **kwargs):
+    """
+    Corre funcion(*args, progreso=callback, **kwargs) en segundo plano.
+    Retorna el Trabajo (su id sirve para recuperarlo con obtener).
+    """
+    trabajo = Trabajo(nombre)
+    with _lock:
+        _trabajos[trabajo.id] = trabajo
+        while len(_trabajos) > MAX_TRABAJOS:
+            _trabajos.popitem(last=False)
+    _executor.submit(trabajo._correr, funcion, args, kwargs)
+    return trabajo
+
+
+def obtener(id_trabajo):
+    """Retorna el Trabajo con ese id, o None si no existe."""
+    return _trabajos.get(id_trabajo)
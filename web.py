@@ -1,4 +1,10 @@
+import pandas as pd
 import streamlit as st
+import catalogo
+from codigos import parsear
+from pipeline import Pipeline
+import trabajos
+from tablas import FILAS_POR_PAGINA, filtrar_y_ordenar, paginar
 from backend import (
     DESIRED_ORDER,
     calcular_despiece_desde_agrupado,
@@ -7,138 +13,54 @@ from backend import (
     calcular_soldadura_por_panel,
     calcular_tiempos_por_panel,
     cargar_pedido_agrupado,
+    exportar_tablas,
     exportar_todo,
     menu_exportacion,
-    parse_panel_code,
     calcular_area,
     calcular_detalle_insumos,
     calcular_areas_por_base,
     resumen_totales_pedido,
 )
-import tests
+from ejemplos import CANTIDADES_POR_BASE, DF_PEDIDO
 
 
-csv_file = st.file_uploader(
-    "paneles.csv",
-    type="csv",
-)
-dolar = st.number_input("Valor del dólar CLP→USD", min_value=0, value=970)
-
-if csv_file:
-    cantidades_por_base, df_pedido = cargar_pedido_agrupado(csv_file)
-
-elif False:  # for dev, I don't want to load a huge csv every time I test something
-    cantidades_por_base, df_pedido = tests.CANTIDADES_POR_BASE, tests.DF_PEDIDO
-
-else:
-    st.stop()
+def _cargar(archivo):
+    if archivo is None:  # pedido de prueba (rama dev)
+        return CANTIDADES_POR_BASE, DF_PEDIDO
+    return cargar_pedido_agrupado(archivo)
 
 
-resultado_despiece = calcular_despiece_desde_agrupado(cantidades_por_base)
-costos_por_panel, total_general_usd, detalle_costos, detalle_unidades = (
-    menu_exportacion(resultado_despiece, dolar)
-)
+@st.cache_resource
+def _catalogo():
+    # una vez por servidor: las bases ya vistas en otras sesiones no vuelven a
+    # pasar por las reglas de despiece
+    return catalogo.calentar()
 
-tiempos_panel, tiempo_total_general = calcular_tiempos_por_panel(resultado_despiece)
-detalle_por_pieza, total_insumos_pedido = calcular_detalle_insumos(
-    detalle_costos, detalle_unidades
-)
-resumen = resumen_totales_pedido(
-    resultado_despiece=resultado_despiece,
-    tiempos_panel=tiempos_panel,
-    tiempo_total_general=tiempo_total_general,
-    costos_por_panel=costos_por_panel,
-    total_general_usd=total_general_usd,
-    cantidades_por_base=cantidades_por_base,
-)
 
+def _despiece(pedido):
+    despiece = calcular_despiece_desde_agrupado(pedido[0])
+    _catalogo().registrar(pedido[0])
+    return despiece
 
-if False:  # hidden cause it is too big
-    # Mostrar la “tabla dinámica”
-    msg = """
-    ### Pedido agrupado por BASE
-
-    | Panel (base) | Cantidad |
-    | - | - |
-    """
-
-    for _, row in df_pedido.iterrows():
-        msg += f"| {row['Panel (base)']} | {int(row['Cantidad'])} | \n"
-    st.markdown(msg)
-
-
-opcion = st.radio(
-    "Seleccione que listado desea detallar",
-    [
-        "Despiece detallado",
-        "Materia prima necesaria por perfil (incluye totales)",
-        "Soldadura necesaria por panel",
-        "Tiempos por panel",
-        "Costos por panel (con USD/m² + resumen)",
-        "Detalle de insumos por pieza y total pedido",
-        "Área por panel",
-        "Resumen",
-        "Todos",
-    ],
-)
-
-msg = ""
-
-if opcion == "Todos":
-    export_file = exportar_todo(
-        resultado_despiece,
-        cantidades_por_base,
-        df_pedido,
-        costos_por_panel,
-        tiempos_panel,
-        detalle_por_pieza,
-        dolar,
-        resumen,
-    )
-
-    download = st.download_button(
-        "Descargar todo en excel",
-        file_name="reporte_completo.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        data=export_file.getvalue(),
-    )
 
-if opcion == "Despiece detallado" or opcion == "Todos":
-    msg += """
-### Despiece detallado
+# Tablas de los reportes (una fila por panel, pieza, etc.), como DataFrames
+# para mostrarlas paginadas
 
-Panel | Perfil | Piezas | Largo (mm) | Total (mm) |
-| -| - | - |- |- |
-"""
 
-    for item in resultado_despiece:
-        msg += f"| {item['panel']} | {item['perfil']} | {item['numero_piezas']} | {item['largo_pieza_mm']} | {item['total_mm']} |\n"
-
-# 4) Materia prima por perfil (unificado con totales de perfiles)
-if (
-    opcion == "Materia prima necesaria por perfil (incluye totales)"
-    or opcion == "Todos"
-):
-    totales = calcular_totales_perfiles(
-        resultado_despiece
-    )  # {perfil: {numero_piezas, total_mm}}
-    materia_prima = calcular_materia_prima_por_perfil(
-        resultado_despiece, longitud_perfil=5850
+def _tabla_despiece(despiece):
+    return despiece.a_dataframe().rename(
+        columns={
+            "panel": "Panel",
+            "perfil": "Perfil",
+            "numero_piezas": "Piezas",
+            "largo_pieza_mm": "Largo (mm)",
+            "total_mm": "Total (mm)",
+        }
     )
-    msg += """
-### Materia prima necesaria por perfil (incluye totales)
-
-Perfil | Piezas totales | Total (mm) | Perfiles necesarios | Waste (mm) |
-| -| - | - |- |- |
-"""
 
-    # primero en el orden deseado
-    for perfil in DESIRED_ORDER:
-        d_tot = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
-        d_mp = materia_prima.get(perfil, {"num_perfiles": 0, "waste_mm": 0})
-        msg += f"{perfil} | {d_tot['numero_piezas']} | {d_tot['total_mm']} | {d_mp['num_perfiles']} | {d_mp['waste_mm']}\n"
 
-    # luego los que no están en DESIRED_ORDER (orden alfabético)
+def _tabla_materia_prima(totales, materia_prima, modo):
+    # primero en el orden deseado, luego los demás en orden alfabético
     otros = sorted(
         [
             p
@@ -146,44 +68,52 @@ Perfil | Piezas totales | Total (mm) | Perfiles necesarios | Waste (mm) |
             if p not in DESIRED_ORDER
         ]
     )
-    for p in otros:
-        d_tot = totales.get(p, {"numero_piezas": 0, "total_mm": 0})
-        d_mp = materia_prima.get(p, {"num_perfiles": 0, "waste_mm": 0})
-        msg += f"{p} | {d_tot['numero_piezas']} | {d_tot['total_mm']} | {d_mp['num_perfiles']} | {d_mp['waste_mm']}\n"
-
-if opcion == "Soldadura necesaria por panel" or opcion == "Todos":
-    soldadura = calcular_soldadura_por_panel(resultado_despiece)
-    msg += """
-### Soldadura necesaria por panel
-
-| Panel | Soldadura (mm) |
-| - | - |
-"""
-    for panel in sorted(soldadura.keys(), key=lambda x: x.lower()):
-        msg += f"| {panel} | {soldadura[panel]} |\n"
+    filas = []
+    for perfil in [*DESIRED_ORDER, *otros]:
+        d_tot = totales.get(perfil, {"numero_piezas": 0, "total_mm": 0})
+        d_mp = materia_prima.get(
+            perfil,
+            {"num_perfiles": 0, "waste_mm": 0, "cota_inferior": 0, "brecha": 0.0},
+        )
+        fila = {
+            "Perfil": perfil,
+            "Piezas totales": d_tot["numero_piezas"],
+            "Total (mm)": d_tot["total_mm"],
+            "Perfiles necesarios": d_mp["num_perfiles"],
+            "Waste (mm)": d_mp["waste_mm"],
+        }
+        if modo == "optimo":
+            fila["Cota inferior"] = d_mp["cota_inferior"]
+            fila["Brecha (%)"] = round(100 * d_mp["brecha"], 2)
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def _tabla_soldadura(soldadura):
+    return pd.DataFrame(
+        [
+            {"Panel": panel, "Soldadura (mm)": soldadura[panel]}
+            for panel in sorted(soldadura.keys(), key=lambda x: x.lower())
+        ]
+    )
 
-if opcion == "Tiempos por panel" or opcion == "Todos":
-    msg += """
-### Tiempos por panel
 
-| Panel | Corte | Sold. | Perf. | Total |
-| - | - | - | - | - |
-"""
-    for panel, d in tiempos_panel.items():
-        msg += f"| {panel} | {d['tiempo_corte_min']:.2f} | {d['tiempo_soldadura_min']:.2f} | {d['tiempo_perforacion_min']:.2f} | {d['tiempo_total_min']:.2f} |\n"
-    msg += f"\n**Tiempo TOTAL fabricación:** {tiempo_total_general / 60:.2f} horas"
+def _tabla_tiempos(tiempos):
+    return pd.DataFrame(
+        [
+            {
+                "Panel": panel,
+                "Corte": round(d["tiempo_corte_min"], 2),
+                "Sold.": round(d["tiempo_soldadura_min"], 2),
+                "Perf.": round(d["tiempo_perforacion_min"], 2),
+                "Total": round(d["tiempo_total_min"], 2),
+            }
+            for panel, d in tiempos[0].items()
+        ]
+    )
 
-if opcion == "Costos por panel (con USD/m² + resumen)" or opcion == "Todos":
-    msg += """
-### Costos por panel (con USD/m² + resumen)
-
-| Panel (base) | Cant. | Área panel (m²) | Costo unit (USD) | USD/m² unit | MP (USD) | MO (USD) | Insumos (USD) | Energía (USD) | Total (USD) |
-| - | - | - | - | - | - | - | - | - | - |
-"""
-    total_area = 0.0
-    total_costo = 0.0
-    total_unidades = 0
 
+def _tabla_costos(pedido, costos):
     def _mo_total(d):
         return (
             d.get("costo_mo_corte_usd", 0.0)
@@ -192,102 +122,278 @@ if opcion == "Costos por panel (con USD/m² + resumen)" or opcion == "Todos":
         )
 
     filas = []
-    for base, cant_total in sorted(
-        cantidades_por_base.items(), key=lambda x: x[0].lower()
-    ):
+    for base, cant_total in sorted(pedido[0].items(), key=lambda x: x[0].lower()):
         if cant_total <= 0:
             continue
-        info = parse_panel_code(base)
-        _, _, area_unit = calcular_area(info["nums"])
+        _, _, area_unit = calcular_area(parsear(base).nums)
         if area_unit <= 0:
             continue
 
-        dcost = costos_por_panel.get(base, {})
+        dcost = costos[0].get(base, {})
         total_base = dcost.get("costo_total_usd", 0.0) or 0.0
-        mp_total = dcost.get("costo_mp_usd", 0.0) or 0.0
-        mo_total = _mo_total(dcost)
-        ins_total = dcost.get("costo_insumos_usd", 0.0) or 0.0
-        energia_total = dcost.get("costo_energia_usd", 0.0) or 0.0  # ← NUEVO
-
         costo_unit = total_base / cant_total
-        usd_m2_unit = costo_unit / area_unit
+        filas.append(
+            {
+                "Panel (base)": base,
+                "Cant.": cant_total,
+                "Área panel (m²)": round(area_unit, 3),
+                "Costo unit (USD)": round(costo_unit, 2),
+                "USD/m² unit": round(costo_unit / area_unit, 2),
+                "MP (USD)": round(dcost.get("costo_mp_usd", 0.0) or 0.0, 2),
+                "MO (USD)": round(_mo_total(dcost), 2),
+                "Insumos (USD)": round(dcost.get("costo_insumos_usd", 0.0) or 0.0, 2),
+                "Energía (USD)": round(dcost.get("costo_energia_usd", 0.0) or 0.0, 2),
+                "Total (USD)": round(total_base, 2),
+                # sin redondear, para el resumen del pedido
+                "_area_total": area_unit * cant_total,
+                "_total": total_base,
+            }
+        )
+    return pd.DataFrame(filas)
 
-        total_unidades += cant_total
-        total_area += area_unit * cant_total
-        total_costo += total_base
 
-        filas.append(
-            (
-                base,
-                cant_total,
-                area_unit,
-                costo_unit,
-                usd_m2_unit,
-                mp_total,
-                mo_total,
-                ins_total,
-                energia_total,
-                total_base,
+def _tabla_insumos(insumos):
+    return pd.DataFrame(
+        [
+            {
+                "Panel": panel,
+                "Insumo": nombre,
+                "Cantidad": round(datos["cantidad"], 3),
+                "Costo USD": round(datos["costo_usd"], 2),
+            }
+            for panel, insumos_panel in insumos[0].items()
+            for nombre, datos in insumos_panel.items()
+        ]
+    )
+
+
+TABLAS = {
+    "pedido": (lambda pedido: pedido[1], "pedido"),
+    "despiece": (_tabla_despiece, "despiece"),
+    "materia_prima": (
+        _tabla_materia_prima,
+        "totales_perfiles",
+        "materia_prima",
+        "modo_corte",
+    ),
+    "soldadura": (_tabla_soldadura, "soldadura"),
+    "tiempos": (_tabla_tiempos, "tiempos"),
+    "costos": (_tabla_costos, "pedido", "costos"),
+    "insumos": (_tabla_insumos, "insumos"),
+    "areas": (lambda areas: pd.DataFrame(areas[0]), "areas"),
+}
+
+
+def _crear_pipeline():
+    """
+    Etapas del cálculo con sus dependencias: al mover el dólar sólo se
+    recalculan costos, insumos, resumen y excel; al cambiar de reporte, nada.
+    """
+    p = Pipeline()
+    p.etapa("pedido", _cargar, "archivo")
+    p.etapa("despiece", _despiece, "pedido")
+    p.etapa("costos", menu_exportacion, "despiece", "dolar")
+    p.etapa("tiempos", calcular_tiempos_por_panel, "despiece")
+    p.etapa("totales_perfiles", calcular_totales_perfiles, "despiece")
+    p.etapa(
+        "materia_prima",
+        lambda despiece, modo: calcular_materia_prima_por_perfil(
+            despiece, longitud_perfil=5850, modo=modo
+        ),
+        "despiece",
+        "modo_corte",
+    )
+    p.etapa("soldadura", calcular_soldadura_por_panel, "despiece")
+    p.etapa("areas", lambda pedido: calcular_areas_por_base(pedido[0]), "pedido")
+    p.etapa(
+        "insumos",
+        lambda costos: calcular_detalle_insumos(costos[2], costos[3]),
+        "costos",
+    )
+    p.etapa(
+        "resumen",
+        lambda pedido, despiece, tiempos, costos: resumen_totales_pedido(
+            resultado_despiece=despiece,
+            tiempos_panel=tiempos[0],
+            tiempo_total_general=tiempos[1],
+            costos_por_panel=costos[0],
+            total_general_usd=costos[1],
+            cantidades_por_base=pedido[0],
+        ),
+        "pedido",
+        "despiece",
+        "tiempos",
+        "costos",
+    )
+    # El excel se arma en segundo plano: la etapa lanza el trabajo y retorna
+    # al tiro; mientras no cambien sus entradas, volver a pedirla no lanza otro
+    p.etapa(
+        "excel",
+        lambda pedido, despiece, costos, tiempos, insumos, dolar, resumen: (
+            trabajos.lanzar(
+                "Exportación a Excel",
+                exportar_todo,
+                despiece,
+                pedido[0],
+                pedido[1],
+                costos[0],
+                tiempos[0],
+                insumos[0],
+                dolar,
+                resumen,
             )
+        ),
+        "pedido",
+        "despiece",
+        "costos",
+        "tiempos",
+        "insumos",
+        "dolar",
+        "resumen",
+    )
+    # Cada tabla y su vista filtrada/ordenada (sólo cambia con sus controles)
+    for clave, (funcion, *entradas) in TABLAS.items():
+        p.etapa(f"tabla_{clave}", funcion, *entradas)
+        p.etapa(
+            f"vista_{clave}",
+            filtrar_y_ordenar,
+            f"tabla_{clave}",
+            f"filtro_{clave}",
+            f"orden_{clave}",
+            f"desc_{clave}",
         )
+    return p
+
+
+_catalogo()
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = _crear_pipeline()
+pipeline = st.session_state.pipeline
+
+csv_file = st.file_uploader(
+    "paneles.csv",
+    type="csv",
+)
+dolar = st.number_input("Valor del dólar CLP→USD", min_value=0, value=970)
+pipeline.entrada("dolar", dolar)
+
+if csv_file:
+    pipeline.entrada("archivo", csv_file, clave=csv_file.file_id)
+
+elif False:  # for dev, I don't want to load a huge csv every time I test something
+    pipeline.entrada("archivo", None, clave="dev")
+
+else:
+    st.stop()
+
+
+def _mostrar_tabla(clave, columnas_ocultas=()):
+    """
+    Muestra la tabla paginada: filtro, orden y corte de página se hacen en el
+    servidor, y al navegador sólo llega la página visible.
+    """
+    tabla = pipeline.obtener(f"tabla_{clave}")
+    col_filtro, col_orden, col_desc = st.columns([3, 2, 1])
+    filtro = col_filtro.text_input("Filtrar", key=f"filtro_{clave}")
+    orden = col_orden.selectbox(
+        "Ordenar por",
+        ["(orden original)"] + [c for c in tabla.columns if c not in columnas_ocultas],
+        key=f"orden_{clave}",
+    )
+    descendente = col_desc.checkbox("Descendente", key=f"desc_{clave}")
+    pipeline.entrada(f"filtro_{clave}", filtro)
+    pipeline.entrada(f"orden_{clave}", None if orden == "(orden original)" else orden)
+    pipeline.entrada(f"desc_{clave}", descendente)
+    vista = pipeline.obtener(f"vista_{clave}")
+
+    pagina = st.number_input("Página", min_value=1, value=1, key=f"pagina_{clave}")
+    filas, paginas = paginar(vista, pagina)
+    st.dataframe(
+        filas.drop(columns=list(columnas_ocultas), errors="ignore"), hide_index=True
+    )
+    st.caption(
+        f"Página {min(pagina, paginas)} de {paginas} · {len(vista)} filas"
+        f" ({FILAS_POR_PAGINA} por página)"
+    )
+
+
+with st.expander("Pedido agrupado por BASE"):
+    _mostrar_tabla("pedido")
+
+
+# Cada reporte pide al pipeline sólo las etapas que necesita; las etapas
+# quedan calculadas para la sesión, así que un reporte barato no espera a
+# los caros.
+
+
+def _reporte_despiece():
+    st.markdown("### Despiece detallado")
+    _mostrar_tabla("despiece")
+
+
+def _reporte_materia_prima():
+    st.markdown("### Materia prima necesaria por perfil (incluye totales)")
+    optimo = st.checkbox(
+        "Optimizar corte de barras (más lento, muestra brecha al óptimo)"
+    )
+    pipeline.entrada("modo_corte", "optimo" if optimo else "ffd")
+    _mostrar_tabla("materia_prima")
+
+
+def _reporte_soldadura():
+    st.markdown("### Soldadura necesaria por panel")
+    _mostrar_tabla("soldadura")
+
 
-    for (
-        base,
-        cant,
-        area_unit,
-        costo_unit,
-        usd_m2_unit,
-        mp_total,
-        mo_total,
-        ins_total,
-        energia_total,
-        total_base,
-    ) in filas:
-        msg += f"| {base} | {cant} | {area_unit:.3f} | {costo_unit:.2f} | {usd_m2_unit:.2f} | {mp_total:.2f} | {mo_total:.2f} | {ins_total:.2f} | {energia_total:.2f} | {total_base:.2f} |"
+def _reporte_tiempos():
+    st.markdown("### Tiempos por panel")
+    _mostrar_tabla("tiempos")
+    tiempo_total_general = pipeline.obtener("tiempos")[1]
+    st.markdown(f"**Tiempo TOTAL fabricación:** {tiempo_total_general / 60:.2f} horas")
 
+
+def _reporte_costos():
+    st.markdown("### Costos por panel (con USD/m² + resumen)")
+    _mostrar_tabla("costos", columnas_ocultas=("_area_total", "_total"))
+    tabla = pipeline.obtener("tabla_costos")
+    total_unidades = int(tabla["Cant."].sum()) if len(tabla) else 0
+    total_area = float(tabla["_area_total"].sum()) if len(tabla) else 0.0
+    total_costo = float(tabla["_total"].sum()) if len(tabla) else 0.0
     precio_medio = (total_costo / total_area) if total_area > 0 else 0.0
-    msg += f"""
+    st.markdown(f"""
 ---
 **Resumen del pedido**
 - Unidades totales: {total_unidades}
 - Área total del pedido (m²): {total_area:.3f}
 - Costo TOTAL pedido (USD): {total_costo:.2f}
 - Precio medio (USD/m²): {precio_medio:.2f}
-"""
+""")
 
-if opcion == "Detalle de insumos por pieza y total pedido" or opcion == "Todos":
-    msg += """
-### Detalle de insumos por pieza y total pedido
-
-| Panel | Insumo | Cantidad | Costo USD |
-| - | - | - | - |
-"""
-    for panel, insumos in detalle_por_pieza.items():
-        for nombre, datos in insumos.items():
-            cantidad = datos["cantidad"]
-            costo_usd = datos["costo_usd"]
-            msg += f"| {panel} | {nombre} | {cantidad:.3f} | {costo_usd:.2f} |\n"
 
-    msg += """
+def _reporte_insumos():
+    st.markdown("### Detalle de insumos por pieza y total pedido")
+    _mostrar_tabla("insumos")
+    total_insumos_pedido = pipeline.obtener("insumos")[1]
+    msg = """
 #### Total insumos TODO PEDIDO
 | Insumo | Cant. Total | Costo Total USD |
 | - | - | - |
 """
     for nombre, tot in total_insumos_pedido.items():
         msg += f"| {nombre} | {tot['cantidad_total']:.3f} | {tot['costo_total_usd']:.2f} |\n"
+    st.markdown(msg)
 
-if opcion == "Área por panel" or opcion == "Todos":
-    filas_area, total_area_pedido = calcular_areas_por_base(cantidades_por_base)
-    msg += """
-| Panel (base) | Cant. | Área panel (m²) | Área total (m²) |
-| - | - | - | - |
-"""
-    for r in filas_area:
-        msg += f"| {r['Panel (base)']} | {r['Cantidad']} | {r['Área panel (m²)']:.3f} | {r['Área total (m²)']:.3f} |\n"
-    msg += f"\n**Área TOTAL del pedido (m²):** {total_area_pedido:.3f}"
 
-if opcion == "Resumen" or opcion == "Todos":
-    msg += f"""
+def _reporte_areas():
+    st.markdown("### Área por panel")
+    _mostrar_tabla("areas")
+    total_area_pedido = pipeline.obtener("areas")[1]
+    st.markdown(f"**Área TOTAL del pedido (m²):** {total_area_pedido:.3f}")
+
+
+def _reporte_resumen():
+    resumen = pipeline.obtener("resumen")
+    st.markdown(f"""
 ### Resumen
 - **Total piezas (despiece):** {resumen["total_piezas_despiece"]}
 - **Total paneles (CSV):** {resumen["total_paneles"]}
@@ -297,6 +403,85 @@ if opcion == "Resumen" or opcion == "Todos":
 - **Tiempo total (min):** {resumen["total_tiempo_min"]:.2f}
 - **Tiempo total (horas):** {resumen["total_tiempo_horas"]:.2f}
 - **Tiempo total (días, 8h):** {resumen["total_tiempo_dias"]:.2f}
-"""
+""")
+
+
+REPORTES = {
+    "Despiece detallado": _reporte_despiece,
+    "Materia prima necesaria por perfil (incluye totales)": _reporte_materia_prima,
+    "Soldadura necesaria por panel": _reporte_soldadura,
+    "Tiempos por panel": _reporte_tiempos,
+    "Costos por panel (con USD/m² + resumen)": _reporte_costos,
+    "Detalle de insumos por pieza y total pedido": _reporte_insumos,
+    "Área por panel": _reporte_areas,
+    "Resumen": _reporte_resumen,
+}
+
+opcion = st.radio(
+    "Seleccione que listado desea detallar",
+    [*REPORTES, "Todos"],
+)
+
+
+def _contenido(archivo):
+    """Bytes de un archivo binario desde el inicio, para st.download_button."""
+    archivo.seek(0)
+    return archivo.read()
+
+
+def _estado_excel(trabajo, estaba_corriendo):
+    """Progreso de la exportación; al terminar, el botón de descarga."""
+    if trabajo.estado == "error":
+        st.error(f"Falló la exportación {trabajo.id}: {trabajo.error}")
+    elif trabajo.estado == "listo":
+        if estaba_corriendo:
+            st.rerun()  # rerun completo para dejar de consultar el progreso
+        excel = trabajo.resultado  # archivo temporal, escrito en streaming
+        st.download_button(
+            "Descargar todo en excel",
+            file_name="reporte_completo.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            data=lambda: _contenido(excel),  # se lee al hacer clic, no en cada rerun
+        )
+    else:
+        st.progress(
+            trabajo.progreso,
+            text=f"Exportación {trabajo.id}: {trabajo.detalle or trabajo.estado}",
+        )
+
+
+if opcion == "Todos":
+    trabajo = pipeline.obtener("excel")
+    # mientras corre, sólo este fragmento se refresca cada segundo
+    st.fragment(_estado_excel, run_every=None if trabajo.terminado else 1.0)(
+        trabajo, not trabajo.terminado
+    )
+
+    # Tablas tipadas para otros sistemas: se generan recién al hacer clic
+    formato = st.radio("Formato de tablas", ["parquet", "arrow"], horizontal=True)
+    pedido, despiece, costos, tiempos, insumos, resumen = [
+        pipeline.obtener(n)
+        for n in ("pedido", "despiece", "costos", "tiempos", "insumos", "resumen")
+    ]
+    st.download_button(
+        f"Descargar tablas ({formato}, zip)",
+        file_name=f"reporte_completo_{formato}.zip",
+        mime="application/zip",
+        data=lambda: _contenido(
+            exportar_tablas(
+                despiece,
+                pedido[0],
+                pedido[1],
+                costos[0],
+                tiempos[0],
+                insumos[0],
+                dolar,
+                resumen,
+                formato=formato,
+            )
+        ),
+    )
 
-res = st.markdown(msg)
+for nombre, reporte in REPORTES.items():
+    if opcion == nombre or opcion == "Todos":
+        reporte()